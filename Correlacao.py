@@ -1,166 +1,163 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-import requests
-from urllib.parse import urlparse
 
-st.set_page_config(page_title="Análise SARESP", layout="wide")
-st.title("📊 Análise de Correlação - SARESP, Simulado e Raça")
-
-# Configuração das URLs das planilhas (substitua com seus links reais)
-SHEET_URLS = {
-    "simulado": "https://docs.google.com/spreadsheets/d/1WdYDSdSnoZYGrqOZQ6et0ATZ6I_cn68sy40TDvU-7us/edit",
-    "raca_jundiai": "https://docs.google.com/spreadsheets/d/1ukOdMgipTZKbeutiX2dypD_CU1y0PZMzqg6nBIYM--k/edit",
-    "raca_sul1": "https://docs.google.com/spreadsheets/d/1r4Dnkqnw6eSYFzTbgM5gCPdDfMP3iglQn1Atkd_9V1c/edit",
-    "saresp_jundiai": "https://docs.google.com/spreadsheets/d/1rVWqlFSdWczK0SYZ4ecSdloJJ4BNllgy7m0K5q9G31Q/edit",
-    "saresp_sul1": "https://docs.google.com/spreadsheets/d/1mMU5WVwGLQhSf_AwKBXJVaSyMOsqplZqaUeBLAQf-iM/edit",
-    "simulado_sul1": "https://docs.google.com/spreadsheets/d/1iuHE5IHQUVaIuo2Z5x5wqJGT2VRJostnVrH40mvHfL4/edit?usp=drive_link",
-    "simulado_sul2": "https://docs.google.com/spreadsheets/d/1A0L4YwrVFt77Up049RSdZ9Toe9FD-oXkjERkdppFy0g/edit?usp=drive_link"
-}
-
-def carregar_sheet(id_planilha):
-    url_csv = f"https://docs.google.com/spreadsheets/d/{id_planilha}/export?format=csv"
-    return pd.read_csv(url_csv)
-
-# ID da planilha do simulado (sem /edit no final!)
-simulado_id_9anoJundiai = "1WdYDSdSnoZYGrqOZQ6et0ATZ6I_cn68sy40TDvU-7us"
-raca_jundiai = "1ukOdMgipTZKbeutiX2dypD_CU1y0PZMzqg6nBIYM--k"
-raca_sul1 = "1r4Dnkqnw6eSYFzTbgM5gCPdDfMP3iglQn1Atkd_9V1c"
-saresp_jundiai = "1rVWqlFSdWczK0SYZ4ecSdloJJ4BNllgy7m0K5q9G31Q"
-saresp_sul1 = "1mMU5WVwGLQhSf_AwKBXJVaSyMOsqplZqaUeBLAQf-iM"
-simulado_id_5anoSul1 ="1iuHE5IHQUVaIuo2Z5x5wqJGT2VRJostnVrH40mvHfL4"
-simulado_id_5anoSul2 = "1A0L4YwrVFt77Up049RSdZ9Toe9FD-oXkjERkdppFy0g"
-
-
-# Carrega
-df_simulado = carregar_sheet(simulado_id_9anoJundiai)
-df_raca_jundiai = carregar_sheet(raca_jundiai)
-df_raca_sul1 = carregar_sheet(raca_sul1)
-df_saresp_jundiai = carregar_sheet(saresp_jundiai)
-df_saresp_sul1 = carregar_sheet(saresp_sul1)
-df_simulado_5anoSul1 = carregar_sheet(simulado_id_5anoSul1)
-df_simulado_5anoSul2 = carregar_sheet(simulado_id_5anoSul2)
-
-if st.checkbox("Mostrar amostras dos dados"):
-    st.write(df_simulado_5anoSul1.head())
-    st.write(df_saresp_sul1.head())
-    st.write(df_raca_jundiai.head())
-    st.write(df_saresp_jundiai.head())
-
-def carregar_sheet(id_planilha):
-    url_csv = f"https://docs.google.com/spreadsheets/d/{id_planilha}/export?format=csv"
-    return pd.read_csv(url_csv)
+from cache import obter
+from cubo import cubo_simulado
+from dados_graficos import amostrar_dispersao, grafico_histograma, histograma
+from escolas import anexar_id_escola, atualizar_dimensao, escolas_sem_par
+from filtros import descrever, filtros_barra_lateral, indexar
+from fontes import PLANILHAS_CORRELACAO
+from instrumentacao import etapa, iniciar_execucao, painel_diagnostico
+from pontuacao import calcular_acertos_incremental
+from snapshots import assinatura_snapshots, carregar_snapshots, chave_da_origem
+from tabelas import tabela_paginada
 
-# ID da planilha do simulado (sem /edit no final!)
-simulado_id_9anoJundiai = "1WdYDSdSnoZYGrqOZQ6et0ATZ6I_cn68sy40TDvU-7us"
-raca_jundiai = "1ukOdMgipTZKbeutiX2dypD_CU1y0PZMzqg6nBIYM--k"
-raca_sul1 = "1r4Dnkqnw6eSYFzTbgM5gCPdDfMP3iglQn1Atkd_9V1c"
-saresp_jundiai = "1rVWqlFSdWczK0SYZ4ecSdloJJ4BNllgy7m0K5q9G31Q"
-saresp_sul1 = "1mMU5WVwGLQhSf_AwKBXJVaSyMOsqplZqaUeBLAQf-iM"
-simulado_id_5anoSul1 ="1iuHE5IHQUVaIuo2Z5x5wqJGT2VRJostnVrH40mvHfL4"
-simulado_id_5anoSul2 = "1A0L4YwrVFt77Up049RSdZ9Toe9FD-oXkjERkdppFy0g"
-
-
-# Carrega
-df_simulado = carregar_sheet(simulado_id_9anoJundiai)
-df_raca_jundiai = carregar_sheet(raca_jundiai)
-df_raca_sul1 = carregar_sheet(raca_sul1)
-df_saresp_jundiai = carregar_sheet(saresp_jundiai)
-df_saresp_sul1 = carregar_sheet(saresp_sul1)
-df_simulado_5anoSul1 = carregar_sheet(simulado_id_5anoSul1)
-df_simulado_5anoSul2 = carregar_sheet(simulado_id_5anoSul2)
-
-
-# Filtrar apenas respostas corretas
-df_simulado_filtrado = df_simulado[df_simulado['Resposta'] == 'Correto']
+st.title("📊 Análise de Correlação - SARESP, Simulado e Raça")
+iniciar_execucao("Correlacao")
 
-# Contagem total de questões por escola e disciplina
-total_questoes = df_simulado.groupby(['DE', 'SERIE_ANO', 'ESCOLA', 'Disciplina'])['Resposta'].count().reset_index(name='Total_Respostas')
+SHEET_URLS = PLANILHAS_CORRELACAO
 
-# Contagem de acertos
-acertos = df_simulado_filtrado.groupby(['DE', 'SERIE_ANO', 'ESCOLA', 'Disciplina'])['Resposta'].count().reset_index(name='Acertos')
+# Carrega todas as planilhas a partir dos snapshots locais (baixadas em paralelo na primeira vez)
+with etapa("carga") as medicao:
+    planilhas = medicao.saida(carregar_snapshots(SHEET_URLS))
+df_simulado = planilhas["simulado"]
+df_raca_jundiai = planilhas["raca_jundiai"]
+df_raca_sul1 = planilhas["raca_sul1"]
+df_saresp_jundiai = planilhas["saresp_jundiai"]
+df_saresp_sul1 = planilhas["saresp_sul1"]
+df_simulado_5anoSul1 = planilhas["simulado_sul1"]
+df_simulado_5anoSul2 = planilhas["simulado_sul2"]
 
-# Merge e cálculo da porcentagem
-df_simulado_percentual = pd.merge(acertos, total_questoes, on=['DE', 'SERIE_ANO', 'ESCOLA', 'Disciplina'])
-df_simulado_percentual['% Acerto'] = (df_simulado_percentual['Acertos'] / df_simulado_percentual['Total_Respostas']) * 100
+# Versão das planilhas: identifica os dados nas chaves de memorização (preparo, índices, tabelas)
+versao_dados = ("Correlacao", assinatura_snapshots(SHEET_URLS))
 
-df_saresp_jundiai_9ano = df_saresp_jundiai[df_saresp_jundiai['SERIE_ANO'] == '9 Ano']
-df_saresp_sul1_9ano = df_saresp_sul1[df_saresp_sul1['SERIE_ANO'] == '9 Ano']
+if st.checkbox("Mostrar amostras dos dados"):
+    # Paginadas no servidor: cada tabela envia só a página visível
+    for titulo, df, chave in (("Simulado 5º ano - Sul 1", df_simulado_5anoSul1, "amostra_simulado_sul1"),
+                              ("SARESP - Sul 1", df_saresp_sul1, "amostra_saresp_sul1"),
+                              ("Raça/cor - Jundiaí", df_raca_jundiai, "amostra_raca_jundiai"),
+                              ("SARESP - Jundiaí", df_saresp_jundiai, "amostra_saresp_jundiai")):
+        st.subheader(titulo)
+        tabela_paginada(df, chave, linhas_por_pagina=25, versao=versao_dados + (chave,))
+
+
+def preparar():
+    """Dimensão de escolas, pontuação do Simulado e SARESP com ID_ESCOLA (iguais para todas as sessões)"""
+    # Dimensão de escolas: cada par (DE, ESCOLA) normalizado ganha um ID_ESCOLA inteiro
+    with etapa("dimensao_escolas", planilhas) as medicao:
+        dimensao_escolas = medicao.saida(atualizar_dimensao([df_simulado, df_saresp_jundiai, df_saresp_sul1,
+                                                             df_raca_jundiai, df_raca_sul1]))
+
+    # Acertos, total de respostas e % de acerto por escola e disciplina
+    # (só as respostas novas desde a última execução são agregadas)
+    with etapa("pontuacao", df_simulado) as medicao:
+        df_simulado_percentual = calcular_acertos_incremental(
+            chave_da_origem(SHEET_URLS["simulado"]), df_simulado).rename(
+            columns={'Total_Acertos': 'Acertos', 'Taxa_Acerto': '% Acerto'})
+        df_simulado_percentual = medicao.saida(anexar_id_escola(df_simulado_percentual, dimensao_escolas))
+
+    df_saresp = anexar_id_escola(pd.concat([df_saresp_jundiai, df_saresp_sul1], ignore_index=True),
+                                 dimensao_escolas)
+    return dimensao_escolas, df_simulado_percentual, df_saresp
+
+
+# Calculado uma vez por versão das planilhas e compartilhado por todas as sessões
+dimensao_escolas, df_simulado_percentual, df_saresp = obter(versao_dados, preparar)
+
+# Filtros da barra lateral (padrão: 9º ano de Jundiaí), aplicados pelos índices de grupos
+# (identificados pela versão dos snapshots, sem percorrer as tabelas a cada rerun)
+indice_simulado = indexar(df_simulado_percentual, versao=versao_dados + ('simulado',))
+indice_saresp = indexar(df_saresp, versao=versao_dados + ('saresp',))
+filtros = filtros_barra_lateral(dimensao_escolas, [indice_simulado, indice_saresp],
+                                padroes={'DE_NORM': ['JUNDIAI'], 'SERIE_ANO': ['9 Ano']},
+                                chave="correlacao")
+regiao = descrever(filtros)
+with etapa("filtros", df_simulado_percentual) as medicao:
+    df_simulado_filtrado = indice_simulado.fatiar(filtros)
+    df_saresp_filtrado = medicao.saida(indice_saresp.fatiar(filtros))
 
 # Preparar o simulado com pivot (LP e MAT em colunas)
-df_simulado_pivot = df_simulado_percentual.pivot(index=['DE', 'ESCOLA', 'SERIE_ANO'], columns='Disciplina', values='% Acerto').reset_index()
+with etapa("pivot", df_simulado_filtrado) as medicao:
+    df_simulado_pivot = medicao.saida(df_simulado_filtrado.pivot(index=['ID_ESCOLA', 'DE', 'ESCOLA', 'SERIE_ANO'], columns='Disciplina', values='% Acerto').reset_index())
 df_simulado_pivot.columns.name = None  # remover nome do índice
 
 # Renomear colunas pra bater com os nomes do SARESP
 df_simulado_pivot.rename(columns={'LP': 'Simulado_LP', 'MAT': 'Simulado_MAT'}, inplace=True)
 
-# Juntar com o SARESP (exemplo com Jundiaí)
-df_merge = pd.merge(
-    df_saresp_jundiai_9ano,
-    df_simulado_pivot[df_simulado_pivot['DE'] == 'JUNDIAI'],
-    left_on='ESCOLA',
-    right_on='ESCOLA',
-    how='inner'
-)
+# Juntar com o SARESP pela chave inteira da escola e pela série
+# (linhas sem escola na dimensão têm ID ausente e não entram na junção)
+with etapa("merge", df_saresp_filtrado) as medicao:
+    df_merge = medicao.saida(pd.merge(
+        df_saresp_filtrado.dropna(subset=['ID_ESCOLA']),
+        df_simulado_pivot.drop(columns=['DE', 'ESCOLA']),
+        on=['ID_ESCOLA', 'SERIE_ANO'],
+        how='inner'
+    ))
+
+# Escolas e séries que ficaram de fora da junção (presentes em só uma das bases)
+escolas_fora = escolas_sem_par(df_saresp_filtrado, df_simulado_pivot, dimensao_escolas,
+                               chaves=['ID_ESCOLA', 'SERIE_ANO'])
+if len(escolas_fora):
+    with st.expander(f"{len(escolas_fora)} escolas/séries sem correspondência entre SARESP e Simulado ({regiao})"):
+        st.dataframe(escolas_fora.replace({'lado': {'esquerda': 'só SARESP', 'direita': 'só Simulado'}}))
 
 import altair as alt
 
 # Histograma de % de acerto - LP
-lp_hist = alt.Chart(df_simulado_percentual[df_simulado_percentual['Disciplina'] == 'LP']).mark_bar().encode(
-    alt.X('% Acerto', bin=alt.Bin(maxbins=20)),
-    y='count()',
-    tooltip=['% Acerto']
-).properties(
-    title='Distribuição de % de acertos - LP (Simulado)'
+lp_hist = grafico_histograma(
+    histograma(df_simulado_filtrado.loc[df_simulado_filtrado['Disciplina'] == 'LP', '% Acerto']),
+    'Distribuição de % de acertos - LP (Simulado)', '% Acerto'
 )
 
 # Histograma de % de acerto - MAT
-mat_hist = alt.Chart(df_simulado_percentual[df_simulado_percentual['Disciplina'] == 'MAT']).mark_bar().encode(
-    alt.X('% Acerto', bin=alt.Bin(maxbins=20)),
-    y='count()',
-    tooltip=['% Acerto']
-).properties(
-    title='Distribuição de % de acertos - MAT (Simulado)'
+mat_hist = grafico_histograma(
+    histograma(df_simulado_filtrado.loc[df_simulado_filtrado['Disciplina'] == 'MAT', '% Acerto']),
+    'Distribuição de % de acertos - MAT (Simulado)', '% Acerto'
 )
 
-st.altair_chart(lp_hist, use_container_width=True)
-st.altair_chart(mat_hist, use_container_width=True)
+with etapa("grafico_histogramas_simulado", df_simulado_filtrado):
+    st.altair_chart(lp_hist, use_container_width=True)
+    st.altair_chart(mat_hist, use_container_width=True)
 
 import altair as alt
 
-correlacao_lp = alt.Chart(df_merge).mark_circle(size=60).encode(
-    x='LP',
-    y='Simulado_LP',
-    tooltip=['ESCOLA', 'LP', 'Simulado_LP']
-).properties(
-    title='Correlação LP - SARESP vs Simulado (Jundiaí)'
-)
+if 'Simulado_LP' in df_merge.columns:
+    correlacao_lp = alt.Chart(amostrar_dispersao(df_merge, 'LP', 'Simulado_LP')).mark_circle(size=60).encode(
+        x='LP',
+        y='Simulado_LP',
+        tooltip=['ESCOLA', 'LP', 'Simulado_LP']
+    ).properties(
+        title=f'Correlação LP - SARESP vs Simulado ({regiao})'
+    )
 
-st.altair_chart(correlacao_lp, use_container_width=True)
+    with etapa("grafico_correlacao_lp", df_merge):
+        st.altair_chart(correlacao_lp, use_container_width=True)
 
 # Histograma - SARESP LP
-hist_lp_saresp = alt.Chart(df_saresp_jundiai_9ano).mark_bar().encode(
-    alt.X('LP', bin=alt.Bin(maxbins=20)),
-    y='count()',
-    tooltip=['LP']
-).properties(
-    title='Distribuição das médias em LP - SARESP (Jundiaí)'
+hist_lp_saresp = grafico_histograma(
+    histograma(df_saresp_filtrado['LP']),
+    f'Distribuição das médias em LP - SARESP ({regiao})', 'LP'
 )
 
 # Histograma - SARESP MAT
-hist_mat_saresp = alt.Chart(df_saresp_jundiai_9ano).mark_bar().encode(
-    alt.X('MAT', bin=alt.Bin(maxbins=20)),
-    y='count()',
-    tooltip=['MAT']
-).properties(
-    title='Distribuição das médias em MAT - SARESP (Jundiaí)'
+hist_mat_saresp = grafico_histograma(
+    histograma(df_saresp_filtrado['MAT']),
+    f'Distribuição das médias em MAT - SARESP ({regiao})', 'MAT'
 )
 
-st.altair_chart(hist_lp_saresp, use_container_width=True)
-st.altair_chart(hist_mat_saresp, use_container_width=True)
+with etapa("grafico_histogramas_saresp", df_saresp_filtrado):
+    st.altair_chart(hist_lp_saresp, use_container_width=True)
+    st.altair_chart(hist_mat_saresp, use_container_width=True)
 
-# Média geral por DE e Disciplina
-media_por_de = df_simulado_percentual.groupby(['DE', 'Disciplina'])['% Acerto'].mean().reset_index()
+# Média geral por DE e Disciplina (cubo montado uma vez por versão; a seleção só escolhe células);
+# a comparação entre DEs respeita os filtros de série, disciplina e modalidade, não os de DE/escola
+filtros_comparacao = {coluna: valores for coluna, valores in filtros.items()
+                      if coluna not in ('DE_NORM', 'ID_ESCOLA')}
+with etapa("media_por_de", df_simulado_percentual) as medicao:
+    cubo = cubo_simulado(df_simulado_percentual, coluna_taxa='% Acerto', coluna_acertos='Acertos',
+                         versao=versao_dados + ('simulado',)).selecionar(filtros_comparacao)
+    media_por_de = medicao.saida(cubo.media('soma_taxa', 'celulas', ['DE', 'Disciplina'], nome='% Acerto'))
 
 chart = alt.Chart(media_por_de).mark_bar().encode(
     x='DE:N',
@@ -171,4 +168,7 @@ chart = alt.Chart(media_por_de).mark_bar().encode(
     title='Média de % de acerto por DE e Disciplina (Simulado)'
 )
 
-st.altair_chart(chart, use_container_width=True)
\ No newline at end of file
+with etapa("grafico_media_por_de", media_por_de):
+    st.altair_chart(chart, use_container_width=True)
+
+painel_diagnostico()
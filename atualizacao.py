@@ -0,0 +1,188 @@
+"""Atualização das planilhas em segundo plano, para o espelho local de snapshots.
+
+Os dashboards leem sempre os snapshots locais (`snapshots.py`) e nunca
+esperam pelo Google Sheets, exceto na primeira vez que uma planilha é usada.
+Um `Atualizador` consulta as planilhas a cada `INTERVALO` segundos, em uma
+thread do próprio processo do app ou em um processo separado:
+
+    python atualizacao.py                  # laço, a cada SARESP_INTERVALO_ATUALIZACAO segundos
+    python atualizacao.py --uma-vez        # uma rodada (por exemplo, pelo cron)
+
+Cada consulta é condicional (ETag / If-Modified-Since), e uma planilha que
+mudou vira uma nova versão do snapshot, gravada por inteiro antes de o
+manifesto apontar para ela; as sessões abertas passam a vê-la no próximo
+rerun. Sem acesso à origem, o erro fica registrado e os snapshots atuais
+continuam valendo. A barra lateral mostra a idade dos dados e tem o botão
+"Atualizar agora", que só acorda a thread e não espera a atualização.
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from carregamento import MAX_CONEXOES
+from fontes import PLANILHAS_CORRELACAO, PLANILHAS_CORRELACAO_V2
+from snapshots import DIRETORIO_SNAPSHOTS, atualizar_snapshot, chave_da_origem, ler_manifesto
+
+# Segundos entre duas atualizações automáticas (0 desliga; o botão continua valendo)
+INTERVALO = float(os.environ.get("SARESP_INTERVALO_ATUALIZACAO", "900"))
+
+
+def origens_configuradas():
+    """Planilhas usadas pelas páginas (cada uma uma única vez)"""
+    return list(dict.fromkeys([*PLANILHAS_CORRELACAO.values(), *PLANILHAS_CORRELACAO_V2.values()]))
+
+
+class Atualizador:
+    """Atualiza os snapshots das origens periodicamente ou sob pedido, em uma thread"""
+
+    def __init__(self, origens, intervalo=INTERVALO, diretorio=None):
+        self.origens = list(origens)
+        self.intervalo = intervalo
+        self.diretorio = diretorio
+        self._pedido = threading.Event()
+        self._trava = threading.Lock()
+        self._thread = None
+        self._estado = {"em_andamento": False, "inicio": None, "fim": None, "atualizadas": [], "erros": {}}
+
+    def iniciar(self):
+        """Inicia a thread (uma vez só); a primeira rodada automática é depois de um intervalo"""
+        with self._trava:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._laco, name="atualizador-snapshots", daemon=True)
+                self._thread.start()
+
+    def pedir(self):
+        """Pede uma atualização agora, sem esperar por ela"""
+        self._pedido.set()
+        self.iniciar()
+
+    def _laco(self):
+        while True:
+            self._pedido.wait(self.intervalo if self.intervalo > 0 else None)
+            self._pedido.clear()
+            self.executar()
+
+    def executar(self):
+        """Uma rodada de atualização de todas as origens; devolve o estado ao final"""
+        with self._trava:
+            ocupado = self._estado["em_andamento"]
+            if not ocupado:
+                self._estado.update(em_andamento=True, inicio=time.time())
+        if ocupado:
+            # Outra rodada (automática ou pedida) já está em andamento
+            return self.estado()
+
+        def atualizar(origem):
+            try:
+                return origem, atualizar_snapshot(origem, diretorio=self.diretorio), None
+            except Exception as erro:
+                # Origem fora do ar, sem rede ou planilha fora do esquema: fica a versão atual
+                return origem, False, f"{type(erro).__name__}: {erro}"
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONEXOES, len(self.origens)))) as pool:
+            resultados = list(pool.map(atualizar, self.origens))
+
+        with self._trava:
+            self._estado.update(
+                em_andamento=False, fim=time.time(),
+                atualizadas=[origem for origem, atualizada, _ in resultados if atualizada],
+                erros={origem: erro for origem, _, erro in resultados if erro},
+            )
+        return self.estado()
+
+    def estado(self):
+        """Cópia do estado da última rodada (ou da que está em andamento) e se há pedido na fila"""
+        with self._trava:
+            return dict(self._estado, atualizadas=list(self._estado["atualizadas"]),
+                        erros=dict(self._estado["erros"]), pendente=self._pedido.is_set())
+
+
+_atualizador = None
+_trava_atualizador = threading.Lock()
+
+
+def atualizador():
+    """Atualizador das planilhas configuradas, único no processo"""
+    global _atualizador
+    with _trava_atualizador:
+        if _atualizador is None:
+            _atualizador = Atualizador(origens_configuradas())
+        return _atualizador
+
+
+def idade_dos_dados(origens, diretorio=None, agora=None):
+    """Segundos desde a última consulta bem-sucedida da origem menos recente (None se faltar alguma)"""
+    manifesto = ler_manifesto(diretorio)
+    agora = agora or datetime.now(timezone.utc)
+    idades = []
+    for origem in origens:
+        entrada = manifesto.get(chave_da_origem(origem))
+        if entrada is None:
+            return None
+        verificado = entrada.get("verificado_em") or entrada["atualizado_em"]
+        idades.append((agora - datetime.fromisoformat(verificado)).total_seconds())
+    return max(idades, default=None)
+
+
+def descrever_idade(segundos):
+    """Idade em texto curto ("agora", "há 12 min", "há 3 h", "há 2 dias")"""
+    if segundos < 60:
+        return "agora"
+    if segundos < 3600:
+        return f"há {segundos // 60:.0f} min"
+    if segundos < 86400:
+        return f"há {segundos // 3600:.0f} h"
+    dias = segundos // 86400
+    return f"há {dias:.0f} dia" + ("s" if dias >= 2 else "")
+
+
+def painel_atualizacao():
+    """Idade dos dados e botão "Atualizar agora" na barra lateral; inicia o atualizador"""
+    import streamlit as st
+
+    atual = atualizador()
+    if atual.intervalo > 0:
+        atual.iniciar()
+
+    if st.sidebar.button("Atualizar agora", key="atualizar_agora",
+                         help="Consulta as planilhas em segundo plano; a página continua usando a cópia local"):
+        atual.pedir()
+
+    estado = atual.estado()
+    idade = idade_dos_dados(atual.origens, atual.diretorio)
+    texto = ("Planilhas ainda não baixadas" if idade is None
+             else f"Dados verificados {descrever_idade(idade)}")
+    if estado["em_andamento"] or estado["pendente"]:
+        texto += " · atualização em andamento (os dados novos aparecem na próxima interação)"
+    st.sidebar.caption(texto)
+    if estado["erros"] and not estado["em_andamento"]:
+        st.sidebar.warning(f"{len(estado['erros'])} planilha(s) sem acesso na última atualização; "
+                           "usando a cópia local.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Atualiza o espelho local das planilhas periodicamente")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO or 900,
+                        help="segundos entre atualizações (padrão: SARESP_INTERVALO_ATUALIZACAO ou 900)")
+    parser.add_argument("--uma-vez", action="store_true", help="faz uma única rodada e sai")
+    parser.add_argument("--diretorio", default=DIRETORIO_SNAPSHOTS)
+    args = parser.parse_args(argv)
+
+    trabalho = Atualizador(origens_configuradas(), args.intervalo, args.diretorio)
+    while True:
+        estado = trabalho.executar()
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {len(estado['atualizadas'])} atualizadas, "
+              f"{len(estado['erros'])} com erro, {estado['fim'] - estado['inicio']:.1f}s")
+        for origem, erro in estado["erros"].items():
+            print(f"  {origem}: {erro}")
+        if args.uma_vez:
+            return 1 if estado["erros"] else 0
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
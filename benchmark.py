@@ -0,0 +1,341 @@
+"""Benchmark dos pipelines dos dashboards com dados sintéticos.
+
+Mede cada etapa (carga, pontuação, respostas compactas, pivot, merge,
+regressão, bootstrap das diferenças por raça e montagem dos gráficos) em
+várias escalas dos dados, registrando tempo e pico de memória (e a memória por
+milhão de respostas de cada formato das respostas do Simulado), e grava o
+resultado em JSON para comparar entre commits. Roda sem internet.
+
+    python benchmark.py --escalas 10 100 1000
+    python benchmark.py --escalas 10 100 --comparar resultados_benchmark/anterior.json
+    python benchmark.py --escalas 10 --paginas
+    python benchmark.py --escalas 100 --lote 1 4
+
+Com `--paginas`, cada página do app.py também é aberta em um interpretador novo
+(partida a frio, incluindo os imports da página) e reexecutada algumas vezes
+(tempo de rerun com caches e módulos já carregados). Com `--lote`, o
+processamento em lote de todas as DEs (`lote.py`) é medido com cada número de
+processos informado.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import dados_graficos
+import cubo
+import diferencas
+import estatisticas
+import lote
+import respostas as respostas_compactas
+from dados_sinteticos import (gerar_escolas, gerar_microdados, gerar_raca, gerar_respostas,
+                              gerar_saresp, preparar_ambiente)
+from escolas import anexar_id_escola, atualizar_dimensao
+from pontuacao import calcular_acertos
+from raca import composicao_racial
+from snapshots import ler_snapshot, salvar_snapshot
+
+DIRETORIO_RESULTADOS = "resultados_benchmark"
+PAGINAS = [
+    "paginas/analise_geral.py",
+    "paginas/comparativo.py",
+    "Correlacao.py",
+    "Correlacao_v2.py",
+]
+
+# Executado em um interpretador novo para cada página: mede a partida a frio
+# (primeira execução, com os imports da página) e as reexecuções seguintes
+_CODIGO_PAGINA = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app, pagina, repeticoes = sys.argv[1], sys.argv[2], int(sys.argv[3])
+modulos = len(sys.modules)
+at = AppTest.from_file(app, default_timeout=600)
+at.switch_page(pagina)
+inicio = time.perf_counter()
+at.run()
+frio = time.perf_counter() - inicio
+novos = len(sys.modules) - modulos
+reruns = []
+for _ in range(repeticoes):
+    inicio = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - inicio)
+print(json.dumps({"partida_fria": frio, "rerun": min(reruns), "modulos_importados": novos,
+                  "erro": next((str(erro.value) for erro in at.exception), None)}))
+"""
+
+
+def medir(funcao, repeticoes=3):
+    """Melhor tempo de `repeticoes` execuções e pico de memória de uma execução extra"""
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    # A memória é medida à parte porque o tracemalloc deixa a execução mais lenta
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, min(tempos), pico / 1024 ** 2
+
+
+def rodar_escala(escala, semente, diretorio, repeticoes):
+    """Executa todas as etapas em uma escala e retorna a lista de medições"""
+    escolas = gerar_escolas(escala, semente)
+    respostas = gerar_respostas(escala, semente, escolas)
+    saresp = gerar_saresp(escala, semente, escolas)
+    raca = gerar_raca(escala, semente, escolas)
+    microdados = gerar_microdados(escala, semente, escolas)
+
+    caminho_respostas = os.path.join(diretorio, "respostas.csv")
+    respostas.to_csv(caminho_respostas, index=False)
+    salvar_snapshot("respostas", pd.read_csv(caminho_respostas), caminho_respostas, "",
+                    diretorio=diretorio)
+
+    medicoes = []
+
+    def etapa(nome, funcao, linhas_entrada):
+        resultado, segundos, pico_mb = medir(funcao, repeticoes)
+        medicoes.append({
+            "escala": escala, "etapa": nome, "segundos": round(segundos, 6),
+            "pico_mb": round(pico_mb, 3), "linhas_entrada": linhas_entrada,
+            "linhas_saida": len(resultado) if isinstance(resultado, pd.DataFrame) else None,
+        })
+        return resultado
+
+    etapa("carga_csv", lambda: pd.read_csv(caminho_respostas), len(respostas))
+    respostas_tipadas = etapa("carga_snapshot", lambda: ler_snapshot("respostas", diretorio),
+                              len(respostas))
+
+    acertos = etapa("pontuacao", lambda: calcular_acertos(respostas_tipadas), len(respostas))
+
+    # Respostas compactas: construção e pontuação, e a memória por milhão de respostas
+    # de cada representação (textos do CSV, snapshot tipado e formato compacto)
+    compactas = etapa("compactar", lambda: respostas_compactas.RespostasCompactas.de_respostas(
+        respostas_tipadas), len(respostas))
+    medicoes[-1]["linhas_saida"] = len(compactas.grupos)
+    etapa("pontuacao_bits", compactas.acertos, len(respostas))
+    milhoes = len(respostas) / 1e6
+    medicoes[-1]["mb_por_milhao"] = {
+        "texto": round(pd.read_csv(caminho_respostas).memory_usage(deep=True).sum() / 1024 ** 2 / milhoes, 3),
+        "tipado": round(respostas_tipadas.memory_usage(deep=True).sum() / 1024 ** 2 / milhoes, 3),
+        "compacto": round(compactas.memoria() / 1024 ** 2 / milhoes, 3),
+    }
+
+    def pivot():
+        tabela = acertos.pivot(index=['DE', 'ESCOLA', 'SERIE_ANO'], columns='Disciplina',
+                               values='Taxa_Acerto').reset_index()
+        tabela.columns.name = None
+        return tabela
+    etapa("pivot", pivot, len(acertos))
+
+    def merge():
+        dimensao = atualizar_dimensao([respostas_tipadas, saresp, raca], diretorio)
+        simulado_agg = anexar_id_escola(acertos, dimensao).groupby(
+            ['SERIE_ANO', 'ID_ESCOLA', 'Disciplina'], observed=True)['Taxa_Acerto'].mean().reset_index()
+        saresp_agg = anexar_id_escola(saresp, dimensao).groupby(
+            ['SERIE_ANO', 'ID_ESCOLA'], observed=True)[['LP', 'MAT']].mean().reset_index()
+        combinado = simulado_agg.merge(saresp_agg, on=['SERIE_ANO', 'ID_ESCOLA'], how='inner')
+        return combinado.merge(anexar_id_escola(raca, dimensao)[['ID_ESCOLA', 'Total']],
+                               on='ID_ESCOLA', how='left')
+    etapa("merge", merge, len(acertos) + len(saresp) + len(raca))
+
+    etapa("raca", lambda: composicao_racial(raca), len(raca))
+
+    medidas_cubo = ['Total_Respostas', 'Total_Acertos', 'Taxa_Acerto', 'celulas']
+    linhas_cubo = anexar_id_escola(acertos, atualizar_dimensao([respostas_tipadas], diretorio)).assign(celulas=1)
+    celulas = etapa("cubo", lambda: cubo.Cubo.de_linhas(linhas_cubo, cubo.DIMENSOES, medidas_cubo).celulas,
+                    len(linhas_cubo))
+
+    def rollups():
+        cubo_acertos = cubo.Cubo(celulas, [dimensao for dimensao in cubo.DIMENSOES if dimensao in celulas],
+                                 medidas_cubo)
+        return pd.concat([cubo_acertos.media('Taxa_Acerto', 'celulas', dimensoes) for dimensoes in
+                          (['DE', 'Disciplina'], ['SERIE_ANO', 'Disciplina'], ['Disciplina'], [])])
+    etapa("rollups_cubo", rollups, len(celulas))
+
+    def regressao():
+        # Limpa a memorização para medir o ajuste de verdade
+        estatisticas._memoria.clear()
+        return estatisticas.regressao_por_grupo(microdados, 'Simulado', 'SARESP', ['DE'])
+    etapa("regressao", regressao, len(microdados))
+
+    # Diferenças de médias e medianas por escola, com IC bootstrap (sem o cache compartilhado)
+    etapa("bootstrap",
+          lambda: diferencas.calcular_diferencas(microdados, 'SARESP', ['ESCOLA']), len(microdados))
+
+    def graficos():
+        caixas, outliers = dados_graficos.quantis_boxplot(microdados, 'Race', 'SARESP')
+        especificacoes = [
+            dados_graficos.grafico_histograma(dados_graficos.histograma(microdados['SARESP']),
+                                              "SARESP", "SARESP").to_dict(),
+            dados_graficos.grafico_boxplot(caixas, outliers, 'Race', 'SARESP', "Boxplot").to_dict(),
+            dados_graficos.grafico_histograma(dados_graficos.histograma(microdados['Simulado']),
+                                              "Simulado", "Simulado").to_dict(),
+        ]
+        dispersao = dados_graficos.amostrar_dispersao(microdados, 'Simulado', 'SARESP')
+        especificacoes.append({"values": dispersao[['Simulado', 'SARESP']].to_dict("records")})
+        return json.dumps(especificacoes, default=str)
+    especificacao = etapa("graficos", graficos, len(microdados))
+    medicoes[-1]["bytes_saida"] = len(especificacao)
+    return medicoes
+
+
+def medir_paginas(escala, semente, repeticoes):
+    """Partida a frio e tempo de rerun de cada página do app.py com dados sintéticos"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    medicoes = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        ambiente = dict(os.environ, SARESP_SNAPSHOTS=preparar_ambiente(diretorio, escala, semente))
+        for pagina in PAGINAS:
+            processo = subprocess.run(
+                [sys.executable, "-c", _CODIGO_PAGINA, os.path.join(raiz, "app.py"), pagina,
+                 str(max(repeticoes, 1))],
+                cwd=diretorio, env=ambiente, capture_output=True, text=True)
+            if processo.returncode != 0:
+                medicao = {"erro": processo.stderr.strip().splitlines()[-1:]}
+            else:
+                medicao = json.loads(processo.stdout.strip().splitlines()[-1])
+            medicoes.append({"escala": escala, "pagina": pagina, **medicao})
+    return medicoes
+
+
+def medir_lote(escala, semente, processos):
+    """Tempo do lote com todas as DEs da escala para cada número de processos"""
+    medicoes = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        snapshots = preparar_ambiente(diretorio, escala, semente, estadual=True)
+        for quantidade in processos:
+            relatorio = lote.executar_lote(os.path.join(diretorio, f"lote_{quantidade}"), quantidade,
+                                           snapshots=snapshots, verboso=False)
+            medicoes.append({
+                "escala": escala, "processos": quantidade, "processos_usados": relatorio["processos_usados"],
+                "des": len(relatorio["des"]),
+                "segundos_preparo": relatorio["segundos_preparo"],
+                "segundos": relatorio["segundos_total"],
+                "erros": sum(1 for resumo in relatorio["des"] if resumo["erro"]),
+            })
+    return medicoes
+
+
+def commit_atual():
+    """Hash curto do commit atual (None fora de um repositório git)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    """Imprime a razão de tempo (atual / anterior) de cada etapa e escala"""
+    antigos = {(medicao["escala"], medicao["etapa"]): medicao for medicao in anterior["resultados"]}
+    print(f"\nComparação com {anterior.get('commit')} ({anterior.get('data')}):")
+    for medicao in atual["resultados"]:
+        antigo = antigos.get((medicao["escala"], medicao["etapa"]))
+        if antigo is None or not antigo["segundos"]:
+            continue
+        razao = medicao["segundos"] / antigo["segundos"]
+        print(f"  escala {medicao['escala']:>6} {medicao['etapa']:<15} "
+              f"{antigo['segundos']:.4f}s -> {medicao['segundos']:.4f}s ({razao:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos pipelines dos dashboards")
+    parser.add_argument("--escalas", type=float, nargs="+", default=[10, 100],
+                        help="múltiplos do tamanho do piloto (padrão: 10 100)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=None, help="arquivo JSON de saída")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    parser.add_argument("--paginas", action="store_true",
+                        help="mede também a partida a frio e o rerun de cada página do app")
+    parser.add_argument("--lote", type=int, nargs="*", default=None, metavar="PROCESSOS",
+                        help="mede o lote de todas as DEs com estes números de processos (padrão: 1 e CPUs)")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        for escala in args.escalas:
+            escala = int(escala) if float(escala).is_integer() else escala
+            for medicao in rodar_escala(escala, args.semente, diretorio, args.repeticoes):
+                print(f"escala {medicao['escala']:>6} {medicao['etapa']:<15} "
+                      f"{medicao['segundos']:>9.4f}s {medicao['pico_mb']:>9.1f} MB "
+                      f"({medicao['linhas_entrada']} -> {medicao['linhas_saida'] or '-'} linhas)")
+                if "mb_por_milhao" in medicao:
+                    print(f"{'':>13} MB por milhão de respostas: "
+                          + ", ".join(f"{nome} {mb:.2f}" for nome, mb in medicao["mb_por_milhao"].items()))
+                resultados.append(medicao)
+
+    paginas = []
+    if args.paginas:
+        for escala in args.escalas:
+            escala = int(escala) if float(escala).is_integer() else escala
+            for medicao in medir_paginas(escala, args.semente, args.repeticoes):
+                if medicao.get("erro") and "partida_fria" not in medicao:
+                    print(f"escala {escala:>6} {medicao['pagina']:<28} falhou: {medicao['erro']}")
+                else:
+                    print(f"escala {escala:>6} {medicao['pagina']:<28} "
+                          f"partida a frio {medicao['partida_fria']:>7.3f}s  "
+                          f"rerun {medicao['rerun']:>7.3f}s  "
+                          f"{medicao['modulos_importados']} módulos"
+                          + (f"  (erro: {medicao['erro']})" if medicao["erro"] else ""))
+                paginas.append(medicao)
+
+    lotes = []
+    if args.lote is not None:
+        for escala in args.escalas:
+            escala = int(escala) if float(escala).is_integer() else escala
+            for medicao in medir_lote(escala, args.semente, args.lote or [1, os.cpu_count() or 1]):
+                print(f"escala {escala:>6} lote com {medicao['processos']:>2} processos "
+                      f"({medicao['processos_usados']} usados): "
+                      f"{medicao['des']} DEs em {medicao['segundos']:.2f}s "
+                      f"(preparo {medicao['segundos_preparo']:.2f}s, {medicao['erros']} erros)")
+                lotes.append(medicao)
+
+    commit = commit_atual()
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "semente": args.semente,
+        "resultados": resultados,
+        "paginas": paginas,
+        "lote": lotes,
+    }
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS,
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit or 'sem-commit'}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(relatorio, json.load(arquivo))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Cache compartilhado entre as sessões do Streamlit (e, com disco, entre processos).
+
+Cada sessão do Streamlit roda o script em uma thread própria do mesmo
+processo. Sem um cache comum, cada coordenador que abre o dashboard lê de novo
+os snapshots e refaz a pontuação e os merges, e cada sessão segura a sua cópia
+dos DataFrames. Aqui os dados carregados e agregados ficam uma única vez na
+memória do processo e o mesmo objeto é devolvido a todas as sessões, então a
+memória não cresce com o número de sessões. Os valores devolvidos são
+compartilhados: quem os recebe não deve alterá-los no lugar.
+
+- Tamanho limitado: os itens menos usados saem quando o total estimado passa
+  de `SARESP_CACHE_MB` (padrão 1024 MB).
+- Voo único: várias sessões pedindo a mesma chave ao mesmo tempo esperam um
+  único cálculo em vez de repeti-lo.
+- Disco opcional: com `SARESP_CACHE_DIRETORIO`, os itens também são gravados em
+  disco (pickle). Outros processos (vários workers do servidor) os leem de lá,
+  e uma trava por arquivo faz o voo único valer também entre processos. O disco
+  é limitado por `SARESP_CACHE_DISCO_MB` (padrão 4096 MB).
+- Métricas: acertos (memória e disco), cálculos, esperas e remoções, exibidas no
+  painel de diagnóstico.
+
+As chaves devem mudar quando o conteúdo muda, por exemplo incluindo a versão do
+snapshot de origem; não há expiração por tempo.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+LIMITE_MB = float(os.environ.get("SARESP_CACHE_MB", "1024"))
+DIRETORIO_CACHE = os.environ.get("SARESP_CACHE_DIRETORIO") or None
+LIMITE_DISCO_MB = float(os.environ.get("SARESP_CACHE_DISCO_MB", "4096"))
+# Tempo máximo de espera por outro processo calculando a mesma chave; depois disso a
+# trava é considerada abandonada (processo morto) e o cálculo é feito aqui
+ESPERA_MAXIMA_DISCO = 300.0
+
+
+def tamanho(valor):
+    """Estimativa em bytes do espaço ocupado por um valor do cache"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(valor.memory_usage(deep=True, index=True).sum()
+                   if isinstance(valor, pd.DataFrame) else valor.memory_usage(deep=True, index=True))
+    if isinstance(valor, (bytes, bytearray, str)):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(tamanho(item) for item in valor.values()) + sys.getsizeof(valor)
+    if isinstance(valor, (list, tuple)):
+        return sum(tamanho(item) for item in valor) + sys.getsizeof(valor)
+    if hasattr(valor, "__dict__"):
+        return tamanho(vars(valor)) + sys.getsizeof(valor)
+    return sys.getsizeof(valor)
+
+
+class _Voo:
+    """Cálculo em andamento de uma chave, aguardado pelas demais sessões"""
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class CacheCompartilhado:
+    """LRU limitado por bytes, com voo único e camada opcional em disco"""
+
+    def __init__(self, limite_mb=LIMITE_MB, diretorio=DIRETORIO_CACHE, limite_disco_mb=LIMITE_DISCO_MB):
+        self.limite = int(limite_mb * 1024 ** 2)
+        self.diretorio = diretorio
+        self.limite_disco = int(limite_disco_mb * 1024 ** 2)
+        self._itens = OrderedDict()  # chave -> (valor, bytes)
+        self._bytes = 0
+        self._voos = {}
+        self._trava = threading.Lock()
+        self._contadores = dict.fromkeys(
+            ["acertos", "acertos_disco", "calculos", "esperas", "remocoes", "grandes_demais"], 0)
+
+    # Memória
+
+    def _guardar(self, chave, valor):
+        """Guarda na memória e remove os menos usados até caber (chamar com a trava)"""
+        bytes_valor = tamanho(valor)
+        if bytes_valor > self.limite:
+            self._contadores["grandes_demais"] += 1
+            return
+        if chave in self._itens:
+            self._bytes -= self._itens.pop(chave)[1]
+        self._itens[chave] = (valor, bytes_valor)
+        self._bytes += bytes_valor
+        while self._bytes > self.limite and len(self._itens) > 1:
+            _, (_, removidos) = self._itens.popitem(last=False)
+            self._bytes -= removidos
+            self._contadores["remocoes"] += 1
+
+    def obter(self, chave, calcular):
+        """Valor da chave; calcula com `calcular()` uma única vez se ainda não estiver no cache"""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._contadores["acertos"] += 1
+                return self._itens[chave][0]
+            voo = self._voos.get(chave)
+            dono = voo is None
+            if dono:
+                voo = self._voos[chave] = _Voo()
+            else:
+                self._contadores["esperas"] += 1
+
+        if not dono:
+            voo.pronto.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.valor
+
+        try:
+            valor = self._obter_do_disco(chave, calcular)
+        except BaseException as erro:
+            voo.erro = erro
+            with self._trava:
+                del self._voos[chave]
+            voo.pronto.set()
+            raise
+        voo.valor = valor
+        with self._trava:
+            self._guardar(chave, valor)
+            del self._voos[chave]
+        voo.pronto.set()
+        return valor
+
+    # Disco
+
+    def _caminho(self, chave):
+        nome = hashlib.sha1(repr(chave).encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio, f"{nome}.pkl")
+
+    def _ler(self, caminho):
+        try:
+            with open(caminho, "rb") as arquivo:
+                valor = pickle.load(arquivo)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None, False
+        try:
+            os.utime(caminho)  # marca o uso para a remoção dos menos usados
+        except OSError:
+            pass
+        with self._trava:
+            self._contadores["acertos_disco"] += 1
+        return valor, True
+
+    def _calcular(self, calcular):
+        with self._trava:
+            self._contadores["calculos"] += 1
+        return calcular()
+
+    def _obter_do_disco(self, chave, calcular):
+        """Lê do disco, ou calcula (com trava entre processos) e grava no disco"""
+        if not self.diretorio:
+            return self._calcular(calcular)
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(chave)
+        trava = f"{caminho}.trava"
+        inicio = time.monotonic()
+        while True:
+            valor, achado = self._ler(caminho)
+            if achado:
+                return valor
+            try:
+                descritor = os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                # Outro processo está calculando a mesma chave: espera o arquivo aparecer
+                if time.monotonic() - inicio > ESPERA_MAXIMA_DISCO:
+                    self._remover(trava)
+                    inicio = time.monotonic()
+                time.sleep(0.05)
+        try:
+            os.close(descritor)
+            # Outro processo pode ter gravado entre a leitura e a trava
+            valor, achado = self._ler(caminho)
+            if achado:
+                return valor
+            valor = self._calcular(calcular)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            try:
+                with open(temporario, "wb") as arquivo:
+                    pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, caminho)
+                self._limitar_disco()
+            except (OSError, pickle.PicklingError, TypeError, AttributeError):
+                # Sem disco para este valor (sem espaço, ou não serializável): fica só na memória
+                self._remover(temporario)
+            return valor
+        finally:
+            self._remover(trava)
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+    def _limitar_disco(self):
+        """Remove os arquivos usados há mais tempo até o disco caber no limite"""
+        arquivos = []
+        for entrada in os.scandir(self.diretorio):
+            if entrada.name.endswith(".pkl"):
+                estado = entrada.stat()
+                arquivos.append((estado.st_mtime, estado.st_size, entrada.path))
+        total = sum(tamanho_arquivo for _, tamanho_arquivo, _ in arquivos)
+        for _, tamanho_arquivo, caminho in sorted(arquivos):
+            if total <= self.limite_disco:
+                break
+            self._remover(caminho)
+            total -= tamanho_arquivo
+
+    # Métricas
+
+    def metricas(self):
+        """Contadores, itens e bytes ocupados na memória"""
+        with self._trava:
+            consultas = self._contadores["acertos"] + self._contadores["calculos"] + \
+                self._contadores["acertos_disco"] + self._contadores["esperas"]
+            return dict(self._contadores, itens=len(self._itens), bytes=self._bytes, limite_bytes=self.limite,
+                        taxa_acerto=(consultas - self._contadores["calculos"]) / consultas if consultas else None,
+                        disco=self.diretorio)
+
+    def limpar(self):
+        """Esvazia a memória (o disco é mantido) e zera os contadores"""
+        with self._trava:
+            self._itens.clear()
+            self._bytes = 0
+            for nome in self._contadores:
+                self._contadores[nome] = 0
+
+
+compartilhado = CacheCompartilhado()
+
+
+def obter(chave, calcular):
+    """`CacheCompartilhado.obter` no cache do processo"""
+    return compartilhado.obter(chave, calcular)
+
+
+def metricas():
+    return compartilhado.metricas()
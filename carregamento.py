@@ -0,0 +1,68 @@
+"""Download das planilhas do Google Sheets usadas pelos dashboards.
+
+Todos os downloads compartilham uma única sessão HTTP (conexões
+reaproveitadas), então os pools de threads de `snapshots.py` e
+`atualizacao.py` baixam várias planilhas em paralelo sem abrir uma conexão
+por pedido. Cada download é condicional (ETag / If-Modified-Since): uma
+planilha que não mudou volta como 304, sem conteúdo.
+"""
+
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Pode ser trocada por um servidor HTTP local (ex.: testes ou espelho offline)
+URL_BASE = os.environ.get("SARESP_URL_BASE", "https://docs.google.com")
+MAX_CONEXOES = 8
+TIMEOUT = 30
+
+_sessao = None
+_trava = threading.Lock()
+
+
+def extrair_id(url_ou_id):
+    """Extrai o ID de uma URL do Google Sheets (ou devolve o próprio ID)"""
+    partes = urlparse(url_ou_id).path.split("/")
+    if "d" in partes and partes.index("d") + 1 < len(partes):
+        return partes[partes.index("d") + 1]
+    return url_ou_id
+
+
+def url_exportacao(id_planilha, url_base=None):
+    """Monta a URL de exportação em CSV de uma planilha"""
+    base = (url_base or URL_BASE).rstrip("/")
+    return f"{base}/spreadsheets/d/{id_planilha}/export?format=csv"
+
+
+def obter_sessao():
+    """Retorna a sessão HTTP compartilhada, com pool de conexões"""
+    global _sessao
+    with _trava:
+        if _sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=MAX_CONEXOES,
+                                    pool_maxsize=MAX_CONEXOES)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            _sessao = sessao
+        return _sessao
+
+
+def baixar_sheet(id_planilha, etag=None, modificado_em=None, url_base=None):
+    """Baixa o CSV de uma planilha; retorna (conteúdo ou None se não mudou, etag, modificado_em)"""
+    cabecalhos = {}
+    if etag:
+        cabecalhos["If-None-Match"] = etag
+    if modificado_em:
+        cabecalhos["If-Modified-Since"] = modificado_em
+
+    resposta = obter_sessao().get(url_exportacao(extrair_id(id_planilha), url_base),
+                                  headers=cabecalhos, timeout=TIMEOUT)
+    if resposta.status_code == 304:
+        return None, etag, modificado_em
+    resposta.raise_for_status()
+    return (resposta.content, resposta.headers.get("ETag"),
+            resposta.headers.get("Last-Modified"))
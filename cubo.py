@@ -0,0 +1,140 @@
+"""Cubo de agregados no grão DE × ESCOLA × SERIE_ANO × Disciplina.
+
+As páginas calculam várias médias que se sobrepõem (por DE, por série, por
+disciplina, por escola), cada uma com um `groupby` sobre as linhas. O cubo
+guarda somas e contagens uma única vez no menor grão; qualquer agregação mais
+grossa (e qualquer filtro) soma células em vez de reler as linhas, então custa
+o mesmo independentemente do número de linhas de origem. Médias saem de
+razões de somas: a média por DE de uma taxa por escola é soma das taxas /
+número de células, idêntica ao `groupby().mean()` original.
+
+A escola entra no cubo pelo `ID_ESCOLA` da dimensão de escolas. As colunas
+dos filtros da barra lateral (`DE_NORM`, `MODALIDADE`) também são dimensões:
+as páginas montam o cubo uma vez por versão dos snapshots, a partir das
+linhas sem filtro, e respondem a cada seleção com `selecionar`, que só
+escolhe células.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DIMENSOES = ['DE', 'DE_NORM', 'ID_ESCOLA', 'SERIE_ANO', 'Disciplina', 'MODALIDADE']
+MAX_CUBOS_MEMORIZADOS = 16
+
+_memoria = OrderedDict()
+_trava = threading.Lock()
+
+
+class Cubo:
+    """Somas de cada medida por célula; agregações mais grossas somam células"""
+
+    def __init__(self, celulas, dimensoes, medidas):
+        self.celulas = celulas
+        self.dimensoes = list(dimensoes)
+        self.medidas = list(medidas)
+
+    @classmethod
+    def de_linhas(cls, df, dimensoes, medidas):
+        """Monta o cubo a partir das linhas (uma única agregação)"""
+        dimensoes = [dimensao for dimensao in dimensoes if dimensao in df.columns]
+        celulas = (df[dimensoes + medidas]
+                   .astype({medida: 'float64' for medida in medidas})
+                   .groupby(dimensoes, observed=True, dropna=False)[medidas].sum()
+                   .reset_index())
+        return cls(celulas, dimensoes, medidas)
+
+    def __len__(self):
+        return len(self.celulas)
+
+    def _mascara(self, filtros):
+        mascara = np.ones(len(self.celulas), dtype=bool)
+        for dimensao, valores in filtros.items():
+            if dimensao not in self.dimensoes:
+                raise KeyError(f"'{dimensao}' não é dimensão do cubo ({', '.join(self.dimensoes)})")
+            if np.ndim(valores) == 0:
+                valores = [valores]
+            mascara &= self.celulas[dimensao].isin(valores).to_numpy()
+        return mascara
+
+    def filtrar(self, **filtros):
+        """Cubo só com as células que atendem aos filtros (dimensão=valor ou lista de valores)"""
+        if not filtros:
+            return self
+        return Cubo(self.celulas[self._mascara(filtros)].reset_index(drop=True),
+                    self.dimensoes, self.medidas)
+
+    def selecionar(self, filtros):
+        """`filtrar` com a seleção da barra lateral ({coluna: valores}); colunas que não são
+        dimensões do cubo e seleções vazias são ignoradas, como em `IndiceGrupos.fatiar`"""
+        return self.filtrar(**{dimensao: list(valores) for dimensao, valores in filtros.items()
+                               if dimensao in self.dimensoes and len(valores)})
+
+    def somar(self, dimensoes=None, **filtros):
+        """Soma das medidas por `dimensoes` (todas as células juntas se vazio)"""
+        dimensoes = list(dimensoes or [])
+        celulas = self.celulas[self._mascara(filtros)] if filtros else self.celulas
+        if not dimensoes:
+            return celulas[self.medidas].sum().to_frame().T
+        return celulas.groupby(dimensoes, observed=True)[self.medidas].sum().reset_index()
+
+    def media(self, soma, contagem, dimensoes=None, nome=None, **filtros):
+        """Razão soma / contagem por `dimensoes`, na coluna `nome` (padrão: `soma`)"""
+        somas = self.somar(dimensoes, **filtros)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            somas[nome or soma] = somas[soma] / somas[contagem].replace(0, np.nan)
+        colunas = list(dimensoes or []) + [nome or soma]
+        return somas[colunas]
+
+
+def construir(df, dimensoes, medidas, versao=None):
+    """`Cubo.de_linhas` memorizado pela `versao` dos dados (sem versão, monta sem memorizar)"""
+    dimensoes = [dimensao for dimensao in dimensoes if dimensao in df.columns]
+    if versao is None:
+        return Cubo.de_linhas(df, dimensoes, medidas)
+    chave = (versao, tuple(dimensoes), tuple(medidas))
+    with _trava:
+        if chave in _memoria:
+            _memoria.move_to_end(chave)
+            return _memoria[chave]
+
+    cubo = Cubo.de_linhas(df, dimensoes, medidas)
+    with _trava:
+        _memoria[chave] = cubo
+        while len(_memoria) > MAX_CUBOS_MEMORIZADOS:
+            _memoria.popitem(last=False)
+    return cubo
+
+
+def cubo_simulado(acertos, coluna_taxa='Taxa_Acerto', coluna_acertos='Total_Acertos', versao=None):
+    """Cubo das contagens do Simulado (saída de `calcular_acertos` com ID_ESCOLA).
+
+    Medidas: respostas, acertos, soma das taxas e número de células (para a
+    média simples das taxas por escola).
+    """
+    linhas = pd.DataFrame({
+        **{dimensao: acertos[dimensao] for dimensao in DIMENSOES if dimensao in acertos.columns},
+        'respostas': acertos['Total_Respostas'],
+        'acertos': acertos[coluna_acertos],
+        'soma_taxa': acertos[coluna_taxa],
+        'celulas': 1,
+    })
+    return construir(linhas, DIMENSOES, ['respostas', 'acertos', 'soma_taxa', 'celulas'], versao)
+
+
+def cubo_saresp(saresp, disciplinas=('LP', 'MAT'), versao=None):
+    """Cubo das médias do SARESP por escola, com as disciplinas (colunas LP/MAT) como dimensão"""
+    chaves = [dimensao for dimensao in DIMENSOES if dimensao in saresp.columns]
+    disciplinas = [disciplina for disciplina in disciplinas if disciplina in saresp.columns]
+    linhas = saresp[chaves + disciplinas].melt(id_vars=chaves, value_vars=disciplinas,
+                                               var_name='Disciplina', value_name='nota')
+    linhas['n_nota'] = linhas['nota'].notna().astype('int64')
+    linhas['soma_nota'] = linhas['nota'].fillna(0)
+    return construir(linhas, DIMENSOES, ['soma_nota', 'n_nota'], versao)
+
+
+def cubo_raca(raca, colunas, versao=None):
+    """Cubo das contagens de alunos por raça/cor (grão DE × escola)"""
+    return construir(raca, DIMENSOES, list(colunas), versao)
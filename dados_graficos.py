@@ -0,0 +1,130 @@
+"""Pré-agregação dos dados dos gráficos Altair.
+
+Em vez de enviar todas as linhas para o navegador (que faria o binning e os
+quartis no Vega-Lite), os histogramas, boxplots e dispersões recebem tabelas
+pequenas já agregadas no servidor. `LIMITE_LINHAS_GRAFICO` controla quantas
+linhas cada gráfico pode enviar, no máximo.
+"""
+
+import os
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+LIMITE_LINHAS_GRAFICO = int(os.environ.get("SARESP_LIMITE_GRAFICO", "5000"))
+
+
+def histograma(valores, bins=20):
+    """Conta os valores em `bins` faixas de mesma largura (colunas inicio, fim, contagem)"""
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[np.isfinite(valores)]
+    if len(valores) == 0:
+        return pd.DataFrame({"inicio": [], "fim": [], "contagem": []})
+    contagem, bordas = np.histogram(valores, bins=bins)
+    return pd.DataFrame({"inicio": bordas[:-1], "fim": bordas[1:], "contagem": contagem})
+
+
+def quantis_boxplot(df, grupo, valor, limite=None):
+    """Quartis, bigodes (1,5 IQR) e uma amostra dos outliers de `valor` por `grupo`"""
+    limite = limite or LIMITE_LINHAS_GRAFICO
+    dados = df[[grupo, valor]].dropna()
+    agrupado = dados.groupby(grupo, observed=True)[valor]
+    caixas = agrupado.quantile([0.25, 0.5, 0.75]).unstack()
+    caixas.columns = ["q1", "mediana", "q3"]
+    iqr = caixas["q3"] - caixas["q1"]
+    limite_inferior = (caixas["q1"] - 1.5 * iqr).reindex(dados[grupo]).to_numpy()
+    limite_superior = (caixas["q3"] + 1.5 * iqr).reindex(dados[grupo]).to_numpy()
+
+    valores = dados[valor].to_numpy()
+    dentro = (valores >= limite_inferior) & (valores <= limite_superior)
+    bigodes = dados[dentro].groupby(grupo, observed=True)[valor].agg(["min", "max"])
+    caixas["minimo"] = bigodes["min"]
+    caixas["maximo"] = bigodes["max"]
+    caixas["n"] = agrupado.size()
+    caixas = caixas.reset_index()
+
+    outliers = dados[~dentro]
+    if len(outliers) > limite:
+        outliers = amostra_estratificada(outliers, grupo, limite)
+    return caixas, outliers.reset_index(drop=True)
+
+
+def amostra_estratificada(df, estrato, limite, semente=0):
+    """Amostra aleatória com no máximo `limite` linhas, proporcional a cada estrato"""
+    if len(df) <= limite:
+        return df
+    if estrato is None:
+        return df.sample(n=limite, random_state=semente)
+    rng = np.random.default_rng(semente)
+    codigos = pd.factorize(df[estrato], use_na_sentinel=False)[0]
+    tamanhos = np.bincount(codigos)
+    cotas = np.maximum(1, np.floor(tamanhos * limite / len(df))).astype(int)
+    # Embaralha as linhas e fica com as primeiras `cota` de cada estrato
+    ordem = rng.permutation(len(df))
+    ordem = ordem[np.argsort(codigos[ordem], kind="stable")]
+    inicio_estrato = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    posicao_no_estrato = np.arange(len(ordem)) - np.repeat(inicio_estrato, tamanhos)
+    escolhidas = ordem[posicao_no_estrato < np.repeat(cotas, tamanhos)]
+    return df.iloc[np.sort(escolhidas)]
+
+
+def lttb(x, y, limite):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets (x já ordenado)"""
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    bordas = np.linspace(1, n - 1, limite - 1).astype(int)
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        proximo_inicio, proximo_fim = fim, bordas[i + 2] if i + 2 < len(bordas) else n
+        media_x = x[proximo_inicio:proximo_fim].mean()
+        media_y = y[proximo_inicio:proximo_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+
+def amostrar_dispersao(df, x, y, limite=None, estrato=None, metodo="lttb", semente=0):
+    """Reduz os pontos de uma dispersão para no máximo `limite` linhas"""
+    limite = limite or LIMITE_LINHAS_GRAFICO
+    dados = df.dropna(subset=[x, y])
+    if len(dados) <= limite:
+        return dados
+    if metodo == "estratificado":
+        return amostra_estratificada(dados, estrato, limite, semente)
+    if metodo != "lttb":
+        raise ValueError(f"Método de amostragem desconhecido: {metodo}")
+    dados = dados.sort_values(x, kind="stable")
+    indices = lttb(dados[x].to_numpy(dtype=float), dados[y].to_numpy(dtype=float), limite)
+    return dados.iloc[indices]
+
+
+def grafico_histograma(hist, titulo, rotulo_x):
+    """Gráfico de barras Altair a partir da saída de `histograma`"""
+    return alt.Chart(hist).mark_bar().encode(
+        x=alt.X("inicio:Q", bin="binned", title=rotulo_x),
+        x2="fim:Q",
+        y=alt.Y("contagem:Q", title="Contagem"),
+        tooltip=["inicio", "fim", "contagem"]
+    ).properties(title=titulo)
+
+
+def grafico_boxplot(caixas, outliers, grupo, valor, titulo):
+    """Boxplot Altair a partir da saída de `quantis_boxplot`"""
+    base = alt.Chart(caixas).encode(x=f"{grupo}:N", color=f"{grupo}:N")
+    bigodes = base.mark_rule().encode(y=alt.Y("minimo:Q", title=valor), y2="maximo:Q")
+    caixa = base.mark_bar(size=30).encode(
+        y="q1:Q", y2="q3:Q",
+        tooltip=[grupo, "n", "minimo", "q1", "mediana", "q3", "maximo"]
+    )
+    mediana = base.mark_tick(color="white", size=30).encode(y="mediana:Q")
+    pontos = alt.Chart(outliers).mark_point().encode(
+        x=f"{grupo}:N", y=f"{valor}:Q", color=f"{grupo}:N"
+    )
+    return (bigodes + caixa + mediana + pontos).properties(title=titulo)
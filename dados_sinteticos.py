@@ -0,0 +1,131 @@
+"""Geradores de dados sintéticos com o mesmo esquema das planilhas reais.
+
+Usados pelo benchmark e pelos testes de carga, que precisam rodar sem acesso
+à internet. A escala 1 corresponde ao piloto atual (2 DEs, ~20 escolas, ~2 mil
+respostas do Simulado); escalas maiores multiplicam escolas, DEs e linhas.
+Todos os geradores recebem uma semente e são determinísticos.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from fontes import MICRODADOS, PLANILHAS_CORRELACAO, PLANILHAS_CORRELACAO_V2
+from snapshots import chave_da_origem, salvar_snapshot
+
+RESPOSTAS_POR_ESCALA = 2_000
+ESCOLAS_POR_ESCALA = 20
+MAX_ESCOLAS = 5_500  # ordem de grandeza da rede estadual
+MAX_DES = 91
+SERIES = ['5 Ano', '9 Ano']
+DISCIPLINAS = ['LP', 'MAT']
+RACAS = ['Branca', 'Preta', 'Parda', 'Indígena', 'Amarela', 'Não declarada']
+PROPORCAO_RACAS = [0.42, 0.08, 0.44, 0.01, 0.01, 0.04]
+
+
+def gerar_escolas(escala=1, semente=0):
+    """Escolas (DE, ESCOLA) da escala; as duas primeiras DEs são Sul 1 e Jundiaí"""
+    rng = np.random.default_rng(semente)
+    n_escolas = min(MAX_ESCOLAS, max(2, int(ESCOLAS_POR_ESCALA * escala)))
+    n_des = min(MAX_DES, max(2, int(2 * escala ** 0.5)), n_escolas)
+    des = ['SUL 1', 'JUNDIAÍ'] + [f'DE {indice:02d}' for indice in range(3, n_des + 1)]
+    de_da_escola = np.concatenate([np.arange(n_des), rng.integers(0, n_des, n_escolas - n_des)])
+    return pd.DataFrame({
+        'DE': np.array(des, dtype=object)[np.sort(de_da_escola)],
+        'ESCOLA': [f'EE ESCOLA {indice:05d}' for indice in range(n_escolas)],
+    })
+
+
+def gerar_respostas(escala=1, semente=0, escolas=None):
+    """Planilha de respostas do Simulado (DE, SERIE_ANO, ESCOLA, Disciplina, Resposta)"""
+    rng = np.random.default_rng(semente + 1)
+    escolas = gerar_escolas(escala, semente) if escolas is None else escolas
+    n = int(RESPOSTAS_POR_ESCALA * escala)
+    escola = rng.integers(0, len(escolas), n)
+    # Cada escola tem uma taxa de acerto própria, para as correlações não serem nulas
+    taxa_escola = rng.uniform(0.35, 0.85, len(escolas))
+    correto = rng.random(n) < taxa_escola[escola]
+    return pd.DataFrame({
+        'DE': escolas['DE'].to_numpy()[escola],
+        'SERIE_ANO': rng.choice(SERIES, n),
+        'ESCOLA': escolas['ESCOLA'].to_numpy()[escola],
+        'Disciplina': rng.choice(DISCIPLINAS, n),
+        'Resposta': np.where(correto, 'Correto', 'Errado'),
+    })
+
+
+def gerar_saresp(escala=1, semente=0, escolas=None):
+    """Médias do SARESP por escola e série (DE, SERIE_ANO, ESCOLA, LP, MAT, MODALIDADE)"""
+    rng = np.random.default_rng(semente + 2)
+    escolas = gerar_escolas(escala, semente) if escolas is None else escolas
+    linhas = escolas.loc[escolas.index.repeat(len(SERIES))].reset_index(drop=True)
+    linhas.insert(1, 'SERIE_ANO', np.tile(SERIES, len(escolas)))
+    linhas['LP'] = rng.normal(240, 20, len(linhas)).round(1)
+    linhas['MAT'] = rng.normal(235, 25, len(linhas)).round(1)
+    linhas['MODALIDADE'] = rng.choice(['REGULAR', 'PEI'], len(linhas), p=[0.7, 0.3])
+    return linhas
+
+
+def gerar_raca(escala=1, semente=0, escolas=None):
+    """Contagem de alunos por raça/cor em cada escola (mesmas colunas de raca_DEParceiras)"""
+    rng = np.random.default_rng(semente + 3)
+    escolas = gerar_escolas(escala, semente) if escolas is None else escolas
+    contagens = rng.multinomial(rng.integers(100, 1500, len(escolas)), PROPORCAO_RACAS)
+    raca = escolas.copy()
+    for indice, coluna in enumerate(RACAS):
+        raca[coluna] = contagens[:, indice]
+    raca['Total'] = contagens.sum(axis=1)
+    return raca
+
+
+def gerar_microdados(escala=1, semente=0, escolas=None, alunos_por_escala=5_000):
+    """Microdados por aluno (DE, ESCOLA, SERIE_ANO, Race, Simulado, SARESP) usados pelo app.py"""
+    rng = np.random.default_rng(semente + 4)
+    escolas = gerar_escolas(escala, semente) if escolas is None else escolas
+    n = int(alunos_por_escala * escala)
+    escola = rng.integers(0, len(escolas), n)
+    simulado = rng.normal(60, 12, n).clip(0, 100)
+    return pd.DataFrame({
+        'DE': escolas['DE'].to_numpy()[escola],
+        'ESCOLA': escolas['ESCOLA'].to_numpy()[escola],
+        'SERIE_ANO': rng.choice(SERIES, n),
+        'Race': rng.choice(RACAS, n, p=PROPORCAO_RACAS),
+        'Simulado': simulado.round(1),
+        'SARESP': (120 + 2 * simulado + rng.normal(0, 20, n)).round(1),
+    })
+
+
+def _planilha(nome, escala, semente, escolas, estadual=False):
+    """Planilha sintética do tipo indicado pelo prefixo do nome, filtrada pela DE do nome"""
+    tipo = nome.split('_')[0]
+    des = [de for de, trecho in (('JUNDIAÍ', 'jundiai'), ('SUL 1', 'sul1')) if trecho in nome.lower()]
+    if des and not estadual:
+        escolas = escolas[escolas['DE'].isin(des)].reset_index(drop=True)
+    if tipo == 'simulado':
+        return gerar_respostas(escala, semente, escolas)
+    if tipo == 'saresp':
+        return gerar_saresp(escala, semente, escolas)
+    return gerar_raca(escala, semente, escolas)
+
+
+def preparar_ambiente(diretorio, escala=1, semente=0, estadual=False):
+    """Grava em `diretorio` os microdados (dados_saresp.csv) e snapshots de todas as planilhas.
+
+    Rodando os dashboards com esse diretório como pasta de trabalho e
+    `SARESP_SNAPSHOTS=<diretorio>/snapshots`, nenhuma planilha é baixada. Com
+    `estadual=True` as planilhas trazem todas as DEs da escala, e não só as do nome.
+    """
+    escolas = gerar_escolas(escala, semente)
+    gerar_microdados(escala, semente, escolas).to_csv(
+        os.path.join(diretorio, MICRODADOS), index=False)
+    diretorio_snapshots = os.path.join(diretorio, "snapshots")
+    # A mesma planilha pode aparecer nas duas páginas com nomes diferentes; vale o primeiro
+    origens = {}
+    for planilhas in (PLANILHAS_CORRELACAO, PLANILHAS_CORRELACAO_V2):
+        for nome, url in planilhas.items():
+            origens.setdefault(chave_da_origem(url), (nome, url))
+    for chave, (nome, url) in origens.items():
+        salvar_snapshot(chave, _planilha(nome, escala, semente, escolas, estadual), url, "",
+                        diretorio=diretorio_snapshots)
+    return diretorio_snapshots
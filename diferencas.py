@@ -0,0 +1,230 @@
+"""Diferenças de notas entre grupos de raça/cor, com intervalos de confiança bootstrap.
+
+Para cada grupo (rede, DE ou escola), compara a nota do grupo `comparado`
+(padrão: pretos e pardos) com a do grupo de `referencia` (padrão: brancos):
+diferença das médias e de quantis (mediana), com intervalo de confiança
+percentil de um bootstrap estratificado, que reamostra os alunos de cada
+raça/cor dentro de cada grupo.
+
+Milhares de grupos saem em segundos, sem laço por grupo nem por réplica:
+
+- médias: as réplicas são geradas em lotes de matrizes de índices
+  (réplicas × linhas), e as somas de todas as células (grupo × raça/cor) de
+  um lote saem de uma única `np.add.reduceat`. O tamanho de cada lote é
+  limitado por `ELEMENTOS_POR_LOTE`, então a memória não cresce com o
+  número de réplicas;
+- quantis: o k-ésimo menor valor de uma reamostragem tem distribuição exata
+  conhecida (uma Beta sobre as posições da célula ordenada), então as
+  réplicas são sorteadas direto dessa distribuição, sem gerar as
+  reamostragens.
+
+Os grupos são divididos em blocos de `GRUPOS_POR_BLOCO`, cada um com a sua
+semente derivada da semente pedida, e os blocos podem ir para um pool de
+processos (`PROCESSOS`); o resultado não depende do número de processos nem
+do tamanho dos lotes. `diferencas_raca` guarda os resultados no cache
+compartilhado (`cache.py`), pela impressão digital dos dados e pelos
+parâmetros.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cache import obter
+from estatisticas import impressao_digital
+from raca import GRUPOS_RACA
+
+REAMOSTRAGENS = int(os.environ.get("SARESP_BOOTSTRAP_REAMOSTRAGENS", "1000"))
+# Limite de elementos da matriz de índices de cada lote (cerca de 12 bytes por elemento)
+ELEMENTOS_POR_LOTE = int(os.environ.get("SARESP_BOOTSTRAP_ELEMENTOS", "4000000"))
+PROCESSOS = int(os.environ.get("SARESP_BOOTSTRAP_PROCESSOS", "1"))
+CONTEXTO_PROCESSOS = os.environ.get("SARESP_CONTEXTO_PROCESSOS", "spawn")
+GRUPOS_POR_BLOCO = 256
+# Grupos com menos alunos que isso em algum dos lados ficam sem estimativa
+MIN_OBSERVACOES = 2
+COLUNAS_RESULTADO = [
+    "estatistica", "n_referencia", "n_comparado", "referencia", "comparado",
+    "diferenca", "inferior", "superior", "erro_padrao",
+]
+
+
+def nome_estatistica(quantil):
+    """Rótulo da estatística na coluna `estatistica` (None é a média)"""
+    if quantil is None:
+        return "média"
+    return "mediana" if quantil == 0.5 else f"p{quantil * 100:g}"
+
+
+def _posicoes_quantil(tamanhos, quantil):
+    """Posição (1 a n) do quantil em cada célula, pela inversa da distribuição empírica"""
+    return np.clip(np.ceil(quantil * tamanhos - 1e-9), 1, np.maximum(tamanhos, 1)).astype(np.int64)
+
+
+def _replicas_medias(valores, tamanhos, inicios, reamostragens, rng, elementos):
+    """Médias de cada célula em cada réplica (réplicas × células), em lotes de índices"""
+    replicas = np.full((reamostragens, len(tamanhos)), np.nan)
+    cheias = tamanhos > 0
+    if not cheias.any():
+        return replicas
+    # Índices, sorteios e valores em 32 bits (metade da memória e da banda); as somas em 64 bits
+    celula = np.repeat(np.arange(len(tamanhos)), tamanhos)
+    base = inicios[celula].astype(np.int32)
+    largura = tamanhos[celula].astype(np.float32)
+    ultimo = (tamanhos[celula] - 1).astype(np.int32)
+    valores = valores.astype(np.float32)
+    por_lote = max(1, elementos // len(valores))
+    for inicio in range(0, reamostragens, por_lote):
+        lote = min(por_lote, reamostragens - inicio)
+        # Cada posição sorteia um aluno da própria célula: base + [0, largura)
+        sorteios = rng.random((lote, len(valores)), dtype=np.float32)
+        indices = np.minimum((sorteios * largura).astype(np.int32), ultimo)
+        indices += base
+        somas = np.add.reduceat(valores[indices], inicios[cheias], axis=1, dtype=np.float64)
+        replicas[inicio:inicio + lote, cheias] = somas / tamanhos[cheias]
+    return replicas
+
+
+def _replicas_quantil(valores, tamanhos, inicios, quantil, reamostragens, rng):
+    """Quantil de cada célula em cada réplica, sorteado da sua distribuição exata.
+
+    Uma reamostragem de n alunos equivale a n uniformes U, com o aluno
+    ceil(n * U) da célula ordenada; o k-ésimo menor aluno sorteado vem da
+    k-ésima menor uniforme, que tem distribuição Beta(k, n - k + 1).
+    """
+    replicas = np.full((reamostragens, len(tamanhos)), np.nan)
+    cheias = np.flatnonzero(tamanhos > 0)
+    n = tamanhos[cheias]
+    k = _posicoes_quantil(n, quantil)
+    uniformes = rng.beta(k, n - k + 1, size=(reamostragens, len(cheias)))
+    ordem = np.clip(np.ceil(uniformes * n).astype(np.int64), 1, n)
+    replicas[:, cheias] = valores[inicios[cheias] + ordem - 1]
+    return replicas
+
+
+def _bloco(valores, tamanhos, quantis, reamostragens, nivel, semente, elementos):
+    """Estimativas e intervalos de um bloco de grupos.
+
+    `valores` vem ordenado por grupo, lado (referência, comparado) e valor;
+    `tamanhos` tem uma linha por grupo e uma coluna por lado. Devolve, para
+    cada estatística, um dicionário de arrays com uma posição por grupo.
+    """
+    rng = np.random.default_rng(semente)
+    planos = tamanhos.ravel()
+    inicios = np.concatenate([[0], np.cumsum(planos)[:-1]])
+    validos = (tamanhos >= MIN_OBSERVACOES).all(axis=1)
+    cortes = [(1 - nivel) / 2, (1 + nivel) / 2]
+    partes = []
+    for quantil in quantis:
+        estimativas = np.full(len(planos), np.nan)
+        cheias = planos > 0
+        if quantil is None:
+            if cheias.any():
+                estimativas[cheias] = np.add.reduceat(valores, inicios[cheias]) / planos[cheias]
+            replicas = _replicas_medias(valores, planos, inicios, reamostragens, rng, elementos)
+        else:
+            posicoes = inicios + _posicoes_quantil(planos, quantil) - 1
+            estimativas[cheias] = valores[posicoes[cheias]]
+            replicas = _replicas_quantil(valores, planos, inicios, quantil, reamostragens, rng)
+        estimativas = estimativas.reshape(-1, 2)
+        diferencas = replicas[:, 1::2][:, validos] - replicas[:, 0::2][:, validos]
+        inferior, superior = np.full((2, len(tamanhos)), np.nan)
+        erro_padrao = np.full(len(tamanhos), np.nan)
+        if validos.any():
+            inferior[validos], superior[validos] = np.quantile(diferencas, cortes, axis=0)
+            erro_padrao[validos] = diferencas.std(axis=0, ddof=1)
+        partes.append({
+            "estatistica": nome_estatistica(quantil),
+            "referencia": np.where(validos, estimativas[:, 0], np.nan),
+            "comparado": np.where(validos, estimativas[:, 1], np.nan),
+            "inferior": inferior,
+            "superior": superior,
+            "erro_padrao": erro_padrao,
+        })
+    return partes
+
+
+def _executar(tarefas, processos):
+    """Roda os blocos no próprio processo ou distribuídos em um pool de processos"""
+    if processos <= 1 or len(tarefas) <= 1:
+        return [_bloco(*tarefa) for tarefa in tarefas]
+    contexto = multiprocessing.get_context(CONTEXTO_PROCESSOS)
+    with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), mp_context=contexto) as pool:
+        return list(pool.map(_bloco, *zip(*tarefas)))
+
+
+def calcular_diferencas(df, valor="SARESP", grupos=None, raca="Race", referencia="Branca",
+                        comparado="Pretos_e_Pardos", quantis=(None, 0.5), reamostragens=REAMOSTRAGENS,
+                        nivel=0.95, semente=0, processos=PROCESSOS, elementos=ELEMENTOS_POR_LOTE):
+    """Diferença comparado - referência de `valor` em cada grupo, com IC bootstrap (sem cache).
+
+    `referencia` e `comparado` são categorias de `raca` ou grupos de GRUPOS_RACA.
+    `quantis` lista as estatísticas comparadas: None é a média, 0.5 a mediana.
+    Devolve uma linha por grupo e estatística, com as colunas de `grupos` e
+    COLUNAS_RESULTADO; grupos com menos de MIN_OBSERVACOES alunos em um dos
+    lados ficam com estimativas NaN.
+    """
+    grupos = list(grupos or [])
+    dados = df[grupos + [raca, valor]].dropna(subset=[raca, valor])
+    racas = dados[raca].astype(str)
+    lado = np.full(len(dados), -1, dtype=np.int8)
+    lado[racas.isin(GRUPOS_RACA.get(referencia, [referencia])).to_numpy()] = 0
+    lado[racas.isin(GRUPOS_RACA.get(comparado, [comparado])).to_numpy()] = 1
+    dados, lado = dados[lado >= 0], lado[lado >= 0]
+
+    if grupos:
+        agrupado = dados.groupby(grupos, observed=True, sort=True)
+        codigos = agrupado.ngroup().to_numpy()
+        chaves = agrupado.size().index.to_frame(index=False)
+    else:
+        codigos = np.zeros(len(dados), dtype=np.int64)
+        chaves = pd.DataFrame(index=range(1))
+    n_grupos = len(chaves)
+
+    valores = dados[valor].to_numpy(dtype="float64")
+    ordem = np.lexsort((valores, lado, codigos))
+    valores = valores[ordem]
+    tamanhos = np.bincount(codigos * 2 + lado, minlength=2 * n_grupos).reshape(n_grupos, 2)
+    fim_do_grupo = np.cumsum(tamanhos.sum(axis=1))
+
+    blocos = range(0, n_grupos, GRUPOS_POR_BLOCO)
+    sementes = np.random.SeedSequence(semente).spawn(len(blocos))
+    tarefas = []
+    for primeiro, semente_bloco in zip(blocos, sementes):
+        ultimo = min(primeiro + GRUPOS_POR_BLOCO, n_grupos)
+        inicio = fim_do_grupo[primeiro - 1] if primeiro else 0
+        tarefas.append((valores[inicio:fim_do_grupo[ultimo - 1]], tamanhos[primeiro:ultimo],
+                        list(quantis), reamostragens, nivel, semente_bloco, elementos))
+    partes = _executar(tarefas, processos)
+
+    tabelas = []
+    for posicao, quantil in enumerate(quantis):
+        colunas = {campo: np.concatenate([parte[posicao][campo] for parte in partes] + [np.empty(0)])
+                   for campo in ("referencia", "comparado", "inferior", "superior", "erro_padrao")}
+        tabela = chaves.assign(
+            estatistica=nome_estatistica(quantil),
+            n_referencia=tamanhos[:, 0],
+            n_comparado=tamanhos[:, 1],
+            referencia=colunas["referencia"],
+            comparado=colunas["comparado"],
+            diferenca=colunas["comparado"] - colunas["referencia"],
+            inferior=colunas["inferior"],
+            superior=colunas["superior"],
+            erro_padrao=colunas["erro_padrao"],
+        )
+        tabelas.append(tabela)
+    return pd.concat(tabelas, ignore_index=True)[grupos + COLUNAS_RESULTADO]
+
+
+def diferencas_raca(df, valor="SARESP", grupos=None, raca="Race", referencia="Branca",
+                    comparado="Pretos_e_Pardos", quantis=(None, 0.5), reamostragens=REAMOSTRAGENS,
+                    nivel=0.95, semente=0):
+    """`calcular_diferencas` guardado no cache compartilhado (o resultado não deve ser alterado)"""
+    grupos = list(grupos or [])
+    dados = df[grupos + [raca, valor]]
+    chave = ("diferencas_raca", impressao_digital(dados), valor, tuple(grupos), raca, referencia,
+             comparado, tuple(quantis), reamostragens, nivel, semente)
+    return obter(chave, lambda: calcular_diferencas(dados, valor, grupos, raca, referencia, comparado,
+                                                    quantis, reamostragens, nivel, semente))
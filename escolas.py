@@ -0,0 +1,117 @@
+"""Dimensão de escolas: chave inteira para cada par (DE, ESCOLA) normalizado.
+
+As planilhas escrevem a mesma escola de jeitos diferentes ("JUNDIAÍ" x
+"JUNDIAI", maiúsculas, espaços sobrando). Os nomes são normalizados (sem
+acento, maiúsculos, espaços simples) uma vez por valor distinto e cada par
+recebe um `ID_ESCOLA` inteiro, estável entre atualizações dos dados (a tabela
+fica gravada junto dos snapshots). Os merges passam a ser feitos pelo inteiro.
+A leitura e a gravação da tabela usam a mesma trava entre processos do
+manifesto dos snapshots, então dois processos não dão o mesmo ID a escolas
+diferentes.
+"""
+
+import io
+import os
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from snapshots import DIRETORIO_SNAPSHOTS, gravar_atomico, trava_diretorio
+
+ARQUIVO_DIMENSAO = "dimensao_escolas.parquet"
+COLUNAS_DIMENSAO = ['ID_ESCOLA', 'DE_NORM', 'ESCOLA_NORM', 'DE', 'ESCOLA']
+
+
+def normalizar_texto(texto):
+    """Remove acentos, passa para maiúsculas e junta espaços repetidos"""
+    if not isinstance(texto, str):
+        return texto
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.upper().split())
+
+
+def normalizar(serie):
+    """Normaliza uma coluna de texto processando cada valor distinto uma única vez"""
+    codigos, valores = pd.factorize(serie)
+    # O código -1 (valor ausente) cai no último elemento, None
+    normalizados = np.array([normalizar_texto(valor) for valor in valores] + [None], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie.index)
+
+
+def _pares(df):
+    pares = pd.DataFrame({
+        'DE_NORM': normalizar(df['DE']),
+        'ESCOLA_NORM': normalizar(df['ESCOLA']),
+        'DE': df['DE'].astype(object),
+        'ESCOLA': df['ESCOLA'].astype(object),
+    })
+    return pares.dropna(subset=['DE_NORM', 'ESCOLA_NORM']).drop_duplicates(['DE_NORM', 'ESCOLA_NORM'])
+
+
+def carregar_dimensao(diretorio=None):
+    """Lê a dimensão de escolas gravada (vazia se ainda não existir)"""
+    caminho = os.path.join(diretorio or DIRETORIO_SNAPSHOTS, ARQUIVO_DIMENSAO)
+    if not os.path.exists(caminho):
+        return pd.DataFrame({coluna: pd.Series(dtype='int32' if coluna == 'ID_ESCOLA' else object)
+                             for coluna in COLUNAS_DIMENSAO})
+    return pd.read_parquet(caminho)
+
+
+def atualizar_dimensao(fontes, diretorio=None):
+    """Acrescenta à dimensão os pares (DE, ESCOLA) novos das fontes e a retorna"""
+    diretorio = diretorio or DIRETORIO_SNAPSHOTS
+    with trava_diretorio(diretorio):
+        dimensao = carregar_dimensao(diretorio)
+        pares = [_pares(df) for df in fontes if {'DE', 'ESCOLA'} <= set(df.columns)]
+        if not pares:
+            return dimensao
+        candidatos = pd.concat(pares, ignore_index=True).drop_duplicates(['DE_NORM', 'ESCOLA_NORM'])
+        conhecidos = pd.MultiIndex.from_frame(dimensao[['DE_NORM', 'ESCOLA_NORM']])
+        chaves = pd.MultiIndex.from_frame(candidatos[['DE_NORM', 'ESCOLA_NORM']])
+        novos = candidatos[~chaves.isin(conhecidos)]
+        if len(novos):
+            proximo = int(dimensao['ID_ESCOLA'].max()) + 1 if len(dimensao) else 1
+            novos = novos.assign(ID_ESCOLA=np.arange(proximo, proximo + len(novos), dtype='int32'))
+            dimensao = pd.concat([dimensao, novos[COLUNAS_DIMENSAO]], ignore_index=True)
+            dimensao['ID_ESCOLA'] = dimensao['ID_ESCOLA'].astype('int32')
+            buffer = io.BytesIO()
+            dimensao.to_parquet(buffer, index=False)
+            gravar_atomico(os.path.join(diretorio, ARQUIVO_DIMENSAO), buffer.getvalue())
+        return dimensao
+
+
+def anexar_id_escola(df, dimensao):
+    """Acrescenta as colunas ID_ESCOLA (Int32; ausente se a escola não está na dimensão) e DE_NORM.
+
+    Linhas sem escola ficam com ID ausente, e não com um ID comum a todas: os
+    `groupby` por escola as deixam de fora e elas não se juntam umas com as outras.
+    """
+    de_norm = normalizar(df['DE'])
+    escola_norm = normalizar(df['ESCOLA'])
+    indice = pd.MultiIndex.from_frame(dimensao[['DE_NORM', 'ESCOLA_NORM']])
+    posicoes = indice.get_indexer(pd.MultiIndex.from_arrays([de_norm, escola_norm]))
+    encontradas = posicoes >= 0
+    valores = np.zeros(len(posicoes), dtype='int32')
+    valores[encontradas] = dimensao['ID_ESCOLA'].to_numpy()[posicoes[encontradas]]
+    ids = pd.arrays.IntegerArray(valores, ~encontradas)
+    return df.assign(ID_ESCOLA=ids, DE_NORM=de_norm.astype('category'))
+
+
+def escolas_sem_par(esquerda, direita, dimensao, chaves=('ID_ESCOLA',)):
+    """Combinações de `chaves` (com ID_ESCOLA) presentes em só um dos lados de uma junção.
+
+    Passe as mesmas chaves da junção: com a série, uma escola que só tem o 5º
+    ano de um lado e o 9º do outro aparece duas vezes, uma para cada lado.
+    """
+    chaves = list(chaves)
+    lados = [lado[chaves].dropna().drop_duplicates() for lado in (esquerda, direita)]
+    juntas = lados[0].merge(lados[1], on=chaves, how='outer', indicator='lado')
+    fora = juntas[juntas['lado'] != 'both']
+    fora = fora.assign(lado=pd.Categorical(fora['lado'].map({'left_only': 'esquerda', 'right_only': 'direita'}),
+                                           categories=['esquerda', 'direita']))
+    outras = [chave for chave in chaves if chave != 'ID_ESCOLA']
+    return (fora.merge(dimensao[['ID_ESCOLA', 'DE', 'ESCOLA']], on='ID_ESCOLA', how='left')
+            .sort_values(['lado', 'ID_ESCOLA'] + outras)
+            .astype({'lado': object})[['ID_ESCOLA', 'DE', 'ESCOLA'] + outras + ['lado']]
+            .reset_index(drop=True))
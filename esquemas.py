@@ -0,0 +1,214 @@
+"""Esquemas das fontes de dados, aplicados uma única vez na ingestão.
+
+Cada tipo de fonte (respostas do Simulado, médias do SARESP, contagens por
+raça/cor e microdados) declara as suas colunas: tipo, se é obrigatória, os
+valores aceitos (categóricas) e o intervalo aceito (numéricas). `validar`
+converte a planilha para esses tipos de forma vetorizada e devolve o
+DataFrame tipado com um relatório de qualidade:
+
+- coluna obrigatória ausente: erro, e o snapshot anterior continua valendo
+  (nas planilhas só exibidas, `PLANILHAS_SO_EXIBIDAS`, todas são opcionais);
+- texto solto em coluna numérica ("240,5" vira 240.5; "ausente" vira NaN):
+  contado em `invalidos`;
+- valor fora dos aceitos ou do intervalo: vira ausente e é contado em
+  `fora_do_dominio`;
+- categóricas com espaços sobrando são aparadas, e textos vazios viram ausentes.
+
+Os snapshots são gravados já validados (o relatório fica no manifesto), então
+as páginas não convertem colunas nem conferem se elas existem.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from carregamento import extrair_id
+from fontes import MICRODADOS, PLANILHAS_CORRELACAO, PLANILHAS_CORRELACAO_V2, PLANILHAS_SO_EXIBIDAS
+
+COLUNAS_RACA = ['Branca', 'Preta', 'Parda', 'Indígena', 'Amarela', 'Não declarada']
+DISCIPLINAS = ['LP', 'MAT']
+# Escala de proficiência do SARESP
+NOTA_MAXIMA_SARESP = 500
+
+
+def coluna(tipo, obrigatoria=True, valores=None, minimo=None, maximo=None):
+    """Declaração de uma coluna do esquema"""
+    return {"tipo": tipo, "obrigatoria": obrigatoria, "valores": valores, "minimo": minimo, "maximo": maximo}
+
+
+_CHAVES = {
+    "DE": coluna("category"),
+    "ESCOLA": coluna("category"),
+}
+
+ESQUEMAS = {
+    "simulado": {
+        **_CHAVES,
+        "SERIE_ANO": coluna("category"),
+        "Disciplina": coluna("category", valores=DISCIPLINAS),
+        "Resposta": coluna("category"),
+    },
+    "saresp": {
+        **_CHAVES,
+        "SERIE_ANO": coluna("category"),
+        "LP": coluna("float32", minimo=0, maximo=NOTA_MAXIMA_SARESP),
+        "MAT": coluna("float32", minimo=0, maximo=NOTA_MAXIMA_SARESP),
+        "MODALIDADE": coluna("category"),
+    },
+    "raca": {
+        **_CHAVES,
+        **{raca: coluna("UInt32", obrigatoria=False, minimo=0) for raca in COLUNAS_RACA},
+        "Total": coluna("UInt32", obrigatoria=False, minimo=0),
+    },
+    "microdados": {
+        "DE": coluna("category", obrigatoria=False),
+        "ESCOLA": coluna("category", obrigatoria=False),
+        "SERIE_ANO": coluna("category", obrigatoria=False),
+        "Disciplina": coluna("category", obrigatoria=False, valores=DISCIPLINAS),
+        "Race": coluna("category"),
+        "Simulado": coluna("float32", minimo=0, maximo=100),
+        "SARESP": coluna("float32", minimo=0, maximo=NOTA_MAXIMA_SARESP),
+    },
+}
+
+
+# Planilhas só exibidas: mesmos tipos e domínios, mas nenhuma coluna obrigatória
+SUFIXO_EXIBICAO = "_exibicao"
+ESQUEMAS.update({
+    nome + SUFIXO_EXIBICAO: {coluna: dict(declaracao, obrigatoria=False) for coluna, declaracao in colunas.items()}
+    for nome, colunas in list(ESQUEMAS.items())
+})
+
+
+def _esquemas_por_chave():
+    # O prefixo do nome da planilha (simulado, saresp, raca) é o tipo da fonte
+    esquemas = {os.path.splitext(os.path.basename(MICRODADOS))[0]: "microdados"}
+    for planilhas in (PLANILHAS_CORRELACAO, PLANILHAS_CORRELACAO_V2):
+        for nome, url in planilhas.items():
+            esquema = nome.split('_')[0] + (SUFIXO_EXIBICAO if nome in PLANILHAS_SO_EXIBIDAS else "")
+            chave = extrair_id(url)
+            # Uma planilha usada em cálculos por alguma página fica com o esquema completo
+            if esquemas.get(chave, SUFIXO_EXIBICAO).endswith(SUFIXO_EXIBICAO):
+                esquemas[chave] = esquema
+    return esquemas
+
+
+_ESQUEMA_DA_CHAVE = _esquemas_por_chave()
+
+
+def esquema_da_chave(chave):
+    """Nome do esquema da fonte com esta chave de snapshot (None se não houver esquema)"""
+    return _ESQUEMA_DA_CHAVE.get(chave)
+
+
+def _categorica(serie, valores):
+    """Categórica aparada; devolve (série, linhas fora dos valores aceitos).
+
+    O trabalho é feito só sobre as categorias distintas e propagado pelos códigos.
+    """
+    categorica = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype("category")
+    categorias = categorica.cat.categories
+    limpas = categorias.astype(str).str.strip()
+    aceitas = limpas != ""
+    if valores is not None:
+        aceitas &= limpas.isin(valores)
+    codigos = categorica.cat.codes.to_numpy()
+    fora = (codigos >= 0) & ~np.append(aceitas, True)[codigos] & np.append(limpas != "", True)[codigos]
+    if aceitas.all() and limpas.equals(categorias):
+        return categorica, fora
+    unicas = pd.Index(limpas[aceitas].unique())
+    novos = np.append(np.where(aceitas, unicas.get_indexer(limpas), -1), -1)[codigos]
+    return pd.Series(pd.Categorical.from_codes(novos, unicas), index=serie.index, name=serie.name), fora
+
+
+def _numerica(serie, tipo, minimo, maximo):
+    """Numérica do tipo declarado; devolve (série, linhas com texto inválido, linhas fora do intervalo)"""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.astype("float64")
+        invalidos = np.zeros(len(serie), dtype=bool)
+    else:
+        texto = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+        numeros = pd.to_numeric(texto, errors="coerce").astype("float64")
+        invalidos = (numeros.isna() & texto.notna() & (texto != "")).to_numpy()
+    if tipo == "UInt32":
+        minimo = 0 if minimo is None else minimo
+        maximo = np.iinfo("uint32").max if maximo is None else maximo
+        numeros = numeros.round()
+    fora = np.zeros(len(serie), dtype=bool)
+    if minimo is not None:
+        fora |= (numeros < minimo).to_numpy()
+    if maximo is not None:
+        fora |= (numeros > maximo).to_numpy()
+    numeros = numeros.mask(fora)
+    return numeros.astype(tipo), invalidos, fora
+
+
+def validar(df, esquema):
+    """Aplica o esquema `esquema` a `df`; devolve (DataFrame tipado, relatório de qualidade).
+
+    Levanta ValueError se faltar alguma coluna obrigatória. Colunas fora do
+    esquema são mantidas como vieram.
+    """
+    colunas = ESQUEMAS[esquema]
+    ausentes = [nome for nome, declaracao in colunas.items()
+                if declaracao["obrigatoria"] and nome not in df.columns]
+    if ausentes:
+        raise ValueError(f"Planilha do tipo '{esquema}' sem as colunas obrigatórias: {', '.join(ausentes)}")
+
+    convertidas = {}
+    relatorio_colunas = {}
+    com_problema = np.zeros(len(df), dtype=bool)
+    for nome, declaracao in colunas.items():
+        if nome not in df.columns:
+            continue
+        original = df[nome]
+        if declaracao["tipo"] == "category":
+            serie, fora = _categorica(original, declaracao["valores"])
+            invalidos = np.zeros(len(df), dtype=bool)
+        else:
+            serie, invalidos, fora = _numerica(original, declaracao["tipo"], declaracao["minimo"],
+                                               declaracao["maximo"])
+        com_problema |= invalidos | fora
+        convertidas[nome] = serie
+        relatorio_colunas[nome] = {
+            "tipo": str(serie.dtype),
+            # Ausentes já na origem (ou texto vazio), sem contar os descartados aqui
+            "vazios": int(serie.isna().sum() - (invalidos | fora).sum()),
+            "invalidos": int(invalidos.sum()),
+            "fora_do_dominio": int(fora.sum()),
+        }
+
+    relatorio = {
+        "esquema": esquema,
+        "linhas": len(df),
+        "linhas_com_problema": int(com_problema.sum()),
+        "colunas": relatorio_colunas,
+        "colunas_fora_do_esquema": [str(nome) for nome in df.columns if nome not in colunas],
+        "colunas_opcionais_ausentes": [nome for nome in colunas if nome not in df.columns],
+    }
+    return df.assign(**convertidas), relatorio
+
+
+def somar_relatorios(anterior, relatorio):
+    """Junta os relatórios de dois blocos da mesma fonte"""
+    if anterior is None:
+        return relatorio
+    soma = dict(anterior, linhas=anterior["linhas"] + relatorio["linhas"],
+                linhas_com_problema=anterior["linhas_com_problema"] + relatorio["linhas_com_problema"])
+    soma["colunas"] = {
+        nome: dict(contagens, **{campo: contagens[campo] + relatorio["colunas"][nome][campo]
+                                 for campo in ("vazios", "invalidos", "fora_do_dominio")})
+        for nome, contagens in anterior["colunas"].items()
+    }
+    return soma
+
+
+def descrever(relatorio):
+    """Resumo de uma linha do relatório de qualidade"""
+    problemas = [f"{nome}: {contagens['invalidos']} inválidos, {contagens['fora_do_dominio']} fora do domínio"
+                 for nome, contagens in relatorio["colunas"].items()
+                 if contagens["invalidos"] or contagens["fora_do_dominio"]]
+    texto = (f"{relatorio['esquema']}: {relatorio['linhas']} linhas, "
+             f"{relatorio['linhas_com_problema']} com problema")
+    return texto + (f" ({'; '.join(problemas)})" if problemas else "")
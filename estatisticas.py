@@ -0,0 +1,162 @@
+"""Regressão linear simples e correlação para muitos grupos de uma vez.
+
+Em vez de chamar `linregress` (ou `sns.lmplot`) uma vez por grupo, as
+estatísticas suficientes (n, somas, somas de quadrados e produtos cruzados) de
+todos os grupos saem de uma única agregação, e inclinação, intercepto, r, R²,
+p-valor e bandas de confiança são calculados a partir delas. Os resultados
+ficam memorizados pela versão dos dados informada pela página (por exemplo, a
+versão dos snapshots e os filtros aplicados), então trocar de página ou mexer
+em um widget não refaz o ajuste nem percorre os dados; sem versão, vale a
+impressão digital do conteúdo.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_RESULTADOS_MEMORIZADOS = 64
+COLUNAS_RESULTADO = [
+    "n", "inclinacao", "intercepto", "r", "r2", "p_valor", "erro_padrao",
+    "media_x", "ssx", "variancia_residual", "min_x", "max_x",
+]
+
+_memoria = OrderedDict()
+_trava = threading.Lock()
+
+
+def impressao_digital(df):
+    """Hash do conteúdo de um DataFrame (colunas e valores)"""
+    valores = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(valores.tobytes())
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+COLUNAS_SOMA = ["n", "sx", "sy", "sxx", "syy", "sxy"]
+
+
+def somas_suficientes(dados, x, y, grupos=None, deslocamento=(0.0, 0.0)):
+    """n, somas, somas de quadrados e produtos cruzados de (x, y) por grupo.
+
+    Os valores são deslocados por `deslocamento` antes de somar (reduz o erro
+    numérico); somas com o mesmo deslocamento podem ser combinadas por
+    `combinar_somas`, por exemplo bloco a bloco.
+    """
+    vx = dados[x].to_numpy(dtype=float) - deslocamento[0]
+    vy = dados[y].to_numpy(dtype=float) - deslocamento[1]
+    somas = pd.DataFrame({
+        "n": np.ones(len(vx)), "sx": vx, "sy": vy,
+        "sxx": vx * vx, "syy": vy * vy, "sxy": vx * vy,
+        "min_x": vx, "max_x": vx,
+    }, index=dados.index)
+    agregacoes = dict.fromkeys(COLUNAS_SOMA, "sum")
+    agregacoes.update(min_x="min", max_x="max")
+    if grupos:
+        return somas.groupby([dados[grupo] for grupo in grupos], observed=True).agg(agregacoes)
+    return somas.agg(agregacoes).to_frame().T
+
+
+def combinar_somas(somas, outras):
+    """Junta duas saídas de `somas_suficientes` calculadas com o mesmo deslocamento"""
+    if somas is None:
+        return outras
+    combinadas = somas[COLUNAS_SOMA].add(outras[COLUNAS_SOMA], fill_value=0)
+    combinadas["min_x"] = pd.concat([somas["min_x"], outras["min_x"]], axis=1).min(axis=1)
+    combinadas["max_x"] = pd.concat([somas["max_x"], outras["max_x"]], axis=1).max(axis=1)
+    return combinadas
+
+
+def regressao_de_somas(somas, deslocamento=(0.0, 0.0)):
+    """Regressão de y ~ x por grupo a partir da saída de `somas_suficientes`"""
+    cx, cy = deslocamento
+    n = somas["n"]
+    media_x, media_y = somas["sx"] / n, somas["sy"] / n
+    ssx = somas["sxx"] - n * media_x ** 2
+    ssy = somas["syy"] - n * media_y ** 2
+    spxy = somas["sxy"] - n * media_x * media_y
+
+    # scipy.stats é importado só aqui: carregá-lo custa centenas de ms na abertura do app
+    from scipy import stats
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inclinacao = spxy / ssx
+        r = (spxy / np.sqrt(ssx * ssy)).clip(-1, 1)
+        graus = n - 2
+        variancia_residual = (ssy - inclinacao * spxy).clip(lower=0) / graus
+        erro_padrao = np.sqrt(variancia_residual / ssx)
+        t = r * np.sqrt(graus / (1 - r ** 2))
+    p_valor = 2 * stats.t.sf(np.abs(t), graus)
+
+    resultado = pd.DataFrame({
+        "n": n.astype("int64"),
+        "inclinacao": inclinacao,
+        "intercepto": (media_y + cy) - inclinacao * (media_x + cx),
+        "r": r,
+        "r2": r ** 2,
+        "p_valor": p_valor,
+        "erro_padrao": erro_padrao,
+        "media_x": media_x + cx,
+        "ssx": ssx,
+        "variancia_residual": variancia_residual,
+        "min_x": somas["min_x"] + cx,
+        "max_x": somas["max_x"] + cx,
+    }, index=somas.index)
+    return resultado.reset_index(drop=all(nome is None for nome in somas.index.names))
+
+
+def _ajustar(dados, x, y, grupos):
+    # Centraliza pela média global para reduzir o erro numérico das somas de quadrados
+    deslocamento = (dados[x].mean(), dados[y].mean())
+    return regressao_de_somas(somas_suficientes(dados, x, y, grupos, deslocamento), deslocamento)
+
+
+def regressao_por_grupo(df, x, y, grupos=None, versao=None):
+    """Inclinação, intercepto, r, R², p-valor e erro padrão de y ~ x para cada grupo.
+
+    `versao` identifica o conteúdo de `df`; sem ela, é a impressão digital (percorre os dados).
+    """
+    grupos = list(grupos or [])
+    dados = None
+    if versao is None:
+        dados = df[grupos + [x, y]].dropna(subset=[x, y])
+        versao = impressao_digital(dados)
+    chave = (versao, x, y, tuple(grupos))
+    with _trava:
+        if chave in _memoria:
+            _memoria.move_to_end(chave)
+            return _memoria[chave].copy()
+
+    if dados is None:
+        dados = df[grupos + [x, y]].dropna(subset=[x, y])
+    resultado = _ajustar(dados, x, y, grupos)
+    with _trava:
+        _memoria[chave] = resultado
+        while len(_memoria) > MAX_RESULTADOS_MEMORIZADOS:
+            _memoria.popitem(last=False)
+    return resultado.copy()
+
+
+def bandas_confianca(resultado, pontos=100, nivel=0.95):
+    """Reta ajustada e banda de confiança da média em `pontos` valores de x por grupo"""
+    from scipy import stats
+
+    posicao = np.linspace(0, 1, pontos)
+    linhas = resultado.loc[resultado.index.repeat(pontos)].reset_index(drop=True)
+    fracao = np.tile(posicao, len(resultado))
+    xs = linhas["min_x"] + fracao * (linhas["max_x"] - linhas["min_x"])
+    previsto = linhas["intercepto"] + linhas["inclinacao"] * xs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        erro = np.sqrt(linhas["variancia_residual"]
+                       * (1 / linhas["n"] + (xs - linhas["media_x"]) ** 2 / linhas["ssx"]))
+    t_critico = stats.t.ppf((1 + nivel) / 2, linhas["n"] - 2)
+
+    colunas_grupo = [coluna for coluna in resultado.columns if coluna not in COLUNAS_RESULTADO]
+    bandas = linhas[colunas_grupo].copy()
+    bandas["x"] = xs
+    bandas["previsto"] = previsto
+    bandas["inferior"] = previsto - t_critico * erro
+    bandas["superior"] = previsto + t_critico * erro
+    return bandas
@@ -0,0 +1,214 @@
+"""Renderização de figuras matplotlib/seaborn com cache dos bytes da imagem.
+
+As figuras são desenhadas em um `Figure` próprio com o backend Agg (sem o
+estado global do pyplot, que não funciona no Streamlit) e codificadas em PNG
+ou SVG. Os bytes ficam memorizados pelo hash dos dados, pela função de
+desenho e pelos parâmetros de estilo, então uma figura que não mudou não é
+redesenhada no rerun: a página só envia a imagem pronta para `st.image`.
+
+As funções `grafico_*` recebem o eixo em que desenham; as `desenhar_*` recebem a
+figura inteira e são usadas pelas páginas e pelo processamento em lote.
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+MAX_FIGURAS_MEMORIZADAS = 32
+# O st.image redimensiona (decodifica e recodifica) a cada execução imagens mais largas que
+# 1460 px; a resolução é limitada para a figura já sair com menos que isso
+LARGURA_MAXIMA_PX = 1400
+
+_memoria = OrderedDict()
+_trava = threading.Lock()
+
+
+def _assinatura(valor, digest):
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+        nomes = valor.columns if isinstance(valor, pd.DataFrame) else [valor.name]
+        digest.update(repr(list(nomes)).encode("utf-8"))
+    elif isinstance(valor, np.ndarray):
+        digest.update(np.ascontiguousarray(valor).tobytes())
+    elif isinstance(valor, dict):
+        for chave in sorted(valor, key=str):
+            digest.update(repr(chave).encode("utf-8"))
+            _assinatura(valor[chave], digest)
+    else:
+        digest.update(repr(valor).encode("utf-8"))
+
+
+def renderizar(desenhar, *dados, formato="png", tamanho=(10, 6), dpi=100, estilo="whitegrid",
+               recortar=True, **parametros):
+    """Bytes (PNG) ou texto (SVG) da figura de `desenhar(figura, *dados, **parametros)`.
+
+    `recortar` ajusta as margens ao conteúdo (`bbox_inches="tight"`), o que desenha a
+    figura duas vezes; figuras com margens fixas podem desligar.
+    """
+    digest = hashlib.sha1()
+    # O bytecode entra na chave para que uma função de desenho editada não reaproveite a figura antiga
+    digest.update(f"{desenhar.__module__}.{desenhar.__qualname__}".encode("utf-8"))
+    digest.update(desenhar.__code__.co_code)
+    for valor in dados:
+        _assinatura(valor, digest)
+    _assinatura(dict(parametros, formato=formato, tamanho=tamanho, dpi=dpi, estilo=estilo, recortar=recortar),
+                digest)
+    chave = digest.hexdigest()
+    with _trava:
+        if chave in _memoria:
+            _memoria.move_to_end(chave)
+            return _memoria[chave]
+
+    if formato == "png":
+        dpi = min(dpi, LARGURA_MAXIMA_PX / tamanho[0])
+    with sns.axes_style(estilo):
+        figura = Figure(figsize=tamanho, dpi=dpi)
+        desenhar(figura, *dados, **parametros)
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format=formato, bbox_inches="tight" if recortar else None)
+    imagem = buffer.getvalue().decode("utf-8") if formato == "svg" else buffer.getvalue()
+
+    with _trava:
+        _memoria[chave] = imagem
+        while len(_memoria) > MAX_FIGURAS_MEMORIZADAS:
+            _memoria.popitem(last=False)
+    return imagem
+
+
+## FUNÇÕES DE VISUALIZAÇÃO DE DADOS
+
+# Adição de valores nas barras e colunas dos gráficos
+def valor_barras(plot, casas_decimais):
+    """Adiciona valores nas barras/colunas de um gráfico"""
+    for valor in plot.containers:
+        plot.bar_label(valor, fmt=f'%.{casas_decimais}f', label_type='edge')
+
+
+# Gráficos básicos com uma variável
+def grafico_colunas_1(eixo, relacao, paleta):
+    """Gera gráfico de colunas para uma variável"""
+    return sns.barplot(x=relacao.index, y=relacao.values,
+                       hue=relacao.index, palette=paleta, ax=eixo)
+
+
+def grafico_barras_1(eixo, relacao, paleta):
+    """Gera gráfico de barras horizontais para uma variável"""
+    return sns.barplot(y=relacao.index, x=relacao.values,
+                       hue=relacao.index, palette=paleta, ax=eixo)
+
+
+# Gráficos com duas variáveis
+def grafico_colunas(eixo, relacao, coluna_x, tipo_relacao, paleta):
+    """Gera gráfico de colunas para duas variáveis"""
+    return sns.barplot(data=relacao, x=coluna_x, y=tipo_relacao,
+                       hue=coluna_x, palette=paleta, ax=eixo)
+
+
+def grafico_barras(eixo, relacao, coluna_x, tipo_relacao, paleta):
+    """Gera gráfico de barras horizontais para duas variáveis"""
+    return sns.barplot(data=relacao, y=coluna_x, x=tipo_relacao,
+                       hue=coluna_x, palette=paleta, ax=eixo)
+
+
+# Gráficos agrupados
+def grafico_barras_agrupadas(eixo, relacao, coluna_x, coluna_y, tipo_relacao, paleta):
+    """Gera gráfico de barras agrupadas"""
+    return sns.barplot(data=relacao, y=coluna_x, x=tipo_relacao,
+                       hue=coluna_y, palette=paleta, ax=eixo)
+
+
+# Gráficos de setores (pizza)
+def grafico_setores_1(eixo, relacao, paleta):
+    """Gera gráfico de setores para uma variável"""
+    eixo.pie(relacao, labels=relacao.index,
+             autopct="%1.1f%%",
+             colors=sns.color_palette(paleta))
+
+
+def grafico_setores(eixo, dados, coluna1, coluna2, valor, paleta):
+    """Gera gráfico de setores de `coluna2` nas linhas em que `coluna1` vale `valor`"""
+    relacao = dados.loc[dados[coluna1] == valor, coluna2].value_counts()
+    grafico_setores_1(eixo, relacao, paleta)
+
+
+# Gráfico de dispersão
+def grafico_dispersao(eixo, dataframe, coluna_x, coluna_y, paleta, cor_linha_tendencia):
+    """Gera gráfico de dispersão com linha de tendência"""
+    sns.scatterplot(data=dataframe, x=coluna_x, y=coluna_y,
+                    color=paleta, marker='o', ax=eixo)
+    sns.regplot(data=dataframe, x=coluna_x, y=coluna_y,
+                scatter=False, color=cor_linha_tendencia, ax=eixo)
+
+
+## PAINÉIS DAS PÁGINAS DE CORRELAÇÃO
+
+def desenhar_painel(figura, media_simulado, media_saresp, distribuicao_racial, regiao, paleta_cores):
+    """Painel com desempenho no Simulado, no SARESP e distribuição racial das DEs filtradas"""
+    eixo_simulado, eixo_saresp, eixo_raca = figura.subplots(1, 3)
+
+    # GRÁFICO 1: DESEMPENHO NO SIMULADO (df_final_simulado)
+    eixo_simulado.set_title(f"Desempenho Médio no SIMULADO - {regiao}\n(por disciplina)")
+    grafico = grafico_barras_1(eixo_simulado, media_simulado, paleta_cores['SIMULADO'])
+    valor_barras(grafico, 1)
+    eixo_simulado.set_xlabel('Taxa de Acerto (%)')
+    eixo_simulado.set_ylabel('Disciplina')
+
+    # GRÁFICO 2: DESEMPENHO NO SARESP (df_final_saresp)
+    eixo_saresp.set_title(f"Desempenho Médio no SARESP - {regiao}\n(por série e disciplina)")
+    grafico = grafico_barras_agrupadas(eixo_saresp, media_saresp, 'Série', 'Disciplina', 'Nota Média',
+                                       paleta_cores['SARESP'])
+    valor_barras(grafico, 1)
+    eixo_saresp.set_xlabel('Nota Média')
+    eixo_saresp.set_ylabel('Série')
+    eixo_saresp.legend(title='Disciplina')
+
+    # GRÁFICO 3: DISTRIBUIÇÃO RACIAL (df_raca_filtrada)
+    eixo_raca.set_title(f"Distribuição Racial - {regiao}\n(Brancos vs Negros)")
+    grafico_setores_1(eixo_raca, distribuicao_racial, paleta_cores['RAÇA'])
+
+    figura.tight_layout(pad=3.0)  # Aumenta o padding entre os gráficos
+
+
+def desenhar_regressao(figura, pontos, regressao, bandas):
+    """Dispersão, reta ajustada e banda de confiança por disciplina"""
+    eixos = figura.subplots(1, len(regressao), sharex=True, sharey=True, squeeze=False)
+    for eixo, ajuste in zip(eixos[0], regressao.itertuples()):
+        da_disciplina = pontos[pontos['Disciplina'] == ajuste.Disciplina]
+        banda = bandas[bandas['Disciplina'] == ajuste.Disciplina]
+        eixo.scatter(da_disciplina['Média_Pretos_e_Pardos'], da_disciplina['Taxa_Acerto'])
+        eixo.plot(banda['x'], banda['previsto'])
+        eixo.fill_between(banda['x'], banda['inferior'], banda['superior'], alpha=0.15)
+        eixo.set_title(f"Disciplina = {ajuste.Disciplina}\nr = {ajuste.r:.2f}, p = {ajuste.p_valor:.3f}")
+        eixo.set_xlabel("% de alunos pretos/pardos")
+    eixos[0][0].set_ylabel("Taxa de acerto (%)")
+
+    # Ajustar título
+    figura.suptitle('Taxa de acerto no simulado vs % de alunos pretos/pardos', y=1.05)
+    figura.tight_layout()
+
+
+def desenhar_escola(figura, linhas, escola):
+    """Taxa de acerto da escola e média da DE por série e disciplina"""
+    eixo = figura.subplots()
+    rotulos = linhas['SERIE_ANO'].astype(str) + " · " + linhas['Disciplina'].astype(str)
+    posicoes = np.arange(len(linhas))
+    eixo.bar(posicoes - 0.2, linhas['Taxa_Acerto'], width=0.4, label='Escola')
+    eixo.bar(posicoes + 0.2, linhas['Taxa_Acerto_DE'], width=0.4, label='Média da DE')
+    for container in eixo.containers:
+        eixo.bar_label(container, fmt='%.1f', label_type='edge')
+    eixo.set_xticks(posicoes, rotulos)
+    eixo.set_ylabel('Taxa de acerto no Simulado (%)')
+    eixo.set_title(escola)
+    eixo.legend()
+    # Margens fixas: gerada para cada escola, sem o custo do tight_layout
+    figura.subplots_adjust(left=0.08, right=0.98, top=0.9, bottom=0.12)
@@ -0,0 +1,153 @@
+"""Filtros da barra lateral com fatiamento por índice de grupos.
+
+Para cada coluna filtrável, o índice guarda as posições das linhas de cada
+valor (códigos categóricos ordenados uma única vez). Aplicar um filtro junta
+as posições dos valores escolhidos e intersecta entre colunas, sem comparar
+todas as linhas a cada mudança de widget. As fatias de cada combinação de
+filtros ficam memorizadas (LRU) e são devolvidas sem cópia: como os DataFrames
+de `ler_snapshot_compartilhado`, são compartilhadas e não devem ser alteradas
+no lugar. Passando a `versao` dos dados (por exemplo, a assinatura dos
+snapshots) para `indexar`, um rerun não percorre as linhas da tabela.
+
+A DE é filtrada pelo nome normalizado (`DE_NORM`) e a escola pelo
+`ID_ESCOLA`, então "JUNDIAÍ" e "JUNDIAI" caem no mesmo filtro.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from estatisticas import impressao_digital
+
+COLUNAS_FILTRO = ['DE_NORM', 'SERIE_ANO', 'Disciplina', 'MODALIDADE', 'ID_ESCOLA']
+MAX_INDICES_MEMORIZADOS = 16
+MAX_FATIAS_MEMORIZADAS = 64
+
+_indices = OrderedDict()
+_fatias = OrderedDict()
+_trava = threading.Lock()
+
+
+def _memorizar(memoria, chave, valor, limite):
+    with _trava:
+        memoria[chave] = valor
+        while len(memoria) > limite:
+            memoria.popitem(last=False)
+
+
+class IndiceGrupos:
+    """Posições das linhas de cada valor das colunas filtráveis de um DataFrame"""
+
+    def __init__(self, df, colunas=None, versao=None):
+        self.df = df
+        self.versao = versao or impressao_digital(df)
+        self.colunas = [coluna for coluna in (colunas or COLUNAS_FILTRO) if coluna in df.columns]
+        self._grupos = {}
+        for coluna in self.colunas:
+            codigos, valores = pd.factorize(df[coluna], sort=True)
+            ordem = np.argsort(codigos, kind='stable')
+            # Código -1 (valor ausente) fica no começo da ordem e não entra em nenhum grupo
+            contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+            inicio = int((codigos < 0).sum())
+            limites = inicio + np.concatenate([[0], np.cumsum(contagens)])
+            self._grupos[coluna] = {
+                valor: ordem[limites[posicao]:limites[posicao + 1]]
+                for posicao, valor in enumerate(valores)
+            }
+
+    def opcoes(self, coluna):
+        """Valores distintos de `coluna` (vazio se a coluna não existir)"""
+        return list(self._grupos.get(coluna, {}))
+
+    def posicoes(self, filtros):
+        """Posições (ordenadas) das linhas que atendem a todos os filtros"""
+        resultado = None
+        for coluna, valores in filtros.items():
+            if coluna not in self._grupos or not valores:
+                continue
+            grupos = self._grupos[coluna]
+            partes = [grupos[valor] for valor in valores if valor in grupos]
+            selecionadas = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+            resultado = (selecionadas if resultado is None
+                         else np.intersect1d(resultado, selecionadas, assume_unique=True))
+        return resultado
+
+    def fatiar(self, filtros):
+        """Linhas que atendem aos filtros {coluna: valores}; colunas ausentes são ignoradas"""
+        aplicaveis = chave_filtros(filtros, self._grupos)
+        if not aplicaveis:
+            return self.df
+        chave = (self.versao, aplicaveis)
+        with _trava:
+            if chave in _fatias:
+                _fatias.move_to_end(chave)
+                return _fatias[chave]
+
+        fatia = self.df.iloc[self.posicoes(dict(aplicaveis))]
+        _memorizar(_fatias, chave, fatia, MAX_FATIAS_MEMORIZADAS)
+        return fatia
+
+
+def chave_filtros(filtros, colunas=None):
+    """Seleção {coluna: valores} como tupla ordenada, para chaves de memorização.
+
+    Seleções vazias e colunas fora de `colunas` (se informadas) ficam de fora.
+    """
+    return tuple(sorted(
+        (coluna, tuple(sorted(valores, key=str)))
+        for coluna, valores in filtros.items() if valores and (colunas is None or coluna in colunas)
+    ))
+
+
+def indexar(df, colunas=None, versao=None):
+    """Índice de grupos do DataFrame, reaproveitado enquanto a versão dos dados não mudar.
+
+    Sem `versao`, ela é a impressão digital do conteúdo (percorre todas as linhas).
+    """
+    versao = versao or impressao_digital(df)
+    chave = (versao, tuple(colunas or COLUNAS_FILTRO))
+    with _trava:
+        if chave in _indices:
+            _indices.move_to_end(chave)
+            return _indices[chave]
+
+    indice = IndiceGrupos(df, colunas, versao)
+    _memorizar(_indices, chave, indice, MAX_INDICES_MEMORIZADOS)
+    return indice
+
+
+def filtros_barra_lateral(dimensao, indices, padroes=None, chave="filtros"):
+    """Widgets de DE, série, disciplina, modalidade e escola; devolve {coluna: valores escolhidos}.
+
+    As opções saem da dimensão de escolas e dos índices das tabelas da página.
+    Uma seleção vazia não filtra a coluna.
+    """
+    import streamlit as st
+
+    padroes = padroes or {}
+    st.sidebar.header("Filtros")
+    selecao = {}
+    des = sorted(dimensao['DE_NORM'].dropna().unique())
+    selecao['DE_NORM'] = st.sidebar.multiselect(
+        "DE", des, default=[de for de in padroes.get('DE_NORM', []) if de in des], key=f"{chave}_de")
+    for coluna, rotulo in (('SERIE_ANO', "Série"), ('Disciplina', "Disciplina"),
+                           ('MODALIDADE', "Modalidade")):
+        opcoes = sorted(set().union(*(indice.opcoes(coluna) for indice in indices)), key=str)
+        if opcoes:
+            selecao[coluna] = st.sidebar.multiselect(
+                rotulo, opcoes, default=[valor for valor in padroes.get(coluna, []) if valor in opcoes],
+                key=f"{chave}_{coluna}")
+
+    escolas = dimensao if not selecao['DE_NORM'] else dimensao[dimensao['DE_NORM'].isin(selecao['DE_NORM'])]
+    nomes = dict(zip(escolas['ID_ESCOLA'].tolist(), escolas['ESCOLA']))
+    selecao['ID_ESCOLA'] = st.sidebar.multiselect("Escola", list(nomes), format_func=nomes.get,
+                                                  key=f"{chave}_escola")
+    return {coluna: valores for coluna, valores in selecao.items() if valores}
+
+
+def descrever(filtros, coluna='DE_NORM', todos="todas as DEs"):
+    """Texto curto com os valores filtrados de `coluna`, para títulos de gráficos"""
+    valores = filtros.get(coluna)
+    return ", ".join(str(valor) for valor in valores) if valores else todos
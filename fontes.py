@@ -0,0 +1,33 @@
+"""Fontes de dados: o arquivo de microdados e as planilhas das páginas de correlação.
+
+Ficam fora dos scripts para que o benchmark e os testes possam gerar
+snapshots sintéticos com as mesmas chaves sem executar as páginas. O prefixo
+de cada nome (simulado, saresp, raca) indica o tipo de planilha.
+"""
+
+# Microdados por aluno usados pelas páginas do app.py (troque esse nome conforme necessário)
+MICRODADOS = "dados_saresp.csv"
+
+# Configuração das URLs das planilhas (substitua com seus links reais)
+PLANILHAS_CORRELACAO = {
+    "simulado": "https://docs.google.com/spreadsheets/d/1WdYDSdSnoZYGrqOZQ6et0ATZ6I_cn68sy40TDvU-7us/edit",
+    "raca_jundiai": "https://docs.google.com/spreadsheets/d/1ukOdMgipTZKbeutiX2dypD_CU1y0PZMzqg6nBIYM--k/edit",
+    "raca_sul1": "https://docs.google.com/spreadsheets/d/1r4Dnkqnw6eSYFzTbgM5gCPdDfMP3iglQn1Atkd_9V1c/edit",
+    "saresp_jundiai": "https://docs.google.com/spreadsheets/d/1rVWqlFSdWczK0SYZ4ecSdloJJ4BNllgy7m0K5q9G31Q/edit",
+    "saresp_sul1": "https://docs.google.com/spreadsheets/d/1mMU5WVwGLQhSf_AwKBXJVaSyMOsqplZqaUeBLAQf-iM/edit",
+    "simulado_sul1": "https://docs.google.com/spreadsheets/d/1iuHE5IHQUVaIuo2Z5x5wqJGT2VRJostnVrH40mvHfL4/edit?usp=drive_link",
+    "simulado_sul2": "https://docs.google.com/spreadsheets/d/1A0L4YwrVFt77Up049RSdZ9Toe9FD-oXkjERkdppFy0g/edit?usp=drive_link"
+}
+
+PLANILHAS_CORRELACAO_V2 = {
+    "simulado_id_9anoJundiai_e_Sul1": "https://docs.google.com/spreadsheets/d/1WdYDSdSnoZYGrqOZQ6et0ATZ6I_cn68sy40TDvU-7us/edit",
+    "saresp_jundiai": "https://docs.google.com/spreadsheets/d/1rVWqlFSdWczK0SYZ4ecSdloJJ4BNllgy7m0K5q9G31Q/edit",
+    "saresp_sul1_5_e_9ano": "https://docs.google.com/spreadsheets/d/1mMU5WVwGLQhSf_AwKBXJVaSyMOsqplZqaUeBLAQf-iM/edit",
+    "simulado_sul1": "https://docs.google.com/spreadsheets/d/1iuHE5IHQUVaIuo2Z5x5wqJGT2VRJostnVrH40mvHfL4/edit?usp=drive_link",
+    "simulado_sul2": "https://docs.google.com/spreadsheets/d/1A0L4YwrVFt77Up049RSdZ9Toe9FD-oXkjERkdppFy0g/edit?usp=drive_link",
+    "raca_DEParceiras": "https://docs.google.com/spreadsheets/d/1tyeyM4xhf0KVXthCsSUGF3Wlc9cv4B1EBq7hHUJYV10/edit?usp=drive_link"
+}
+
+# Planilhas que as páginas só mostram (amostras) ou que só entram na dimensão de
+# escolas quando têm DE e ESCOLA: as colunas do esquema do seu tipo são opcionais
+PLANILHAS_SO_EXIBIDAS = {"raca_jundiai", "raca_sul1", "simulado_sul1", "simulado_sul2"}
@@ -0,0 +1,140 @@
+"""Leitura em blocos dos microdados do SARESP.
+
+Os microdados oficiais têm milhões de linhas de alunos e não cabem na memória
+do container quando lidos com um único `pd.read_csv`. Aqui o arquivo é lido em
+blocos de `TAMANHO_BLOCO` linhas, só com as colunas usadas pelos dashboards e
+com tipos compactos (categorias para as chaves, float32 para as notas), cada
+bloco validado pelo esquema dos microdados (`esquemas.py`). Cada
+bloco alimenta agregados acumulados (médias por grupo e estatísticas
+suficientes da regressão) e uma amostra aleatória de tamanho fixo usada nos
+gráficos; o bloco é descartado em seguida, então o pico de memória não depende
+do tamanho do arquivo.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import obter
+from esquemas import somar_relatorios, validar
+from estatisticas import combinar_somas, regressao_de_somas, somas_suficientes
+
+COLUNAS_CHAVE = ['DE', 'ESCOLA', 'SERIE_ANO', 'Disciplina', 'Race']
+COLUNAS_NOTA = ['SARESP', 'Simulado']
+GRUPOS_REGRESSAO = ['DE', 'SERIE_ANO', 'Disciplina']
+TAMANHO_BLOCO = int(os.environ.get("SARESP_TAMANHO_BLOCO", "200000"))
+TAMANHO_AMOSTRA = int(os.environ.get("SARESP_TAMANHO_AMOSTRA", "50000"))
+# Arquivos maiores que isso são lidos em blocos
+LIMITE_LEITURA_INTEIRA = int(os.environ.get("SARESP_LIMITE_MB", "200")) * 1024 ** 2
+
+
+def arquivo_grande(caminho):
+    """Indica se o arquivo deve ser lido em blocos"""
+    return os.path.exists(caminho) and os.path.getsize(caminho) > LIMITE_LEITURA_INTEIRA
+
+
+class ResumoSaresp:
+    """Agregados dos microdados acumulados bloco a bloco, com uma amostra de tamanho fixo"""
+
+    def __init__(self, x='Simulado', y='SARESP', tamanho_amostra=TAMANHO_AMOSTRA, semente=0):
+        self.x, self.y = x, y
+        self.tamanho_amostra = tamanho_amostra
+        self.linhas = 0
+        self.amostra = None
+        self._chaves_amostra = np.empty(0)
+        self._rng = np.random.default_rng(semente)
+        self._medias = {}
+        self._deslocamento = None
+        self._somas = {}
+        self.qualidade = None
+
+    def adicionar(self, bloco):
+        """Incorpora um bloco de linhas aos agregados e à amostra"""
+        self.linhas += len(bloco)
+        for grupo in (coluna for coluna in COLUNAS_CHAVE if coluna in bloco.columns):
+            for valor in (coluna for coluna in COLUNAS_NOTA if coluna in bloco.columns):
+                somas = bloco[valor].astype('float64').groupby(
+                    bloco[grupo], observed=True).agg(['count', 'sum'])
+                anterior = self._medias.get((grupo, valor))
+                self._medias[(grupo, valor)] = (
+                    somas if anterior is None else anterior.add(somas, fill_value=0))
+
+        if self.x in bloco.columns and self.y in bloco.columns:
+            pares = bloco.dropna(subset=[self.x, self.y])
+            if self._deslocamento is None and len(pares):
+                self._deslocamento = (float(pares[self.x].mean()), float(pares[self.y].mean()))
+            if len(pares):
+                grupos = [None] + [grupo for grupo in GRUPOS_REGRESSAO if grupo in pares.columns]
+                for grupo in grupos:
+                    somas = somas_suficientes(pares, self.x, self.y,
+                                              [grupo] if grupo else None, self._deslocamento)
+                    self._somas[grupo] = combinar_somas(self._somas.get(grupo), somas)
+
+        # Amostra uniforme: cada linha recebe uma chave aleatória e ficam as menores
+        chaves = self._rng.random(len(bloco))
+        if self.amostra is None:
+            candidatos, chaves_candidatas = bloco, chaves
+        else:
+            candidatos = pd.concat([self.amostra, bloco], ignore_index=True)
+            chaves_candidatas = np.concatenate([self._chaves_amostra, chaves])
+        if len(candidatos) > self.tamanho_amostra:
+            manter = np.argpartition(chaves_candidatas, self.tamanho_amostra)[:self.tamanho_amostra]
+            candidatos = candidatos.iloc[np.sort(manter)]
+            chaves_candidatas = chaves_candidatas[np.sort(manter)]
+        self.amostra = candidatos.reset_index(drop=True)
+        self._chaves_amostra = chaves_candidatas
+
+    def finalizar(self):
+        """Converte as chaves da amostra de volta em categóricas"""
+        if self.amostra is not None:
+            colunas = [coluna for coluna in COLUNAS_CHAVE if coluna in self.amostra.columns]
+            self.amostra = self.amostra.astype({coluna: 'category' for coluna in colunas})
+        return self
+
+    def media_por_grupo(self, grupo, valor):
+        """Média exata de `valor` por `grupo` sobre todas as linhas lidas"""
+        somas = self._medias[(grupo, valor)]
+        return (somas['sum'] / somas['count']).rename(valor).reset_index()
+
+    def regressao(self, grupo=None):
+        """Regressão exata de y ~ x (opcionalmente por grupo) sobre todas as linhas lidas"""
+        return regressao_de_somas(self._somas[grupo], self._deslocamento)
+
+    def grupos_regressao(self):
+        """Grupos para os quais há regressão por grupo"""
+        return [grupo for grupo in self._somas if grupo is not None]
+
+
+def ler_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """Lê o CSV em blocos validados, gerando (bloco, relatório de qualidade do bloco).
+
+    Chama `progresso(fração lida)` a cada bloco. As notas são lidas sem tipo fixo
+    para que um texto solto não interrompa a leitura; o esquema as converte.
+    """
+    necessarias = set(COLUNAS_CHAVE + COLUNAS_NOTA)
+    tipos = {coluna: 'category' for coluna in COLUNAS_CHAVE}
+    tamanho = os.path.getsize(caminho) or 1
+    with open(caminho, 'rb') as arquivo:
+        leitor = pd.read_csv(arquivo, usecols=lambda coluna: coluna in necessarias,
+                             dtype=tipos, chunksize=tamanho_bloco)
+        for bloco in leitor:
+            yield validar(bloco, "microdados")
+            if progresso is not None:
+                progresso(min(arquivo.tell() / tamanho, 1.0))
+
+
+def resumir_csv(caminho, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """Resumo dos microdados, compartilhado entre sessões enquanto o arquivo não mudar"""
+    estado = os.stat(caminho)
+    chave = ("resumo_csv", os.path.abspath(caminho), estado.st_mtime_ns, estado.st_size, tamanho_bloco)
+
+    def resumir():
+        resumo = ResumoSaresp()
+        for bloco, qualidade in ler_em_blocos(caminho, tamanho_bloco, progresso):
+            resumo.adicionar(bloco)
+            resumo.qualidade = somar_relatorios(resumo.qualidade, qualidade)
+        resumo.finalizar()
+        return resumo
+
+    return obter(chave, resumir)
@@ -0,0 +1,196 @@
+"""Medição por etapa (carga, pontuação, merge, gráficos) dos dashboards.
+
+Cada etapa dos scripts é envolvida por `etapa(nome, entrada)`, que registra
+tempo de relógio, tempo de CPU da thread, linhas de entrada e de saída e a
+variação da memória residente do processo. Com o diagnóstico desligado,
+`etapa` devolve um objeto vazio e o custo é uma chamada de função. O
+diagnóstico é ligado pela variável de ambiente `SARESP_DIAGNOSTICO=1` ou pela
+caixa "Diagnóstico de desempenho" na barra lateral. Os registros aparecem na
+barra lateral e podem ser baixados em JSON lines (ou gravados continuamente em
+`SARESP_DIAGNOSTICO_ARQUIVO`).
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+
+ATIVO_PADRAO = os.environ.get("SARESP_DIAGNOSTICO", "") not in ("", "0")
+ARQUIVO_DIAGNOSTICO = os.environ.get("SARESP_DIAGNOSTICO_ARQUIVO")
+MAX_EXECUCOES = 50  # execuções guardadas por sessão para exportação
+
+# O Streamlit roda o script de cada sessão em uma thread própria
+_local = threading.local()
+_trava_arquivo = threading.Lock()
+
+
+def _memoria_residente():
+    """Memória residente do processo em bytes (None fora do Linux)"""
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _linhas(objeto):
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        return len(objeto)
+    if isinstance(objeto, dict):
+        return sum(_linhas(valor) or 0 for valor in objeto.values())
+    return None
+
+
+class _EtapaNula:
+    """Usada quando o diagnóstico está desligado: não mede nada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+    def saida(self, objeto):
+        return objeto
+
+
+_NULA = _EtapaNula()
+
+
+class _Etapa:
+    def __init__(self, nome, entrada):
+        self.nome = nome
+        self.linhas_entrada = _linhas(entrada)
+        self.linhas_saida = None
+
+    def __enter__(self):
+        self._memoria = _memoria_residente()
+        self._cpu = time.thread_time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        segundos = time.perf_counter() - self._inicio
+        cpu = time.thread_time() - self._cpu
+        memoria = _memoria_residente()
+        _local.registros.append({
+            "execucao": _local.execucao,
+            "pagina": _local.pagina,
+            "etapa": self.nome,
+            "segundos": round(segundos, 6),
+            "cpu_segundos": round(cpu, 6),
+            "linhas_entrada": self.linhas_entrada,
+            "linhas_saida": self.linhas_saida,
+            "memoria_mb": (None if memoria is None or self._memoria is None
+                           else round((memoria - self._memoria) / 1024 ** 2, 3)),
+            "erro": tipo.__name__ if tipo else None,
+        })
+        return False
+
+    def saida(self, objeto):
+        """Registra as linhas de saída da etapa e devolve o próprio objeto"""
+        self.linhas_saida = _linhas(objeto)
+        return objeto
+
+
+def iniciar_execucao(pagina):
+    """Começa uma nova execução do script (chamar no topo de cada página)"""
+    ligado = ATIVO_PADRAO
+    try:
+        import streamlit as st
+        ligado = ligado or bool(st.session_state.get("diagnostico", False))
+    except Exception:
+        # Fora do Streamlit (scripts e benchmark) vale só a variável de ambiente
+        pass
+    _local.ativo = ligado
+    _local.pagina = pagina
+    _local.execucao = uuid.uuid4().hex[:12]
+    _local.inicio = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    _local.registros = []
+
+
+def ativo():
+    """Indica se a execução atual está sendo medida"""
+    return getattr(_local, "ativo", False)
+
+
+def etapa(nome, entrada=None):
+    """Gerenciador de contexto que mede uma etapa; use `.saida(resultado)` para as linhas de saída"""
+    if not getattr(_local, "ativo", False):
+        return _NULA
+    return _Etapa(nome, entrada)
+
+
+def medido(nome):
+    """Decorador que mede cada chamada da função como uma etapa"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not getattr(_local, "ativo", False):
+                return funcao(*args, **kwargs)
+            with _Etapa(nome, args[0] if args else None) as medicao:
+                return medicao.saida(funcao(*args, **kwargs))
+        return envolvida
+    return decorador
+
+
+def registros():
+    """Registros da execução atual"""
+    return list(getattr(_local, "registros", []))
+
+
+def para_jsonl(linhas):
+    """Serializa registros em JSON lines"""
+    return "".join(json.dumps(linha, ensure_ascii=False) + "\n" for linha in linhas)
+
+
+def _finalizar():
+    atuais = [dict(registro, inicio=_local.inicio) for registro in _local.registros]
+    if ARQUIVO_DIAGNOSTICO and atuais:
+        with _trava_arquivo, open(ARQUIVO_DIAGNOSTICO, "a", encoding="utf-8") as arquivo:
+            arquivo.write(para_jsonl(atuais))
+    return atuais
+
+
+def painel_diagnostico():
+    """Mostra a caixa de diagnóstico e, se ligada, as medições na barra lateral (chamar no fim)"""
+    import streamlit as st
+
+    st.sidebar.checkbox("Diagnóstico de desempenho", key="diagnostico",
+                        help="Mede tempo, CPU, linhas e memória de cada etapa desta página")
+    if not ativo():
+        return
+
+    atuais = _finalizar()
+    historico = st.session_state.setdefault("diagnostico_historico", [])
+    historico.extend(atuais)
+    execucoes = list(dict.fromkeys(registro["execucao"] for registro in historico))
+    if len(execucoes) > MAX_EXECUCOES:
+        manter = set(execucoes[-MAX_EXECUCOES:])
+        historico[:] = [registro for registro in historico if registro["execucao"] in manter]
+
+    with st.sidebar.expander("Medições desta execução", expanded=True):
+        if not atuais:
+            st.caption("Nenhuma etapa medida.")
+        else:
+            tabela = pd.DataFrame(atuais)[["etapa", "segundos", "cpu_segundos", "linhas_entrada",
+                                           "linhas_saida", "memoria_mb"]]
+            st.dataframe(tabela, hide_index=True, use_container_width=True)
+            st.caption(f"Total medido: {tabela['segundos'].sum():.3f} s")
+            st.download_button("Baixar medições (JSON lines)", para_jsonl(historico),
+                               file_name="diagnostico.jsonl", mime="application/jsonl")
+
+    from cache import metricas
+
+    with st.sidebar.expander("Cache compartilhado"):
+        cache = metricas()
+        taxa = "–" if cache["taxa_acerto"] is None else f"{cache['taxa_acerto']:.0%}"
+        st.caption(f"{cache['itens']} itens · {cache['bytes'] / 1024 ** 2:.1f} de "
+                   f"{cache['limite_bytes'] / 1024 ** 2:.0f} MB · taxa de acerto {taxa}")
+        st.json({nome: cache[nome] for nome in ["acertos", "acertos_disco", "calculos", "esperas",
+                                                "remocoes", "grandes_demais", "disco"]})
@@ -0,0 +1,370 @@
+"""Análise de correlação de todas as DEs em lote, distribuída em processos.
+
+Roda para cada Diretoria de Ensino o mesmo pipeline do `Correlacao_v2.py`
+(pontuação do Simulado, merge com o SARESP e com a composição racial,
+regressão por disciplina e os dois gráficos) sem o Streamlit:
+
+    python lote.py --saida relatorio_lote
+    python lote.py --saida relatorio_lote --processos 4 --des "SUL 1" JUNDIAI
+    python lote.py --refazer --sem-figuras-escolas
+
+O processo principal lê os snapshots uma vez, anexa o ID_ESCOLA, ordena cada
+base por DE e a grava em um arquivo Arrow IPC sem compressão. Os processos do
+pool abrem esses arquivos por memory-map e recebem só o nome da DE e o trecho
+de linhas dela, então os DataFrames não são serializados para cada processo;
+cada um converte para pandas só as linhas da sua DE. As respostas do Simulado
+vão compactadas (`respostas.py`, dois bits por resposta), também em Arrow IPC
+por memory-map, e cada DE é uma visão delas, sem cópia; a dimensão de escolas
+vai do mesmo jeito. As tabelas de cada DE voltam para o processo principal e formam um único relatório (CSV + JSON +
+index.html); os relatórios HTML/PNG/CSV de cada DE e de cada escola
+(`relatorios.py`) são gravados pelos próprios processos. Quando o pool não
+compensa a partida dos processos (uma CPU, ou poucas DEs por processo; veja
+`processos_uteis`), as DEs são analisadas no próprio processo principal.
+
+Cada DE guarda no relatorio.json a impressão digital das suas entradas. Na
+execução seguinte (por exemplo, agendada), uma DE cujas entradas não mudaram
+reaproveita os arquivos já gravados em vez de refazer pontuação, regressão e
+figuras; `--refazer` ignora isso.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cubo import cubo_raca, cubo_saresp, cubo_simulado
+from escolas import anexar_id_escola, atualizar_dimensao, normalizar_texto
+from estatisticas import bandas_confianca, impressao_digital, regressao_por_grupo
+from fontes import PLANILHAS_CORRELACAO_V2
+from pontuacao import CHAVES_SIMULADO
+from raca import composicao_da_origem
+from relatorios import escrever_de, escrever_escolas, escrever_indice, pasta_da_de
+from respostas import RespostasCompactas
+from snapshots import DIRETORIO_SNAPSHOTS, carregar_snapshots
+
+DIRETORIO_SAIDA = "relatorio_lote"
+PROCESSOS = int(os.environ.get("SARESP_PROCESSOS", "0")) or os.cpu_count() or 1
+# "spawn" não herda threads (pyarrow, Streamlit) do processo principal; as entradas
+# chegam por memory-map, então não há nada grande para herdar por fork
+CONTEXTO_PROCESSOS = os.environ.get("SARESP_CONTEXTO_PROCESSOS", "spawn")
+# DEs que cada processo do pool precisa receber, sem as figuras das escolas, para compensar
+# a sua partida (veja `processos_uteis`)
+MIN_DES_POR_PROCESSO = int(os.environ.get("SARESP_MIN_DES_POR_PROCESSO", "6"))
+PALETA_CORES = {'SIMULADO': 'flare_r', 'SARESP': 'viridis_r', 'RAÇA': 'magma_r'}
+COLUNAS_RACA_PAINEL = ['Branca', 'Pretos_e_Pardos', 'Não declarada']
+# Mudar quando o conteúdo dos relatórios mudar, para não reaproveitar arquivos antigos
+VERSAO_RELATORIO = 1
+
+# Estado de cada processo do pool, preenchido por `_iniciar_processo`
+_entradas = {}
+_trechos = {}
+_contexto = {}
+
+
+def _trechos_por_de(df):
+    """{DE_NORM: (início, quantidade)} de um DataFrame já ordenado por DE_NORM"""
+    valores = df['DE_NORM'].astype(object).to_numpy()
+    if not len(valores):
+        return {}
+    quebras = np.flatnonzero(valores[1:] != valores[:-1]) + 1
+    inicios = np.concatenate([[0], quebras])
+    fins = np.concatenate([quebras, [len(valores)]])
+    return {valores[inicio]: (int(inicio), int(fim - inicio)) for inicio, fim in zip(inicios, fins)}
+
+
+def gravar_entrada(df, caminho):
+    """Ordena por DE, grava em Arrow IPC (sem compressão, para memory-map) e devolve os trechos"""
+    ordenado = df.dropna(subset=['DE_NORM']).sort_values('DE_NORM', kind='stable')
+    _gravar_arrow(ordenado, caminho)
+    return _trechos_por_de(ordenado)
+
+
+def _gravar_arrow(df, caminho):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(caminho, "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+
+def _abrir_arrow(caminho):
+    return pa.ipc.open_file(pa.memory_map(caminho, "r")).read_all()
+
+
+def preparar_entradas(diretorio_trabalho, snapshots=None):
+    """Lê os snapshots, anexa ID_ESCOLA e composição racial e grava as entradas do lote.
+
+    As respostas do Simulado viram `RespostasCompactas` (dois bits por
+    resposta), gravadas em `respostas/` e fatiadas por DE sem cópia; a dimensão
+    de escolas vai inteira para `dimensao.arrow`. Devolve (caminhos, trechos,
+    DEs com respostas).
+    """
+    planilhas = carregar_snapshots(PLANILHAS_CORRELACAO_V2, snapshots)
+    respostas = planilhas["simulado_id_9anoJundiai_e_Sul1"]
+    saresp = pd.concat([planilhas["saresp_sul1_5_e_9ano"], planilhas["saresp_jundiai"]], ignore_index=True)
+    raca = composicao_da_origem(PLANILHAS_CORRELACAO_V2["raca_DEParceiras"], planilhas["raca_DEParceiras"],
+                                snapshots)
+    dimensao = atualizar_dimensao([respostas, saresp, raca], snapshots)
+
+    compactas = RespostasCompactas.de_respostas(anexar_id_escola(respostas, dimensao),
+                                                CHAVES_SIMULADO + ['ID_ESCOLA'], coluna_de='DE_NORM')
+    bases = {
+        "saresp": anexar_id_escola(saresp[['DE', 'SERIE_ANO', 'ESCOLA', 'LP', 'MAT', 'MODALIDADE']], dimensao),
+        "raca": anexar_id_escola(raca, dimensao),
+    }
+    caminhos, trechos = {}, {}
+    for nome, df in bases.items():
+        caminhos[nome] = os.path.join(diretorio_trabalho, f"{nome}.arrow")
+        trechos[nome] = gravar_entrada(df, caminhos[nome])
+    caminhos["dimensao"] = os.path.join(diretorio_trabalho, "dimensao.arrow")
+    _gravar_arrow(dimensao[['ID_ESCOLA', 'DE', 'ESCOLA']], caminhos["dimensao"])
+    caminhos["respostas"] = os.path.join(diretorio_trabalho, "respostas")
+    compactas.gravar(caminhos["respostas"])
+    return caminhos, trechos, compactas.des()
+
+
+def _iniciar_processo(caminhos, trechos, saida, anteriores, figuras_escolas):
+    """Abre as entradas por memory-map uma vez em cada processo do pool (ou no próprio processo)"""
+    import matplotlib
+    matplotlib.use("Agg")
+
+    for nome in trechos:
+        _entradas[nome] = _abrir_arrow(caminhos[nome])
+    _trechos.update(trechos)
+    _contexto.update(dimensao=_abrir_arrow(caminhos["dimensao"]).to_pandas(),
+                     respostas=RespostasCompactas.abrir(caminhos["respostas"]),
+                     saida=saida, anteriores=anteriores, figuras_escolas=figuras_escolas)
+
+
+def _encerrar_processo():
+    """Solta as entradas abertas por `_iniciar_processo` (execução no próprio processo)"""
+    _entradas.clear()
+    _trechos.clear()
+    _contexto.clear()
+
+
+def processos_uteis(processos, des, figuras_escolas=True):
+    """Processos do pool que compensam para `des` DEs (1 = no próprio processo, sem pool).
+
+    Cada processo spawn leva cerca de 2,3 s só para importar pandas, pyarrow e
+    matplotlib, e uma DE leva cerca de 0,4 s sem as figuras das escolas e 7,5 s
+    com elas. Medido com `benchmark.py --lote 1 2` (1 CPU, sem as figuras das
+    escolas): com 2, 8 e 20 DEs, 4,2 s, 4,0 s e 8,1 s no próprio processo,
+    contra 5,5 s, 6,6 s e 10,9 s com um pool de 1 processo e 8,0 s, 10,4 s e
+    14,6 s com 2 processos disputando a CPU. Com P CPUs o pool só compensa
+    quando DEs × segundos por DE × (1 - 1/P) passa da partida (~2,5 s): com 2
+    CPUs, a partir de ~12 DEs sem as figuras das escolas (MIN_DES_POR_PROCESSO
+    por processo) e já com 2 DEs com elas. Nunca mais de um processo por CPU.
+    """
+    minimo = 1 if figuras_escolas else MIN_DES_POR_PROCESSO
+    return max(1, min(processos, os.cpu_count() or 1, des // minimo))
+
+
+def _fatia(nome, de):
+    """Linhas da DE em uma das entradas (só esse trecho é convertido para pandas)"""
+    inicio, quantidade = _trechos[nome].get(de, (0, 0))
+    return _entradas[nome].slice(inicio, quantidade).to_pandas()
+
+
+def _impressao(entradas):
+    """Impressão digital das entradas de uma DE (e da versão do relatório)"""
+    digest = hashlib.sha1(str(VERSAO_RELATORIO).encode("utf-8"))
+    for nome in sorted(entradas):
+        digest.update(impressao_digital(entradas[nome]).encode("utf-8"))
+    digest.update(str(_contexto["figuras_escolas"]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _reaproveitar(anterior, pasta, inicio):
+    """Resultado de uma DE já gravada cujas entradas não mudaram"""
+    resumo = dict(anterior, reaproveitado=True, erro=None)
+    resumo["segundos"] = round(time.perf_counter() - inicio, 6)
+    return {"resumo": resumo, "escolas": pd.read_csv(os.path.join(pasta, "dados.csv")),
+            "regressao": pd.read_csv(os.path.join(pasta, "regressao.csv")).assign(DE=resumo["de"])}
+
+
+def analisar_de(de):
+    """Pipeline do Correlacao_v2 para uma DE e relatórios da DE e das escolas.
+
+    Devolve as tabelas da DE e um resumo da execução.
+    """
+    from figuras import desenhar_escola, desenhar_painel, desenhar_regressao, renderizar
+
+    inicio = time.perf_counter()
+    pasta = pasta_da_de(_contexto["saida"], de)
+    respostas = _contexto["respostas"].fatia_de(de)
+    resumo = {"de": de, "linhas_respostas": len(respostas), "escolas": 0,
+              "figuras": [], "impressao": None, "reaproveitado": False, "erro": None}
+    vazio = {"resumo": resumo, "escolas": pd.DataFrame(), "regressao": pd.DataFrame()}
+    try:
+        entradas = {nome: _fatia(nome, de) for nome in _trechos}
+        # As contagens por grupo determinam a pontuação; a impressão digital usa só elas
+        entradas["respostas"] = respostas.contagens()
+        resumo["impressao"] = _impressao(entradas)
+        anterior = _contexto["anteriores"].get(de)
+        if (anterior and anterior.get("impressao") == resumo["impressao"]
+                and os.path.exists(os.path.join(pasta, "index.html"))):
+            return _reaproveitar(anterior, pasta, inicio)
+
+        acertos = respostas.acertos(CHAVES_SIMULADO + ['ID_ESCOLA'])
+        cubo_acertos = cubo_simulado(acertos)
+        cubo_notas = cubo_saresp(entradas["saresp"])
+        raca = entradas["raca"]
+        cubo_cor = cubo_raca(raca, COLUNAS_RACA_PAINEL)
+
+        simulado_agg = cubo_acertos.media('soma_taxa', 'celulas', ['SERIE_ANO', 'ID_ESCOLA', 'Disciplina'],
+                                          nome='Taxa_Acerto')
+        saresp_agg = cubo_notas.media('soma_nota', 'n_nota', ['SERIE_ANO', 'ID_ESCOLA', 'Disciplina'],
+                                      nome='nota').pivot(index=['SERIE_ANO', 'ID_ESCOLA'], columns='Disciplina',
+                                                         values='nota').reset_index()
+        saresp_agg.columns.name = None
+        final = (simulado_agg.merge(saresp_agg, on=['SERIE_ANO', 'ID_ESCOLA'], how='inner')
+                 .merge(raca[['ID_ESCOLA', 'Média_Branca', 'Média_Pretos_e_Pardos']], on='ID_ESCOLA', how='left')
+                 .merge(_contexto["dimensao"], on='ID_ESCOLA', how='left'))
+        resumo["escolas"] = int(final['ID_ESCOLA'].nunique())
+
+        limpo = final.dropna(subset=['Média_Pretos_e_Pardos', 'Taxa_Acerto'])
+        regressao = regressao_por_grupo(limpo, 'Média_Pretos_e_Pardos', 'Taxa_Acerto', ['Disciplina'],
+                                        versao=("lote", de, resumo["impressao"]))
+
+        # Agregados da DE calculados uma vez e usados pelo painel e pelas páginas das escolas
+        media_simulado = cubo_acertos.media('soma_taxa', 'celulas', ['Disciplina'], nome='Taxa_Acerto') \
+            .set_index('Disciplina')['Taxa_Acerto'].sort_values(ascending=False)
+        media_saresp = cubo_notas.media('soma_nota', 'n_nota', ['SERIE_ANO', 'Disciplina'],
+                                        nome='Nota Média').dropna(subset=['Nota Média'])
+        media_saresp.columns = ['Série', 'Disciplina', 'Nota Média']
+        referencia = cubo_acertos.media('soma_taxa', 'celulas', ['SERIE_ANO', 'Disciplina'],
+                                        nome='Taxa_Acerto_DE')
+
+        imagens = {}
+        if len(media_simulado) and len(media_saresp):
+            imagens["painel"] = renderizar(desenhar_painel, media_simulado, media_saresp,
+                                           cubo_cor.somar().iloc[0], de, PALETA_CORES, tamanho=(22, 7))
+        if len(regressao):
+            pontos = limpo[['Disciplina', 'Média_Pretos_e_Pardos', 'Taxa_Acerto']]
+            imagens["regressao"] = renderizar(desenhar_regressao, pontos, regressao, bandas_confianca(regressao),
+                                              tamanho=(6 * len(regressao), 5))
+        escrever_de(pasta, de, final, regressao, imagens)
+        resumo["figuras"] = [os.path.relpath(os.path.join(pasta, f"{tipo}.png"), _contexto["saida"])
+                             for tipo in imagens]
+
+        desenhar = None
+        if _contexto["figuras_escolas"]:
+            def desenhar(linhas, escola):
+                return renderizar(desenhar_escola, linhas, escola, tamanho=(8, 4), dpi=80,
+                                  recortar=False)
+        escrever_escolas(pasta, de, final, referencia, desenhar)
+    except Exception:
+        # Uma DE com dados problemáticos não derruba o lote; o erro vai para o relatório
+        resumo["erro"] = traceback.format_exc(limit=3)
+        resumo["segundos"] = round(time.perf_counter() - inicio, 6)
+        return vazio
+
+    resumo["segundos"] = round(time.perf_counter() - inicio, 6)
+    return {"resumo": resumo, "escolas": final, "regressao": regressao.assign(DE=de)}
+
+
+def _resumos_anteriores(saida):
+    """{DE: resumo} do relatorio.json de uma execução anterior na mesma pasta"""
+    try:
+        with open(os.path.join(saida, "relatorio.json"), encoding="utf-8") as arquivo:
+            return {resumo["de"]: resumo for resumo in json.load(arquivo)["des"] if not resumo.get("erro")}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def executar_lote(saida=DIRETORIO_SAIDA, processos=PROCESSOS, des=None, snapshots=None, verboso=True,
+                  refazer=False, figuras_escolas=True):
+    """Analisa as DEs (todas, ou só `des`) no pool de processos e grava os relatórios em `saida`"""
+    inicio = time.perf_counter()
+    os.makedirs(saida, exist_ok=True)
+    anteriores = {} if refazer else _resumos_anteriores(saida)
+    trabalho = tempfile.mkdtemp(prefix="saresp_lote_")
+    try:
+        caminhos, trechos, des_respostas = preparar_entradas(trabalho, snapshots)
+        disponiveis = sorted(des_respostas)
+        alvo = disponiveis if not des else [de for de in disponiveis
+                                            if de in {normalizar_texto(nome) for nome in des}]
+        segundos_preparo = time.perf_counter() - inicio
+
+        resultados = []
+
+        def registrar(resultado):
+            resumo = resultado["resumo"]
+            if verboso:
+                print(f"{resumo['de']:<30} {resumo['escolas']:>5} escolas  {resumo['segundos']:.2f}s"
+                      + ("  ERRO" if resumo["erro"] else "  (reaproveitado)" if resumo["reaproveitado"]
+                         else ""))
+            resultados.append(resultado)
+
+        iniciais = (caminhos, trechos, os.path.abspath(saida), anteriores, figuras_escolas)
+        usados = processos_uteis(processos, len(alvo), figuras_escolas)
+        if usados == 1:
+            _iniciar_processo(*iniciais)
+            try:
+                for de in alvo:
+                    registrar(analisar_de(de))
+            finally:
+                _encerrar_processo()
+        else:
+            contexto = multiprocessing.get_context(CONTEXTO_PROCESSOS)
+            with ProcessPoolExecutor(max_workers=usados, mp_context=contexto, initializer=_iniciar_processo,
+                                     initargs=iniciais) as pool:
+                futuros = [pool.submit(analisar_de, de) for de in alvo]
+                for futuro in as_completed(futuros):
+                    registrar(futuro.result())
+    finally:
+        shutil.rmtree(trabalho, ignore_errors=True)
+
+    resultados.sort(key=lambda resultado: resultado["resumo"]["de"])
+    escolas = pd.concat([resultado["escolas"] for resultado in resultados], ignore_index=True)
+    regressoes = pd.concat([resultado["regressao"] for resultado in resultados], ignore_index=True)
+    escolas.to_csv(os.path.join(saida, "escolas.csv"), index=False)
+    regressoes.to_csv(os.path.join(saida, "regressoes.csv"), index=False)
+    relatorio = {
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "processos": processos,
+        "processos_usados": usados,
+        "segundos_preparo": round(segundos_preparo, 3),
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+        "des": [resultado["resumo"] for resultado in resultados],
+    }
+    with open(os.path.join(saida, "relatorio.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    escrever_indice(saida, relatorio["des"])
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análise de correlação e relatórios de todas as DEs em lote")
+    parser.add_argument("--saida", default=DIRETORIO_SAIDA, help="pasta do relatório")
+    parser.add_argument("--processos", type=int, default=PROCESSOS,
+                        help="processos do pool (padrão: SARESP_PROCESSOS ou número de CPUs)")
+    parser.add_argument("--des", nargs="*", help="analisa só estas DEs (padrão: todas)")
+    parser.add_argument("--snapshots", default=DIRETORIO_SNAPSHOTS, help="pasta dos snapshots")
+    parser.add_argument("--refazer", action="store_true",
+                        help="refaz todas as DEs, mesmo as que não mudaram desde a última execução")
+    parser.add_argument("--sem-figuras-escolas", dest="figuras_escolas", action="store_false",
+                        help="não gera a figura de cada escola (só HTML e CSV)")
+    args = parser.parse_args(argv)
+
+    relatorio = executar_lote(args.saida, args.processos, args.des, args.snapshots,
+                              refazer=args.refazer, figuras_escolas=args.figuras_escolas)
+    erros = sum(1 for resumo in relatorio["des"] if resumo["erro"])
+    reaproveitadas = sum(1 for resumo in relatorio["des"] if resumo["reaproveitado"])
+    print(f"\n{len(relatorio['des'])} DEs em {relatorio['segundos_total']:.1f}s "
+          f"({reaproveitadas} reaproveitadas, {erros} com erro); relatório em {args.saida}/index.html")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
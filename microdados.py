@@ -0,0 +1,54 @@
+"""Carga dos microdados do SARESP compartilhada pelas páginas do app.py"""
+
+import os
+
+import streamlit as st
+
+from fontes import MICRODADOS
+from ingestao import arquivo_grande, resumir_csv
+from instrumentacao import etapa
+from snapshots import assinatura_snapshots, carregar_snapshot
+
+CAMINHO_DADOS = MICRODADOS  # <-- troque o nome em fontes.py
+
+
+# Carregar os dados a partir do snapshot Parquet do arquivo (criado na primeira execução);
+# o DataFrame é o mesmo para todas as sessões (cache compartilhado, sem cópia por sessão)
+def carregar_dados():
+    return carregar_snapshot(CAMINHO_DADOS)
+
+
+def carregar_resumo():
+    """Lê os microdados grandes em blocos, mostrando o progresso da leitura"""
+    area_progresso = st.empty()
+
+    def mostrar_progresso(fracao):
+        area_progresso.progress(fracao, text=f"Lendo microdados do SARESP... {fracao:.0%}")
+
+    resumo = resumir_csv(CAMINHO_DADOS, progresso=mostrar_progresso)
+    area_progresso.empty()
+    return resumo
+
+
+def versao_microdados():
+    """Versão dos microdados para chaves de memorização (sem percorrer as linhas)"""
+    if arquivo_grande(CAMINHO_DADOS):
+        info = os.stat(CAMINHO_DADOS)
+        return ("microdados", os.path.abspath(CAMINHO_DADOS), info.st_mtime_ns, info.st_size)
+    return ("microdados", assinatura_snapshots({"microdados": CAMINHO_DADOS}))
+
+
+def carregar_microdados():
+    """Retorna (dados, resumo): os dados completos e resumo None, ou a amostra e o resumo"""
+    # Microdados grandes são lidos em blocos: médias e regressões são exatas,
+    # e os gráficos de distribuição usam uma amostra de tamanho fixo
+    if arquivo_grande(CAMINHO_DADOS):
+        with etapa("carga") as medicao:
+            resumo = carregar_resumo()
+            medicao.saida(resumo.amostra)
+        st.caption(f"Microdados com {resumo.linhas:,} linhas; gráficos de distribuição "
+                   f"usam uma amostra de {len(resumo.amostra):,} linhas.")
+        return resumo.amostra, resumo
+
+    with etapa("carga") as medicao:
+        return medicao.saida(carregar_dados()), None
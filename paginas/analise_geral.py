@@ -0,0 +1,89 @@
+"""Página "Análise Geral": médias e distribuição das notas do SARESP por raça"""
+
+import streamlit as st
+import altair as alt
+
+from dados_graficos import grafico_boxplot, quantis_boxplot
+from diferencas import REAMOSTRAGENS, diferencas_raca
+from instrumentacao import etapa, iniciar_execucao, painel_diagnostico
+from microdados import carregar_microdados, versao_microdados
+from tabelas import tabela_paginada
+
+st.title("Dashboard de Análise do SARESP")
+iniciar_execucao("Análise Geral")
+
+# Race e SARESP são colunas obrigatórias do esquema dos microdados (validado na carga)
+saresp_df, resumo = carregar_microdados()
+
+st.header("Análise Geral por Raça")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.subheader("Média das Notas por Raça")
+    with etapa("media_por_raca", saresp_df) as medicao:
+        if resumo is not None:
+            media_por_raca = resumo.media_por_grupo('Race', 'SARESP')
+        else:
+            media_por_raca = saresp_df.groupby('Race', observed=True)['SARESP'].mean().reset_index()
+        medicao.saida(media_por_raca)
+
+    bar_chart_race = alt.Chart(media_por_raca).mark_bar().encode(
+        x=alt.X('Race:N', title='Raça'),
+        y=alt.Y('SARESP:Q', title='Nota Média SARESP'),
+        tooltip=['Race', 'SARESP']
+    ).properties(title="Notas Médias por Raça")
+
+    with etapa("grafico_media_por_raca", media_por_raca):
+        st.altair_chart(bar_chart_race, use_container_width=True)
+
+with col2:
+    st.subheader("Distribuição de Notas por Raça")
+    # Quartis calculados no servidor; só os outliers (amostrados) vão para o gráfico
+    with etapa("quantis_boxplot", saresp_df) as medicao:
+        caixas, outliers = quantis_boxplot(saresp_df, 'Race', 'SARESP')
+        medicao.saida(caixas)
+    boxplot_race = grafico_boxplot(caixas, outliers, 'Race', 'SARESP',
+                                   "Boxplot das Notas por Raça")
+
+    with etapa("grafico_boxplot", outliers):
+        st.altair_chart(boxplot_race, use_container_width=True)
+
+st.markdown("""
+**Interpretação:**
+Os gráficos acima mostram como as médias e a distribuição das notas do SARESP variam entre os diferentes grupos raciais. O gráfico de barras mostra a média das notas, enquanto o boxplot permite identificar dispersão, mediana e possíveis outliers.
+""")
+
+st.header("Diferença de notas entre pretos e pardos e brancos")
+st.caption(f"Nota de pretos e pardos menos a de brancos, com intervalo de confiança de 95% "
+           f"(bootstrap com {REAMOSTRAGENS:,} reamostragens dos alunos de cada grupo). "
+           "Intervalos que não cruzam o zero indicam diferença além da variação amostral."
+           + (" Calculado sobre a amostra dos microdados." if resumo is not None else ""))
+
+# DE e ESCOLA são opcionais no esquema dos microdados
+recortes = {"Rede": []}
+recortes.update({rotulo: [coluna] for rotulo, coluna in (("DE", "DE"), ("Escola", "ESCOLA"))
+                 if coluna in saresp_df.columns})
+recorte = st.radio("Recorte", list(recortes), horizontal=True, key="recorte_diferencas")
+with etapa("diferencas_raca", saresp_df) as medicao:
+    diferencas = medicao.saida(diferencas_raca(saresp_df, 'SARESP', recortes[recorte]))
+
+if recorte == "Escola":
+    # Milhares de escolas: busca, ordenação e paginação no servidor
+    tabela_paginada(diferencas, "tabela_diferencas",
+                    versao=(versao_microdados(), "diferencas_raca", recorte, REAMOSTRAGENS))
+else:
+    if recorte == "DE":
+        eixo = alt.Y('DE:N', title='DE')
+        pontos = alt.Chart(diferencas).encode(
+            x=alt.X('diferenca:Q', title='Diferença (pretos e pardos - brancos)'),
+            y=eixo, color=alt.Color('estatistica:N', title='Estatística'),
+            tooltip=['DE', 'estatistica', 'diferenca', 'inferior', 'superior', 'n_referencia', 'n_comparado'])
+        intervalos = alt.Chart(diferencas).mark_rule().encode(
+            x='inferior:Q', x2='superior:Q', y=eixo, color='estatistica:N')
+        with etapa("grafico_diferencas", diferencas):
+            st.altair_chart((intervalos + pontos.mark_point(filled=True)).properties(
+                title="Diferença por DE com IC de 95%"), use_container_width=True)
+    st.dataframe(diferencas, hide_index=True)
+
+painel_diagnostico()
@@ -0,0 +1,93 @@
+"""Página "Comparativo Simulado x SARESP": regressão, correlação e distribuições"""
+
+import streamlit as st
+import altair as alt
+
+from dados_graficos import amostrar_dispersao, grafico_histograma, histograma
+from estatisticas import bandas_confianca, regressao_por_grupo
+from instrumentacao import etapa, iniciar_execucao, painel_diagnostico
+from microdados import carregar_microdados, versao_microdados
+
+st.title("Comparativo entre Nota do Simulado e Nota do SARESP")
+iniciar_execucao("Comparativo Simulado x SARESP")
+
+# Simulado e SARESP são colunas obrigatórias do esquema dos microdados (validado na carga)
+saresp_df, resumo = carregar_microdados()
+
+st.subheader("Dispersão entre Nota do Simulado e Nota do SARESP com Linha de Regressão")
+
+# Ajuste memorizado pela versão dos microdados (não refaz nem percorre os dados a cada interação)
+with etapa("regressao", saresp_df) as medicao:
+    if resumo is not None:
+        regressao = resumo.regressao()
+    else:
+        regressao = regressao_por_grupo(saresp_df, 'Simulado', 'SARESP', versao=versao_microdados())
+    medicao.saida(regressao)
+slope, intercept = regressao.loc[0, 'inclinacao'], regressao.loc[0, 'intercepto']
+r_value, r_squared, p_value = regressao.loc[0, ['r', 'r2', 'p_valor']]
+
+regression_line = bandas_confianca(regressao).rename(
+    columns={'x': 'Simulado', 'previsto': 'SARESP_Pred'})
+
+with etapa("amostra_dispersao", saresp_df) as medicao:
+    pontos = medicao.saida(amostrar_dispersao(saresp_df, 'Simulado', 'SARESP'))
+
+scatter = alt.Chart(pontos).mark_circle(size=60).encode(
+    x='Simulado',
+    y='SARESP',
+    tooltip=['Simulado', 'SARESP']
+)
+
+line = alt.Chart(regression_line).mark_line(color='red').encode(
+    x='Simulado',
+    y='SARESP_Pred'
+)
+
+band = alt.Chart(regression_line).mark_area(color='red', opacity=0.15).encode(
+    x='Simulado',
+    y='inferior',
+    y2='superior'
+)
+
+with etapa("grafico_regressao", pontos):
+    st.altair_chart((scatter + band + line).interactive(), use_container_width=True)
+
+st.markdown(f"""
+**Coeficiente de Correlação (r):** {r_value:.2f}  
+**Coeficiente de Determinação (R²):** {r_squared:.2f}  
+**p-valor:** {p_value:.3g}  
+**Equação da Regressão:** SARESP = {slope:.2f} * Simulado + {intercept:.2f}
+""")
+
+st.info("**Interpretação:**\n"
+        f"O valor de R² indica que aproximadamente **{r_squared*100:.1f}%** da variação nas notas do SARESP "
+        "pode ser explicada pelas notas do Simulado por meio de uma regressão linear simples.")
+
+grupos = [coluna for coluna in ['DE', 'SERIE_ANO', 'Disciplina'] if coluna in saresp_df.columns]
+if grupos:
+    st.subheader("Regressão por Grupo")
+    grupo = st.selectbox("Agrupar por", grupos)
+    with etapa("regressao_por_grupo", saresp_df) as medicao:
+        if resumo is not None:
+            regressao_grupos = resumo.regressao(grupo)
+        else:
+            regressao_grupos = regressao_por_grupo(saresp_df, 'Simulado', 'SARESP', [grupo],
+                                                   versao=versao_microdados())
+        medicao.saida(regressao_grupos)
+    st.dataframe(regressao_grupos[[grupo, 'n', 'inclinacao', 'intercepto', 'r', 'r2', 'p_valor']],
+                 use_container_width=True)
+
+st.subheader("Distribuição das Notas")
+col1, col2 = st.columns(2)
+
+with col1, etapa("grafico_histograma_simulado", saresp_df):
+    hist_simulado = grafico_histograma(histograma(saresp_df['Simulado']),
+                                       "Distribuição - Simulado", "Simulado")
+    st.altair_chart(hist_simulado, use_container_width=True)
+
+with col2, etapa("grafico_histograma_saresp", saresp_df):
+    hist_saresp = grafico_histograma(histograma(saresp_df['SARESP']),
+                                     "Distribuição - SARESP", "SARESP")
+    st.altair_chart(hist_saresp, use_container_width=True)
+
+painel_diagnostico()
@@ -0,0 +1,147 @@
+"""Pontuação do Simulado: acertos e taxa de acerto por escola e disciplina."""
+
+import hashlib
+import io
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from snapshots import DIRETORIO_SNAPSHOTS, gravar_atomico
+
+CHAVES_SIMULADO = ['DE', 'SERIE_ANO', 'ESCOLA', 'Disciplina']
+RESPOSTA_CORRETA = 'Correto'
+ARQUIVO_AGREGADO = 'agregado.parquet'
+METADADO_ESTADO = b'saresp.agregado'
+
+_agregados = {}
+_trava_agregados = threading.Lock()
+
+
+def _contar(df_respostas, chaves):
+    """Soma respostas e acertos por grupo (resultado indexado pelas chaves)"""
+    resposta = df_respostas['Resposta']
+    # int64: a soma por grupo mantém o tipo da coluna, e int8 estouraria com 128 respostas
+    contagens = pd.DataFrame({
+        'Total_Respostas': resposta.notna().to_numpy(dtype='int64'),
+        'Total_Acertos': (resposta == RESPOSTA_CORRETA).to_numpy(dtype='int64'),
+    }, index=df_respostas.index)
+    return contagens.groupby([df_respostas[chave] for chave in chaves],
+                             observed=True).sum()
+
+
+def taxa_de_acerto(contagens):
+    """Taxa_Acerto dos grupos com alguma resposta (contagens indexadas pelas chaves)"""
+    resultado = contagens[contagens['Total_Respostas'] > 0].reset_index()
+    resultado['Taxa_Acerto'] = (resultado['Total_Acertos'] / resultado['Total_Respostas']) * 100
+    return resultado
+
+
+def calcular_acertos(df_respostas, chaves=CHAVES_SIMULADO):
+    """Conta respostas e acertos de todas as DEs em uma única agregação por grupo"""
+    return taxa_de_acerto(_contar(df_respostas, chaves))
+
+
+def _hashes_das_linhas(df_respostas):
+    """Hash de cada linha (sem o índice), para a assinatura do prefixo já processado"""
+    return pd.util.hash_pandas_object(df_respostas, index=False).to_numpy()
+
+
+class AgregadoSimulado:
+    """Contagens acumuladas de respostas e acertos por grupo, atualizadas por delta.
+
+    A planilha de respostas só cresce a cada rodada do Simulado; o agregado
+    guarda quantas linhas já incorporou (marca d'água) e o sha256 dos hashes de
+    todas essas linhas. Em `atualizar` somente as linhas depois da marca são
+    agregadas; se a planilha encolheu ou qualquer linha já processada mudou, o
+    agregado é refeito do zero. A verificação percorre a planilha inteira uma vez
+    por atualização (hash vetorizado, mais barato que a contagem).
+    """
+
+    def __init__(self, chaves=CHAVES_SIMULADO):
+        self.chaves = list(chaves)
+        self.linhas_processadas = 0
+        self.assinatura = None
+        self._contagens = None
+        self._trava = threading.Lock()
+
+    def atualizar(self, df_respostas):
+        """Incorpora as linhas novas; retorna quantas linhas foram agregadas"""
+        with self._trava:
+            total = len(df_respostas)
+            hashes = _hashes_das_linhas(df_respostas)
+            assinatura = hashlib.sha256(hashes[:self.linhas_processadas].tobytes())
+            if (total < self.linhas_processadas
+                    or (self.linhas_processadas and assinatura.hexdigest() != self.assinatura)):
+                self.linhas_processadas = 0
+                self._contagens = None
+                assinatura = hashlib.sha256()
+
+            novas = df_respostas.iloc[self.linhas_processadas:]
+            if len(novas):
+                delta = _contar(novas, self.chaves)
+                if self._contagens is None:
+                    self._contagens = delta
+                else:
+                    self._contagens = self._contagens.add(delta, fill_value=0).astype('int64')
+                assinatura.update(hashes[self.linhas_processadas:].tobytes())
+                self.linhas_processadas = total
+                self.assinatura = assinatura.hexdigest()
+            return len(novas)
+
+    def resultado(self):
+        """Total_Respostas, Total_Acertos e Taxa_Acerto por grupo"""
+        with self._trava:
+            if self._contagens is None:
+                colunas = self.chaves + ['Total_Respostas', 'Total_Acertos', 'Taxa_Acerto']
+                return pd.DataFrame(columns=colunas)
+            return taxa_de_acerto(self._contagens)
+
+    def salvar(self, diretorio):
+        """Grava as contagens, a marca d'água e a assinatura em um único arquivo, de uma vez"""
+        os.makedirs(diretorio, exist_ok=True)
+        with self._trava:
+            if self._contagens is None:
+                contagens = pd.DataFrame(columns=self.chaves + ['Total_Respostas', 'Total_Acertos'])
+            else:
+                contagens = self._contagens.reset_index()
+            estado = {'chaves': self.chaves,
+                      'linhas_processadas': self.linhas_processadas,
+                      'assinatura': self.assinatura}
+            tabela = pa.Table.from_pandas(contagens, preserve_index=False)
+            # A marca d'água vai nos metadados do próprio Parquet: contagens e marca nunca se desencontram
+            tabela = tabela.replace_schema_metadata(
+                {**tabela.schema.metadata, METADADO_ESTADO: json.dumps(estado).encode('utf-8')})
+            buffer = io.BytesIO()
+            pq.write_table(tabela, buffer)
+            gravar_atomico(os.path.join(diretorio, ARQUIVO_AGREGADO), buffer.getvalue())
+
+    @classmethod
+    def carregar(cls, diretorio):
+        """Lê um agregado gravado por `salvar` (vazio se não existir)"""
+        caminho = os.path.join(diretorio, ARQUIVO_AGREGADO)
+        if not os.path.exists(caminho):
+            return cls()
+        tabela = pq.read_table(caminho)
+        estado = json.loads(tabela.schema.metadata[METADADO_ESTADO])
+        agregado = cls(estado['chaves'])
+        if estado['linhas_processadas']:
+            agregado._contagens = tabela.to_pandas().set_index(agregado.chaves)
+            agregado.linhas_processadas = estado['linhas_processadas']
+            agregado.assinatura = estado['assinatura']
+        return agregado
+
+
+def calcular_acertos_incremental(chave, df_respostas, diretorio=None):
+    """Mesmo resultado de `calcular_acertos`, agregando só as linhas novas da planilha `chave`"""
+    diretorio = os.path.join(diretorio or DIRETORIO_SNAPSHOTS, 'agregados', chave)
+    with _trava_agregados:
+        if diretorio not in _agregados:
+            _agregados[diretorio] = AgregadoSimulado.carregar(diretorio)
+        agregado = _agregados[diretorio]
+    if agregado.atualizar(df_respostas):
+        agregado.salvar(diretorio)
+    return agregado.resultado()
@@ -0,0 +1,88 @@
+"""Composição racial por escola a partir da planilha de contagens por raça/cor.
+
+As contagens de cada raça/cor (e o total) são guardadas em inteiros sem
+sinal do menor tamanho que comporta os valores, e as participações de todos
+os grupos saem de uma única divisão da matriz de contagens pelo vetor de
+totais. Escolas com total zero (ou ausente) ficam com participação NaN em vez
+de infinito. O resultado é memorizado pela versão do snapshot da planilha,
+então só é recalculado quando a planilha muda; todas as DEs são processadas
+de uma vez e o recorte fica por conta dos filtros.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from esquemas import COLUNAS_RACA
+from snapshots import carregar_snapshot, chave_da_origem, ler_manifesto
+
+# Grupos formados pela soma de colunas de COLUNAS_RACA
+GRUPOS_RACA = {'Pretos_e_Pardos': ['Preta', 'Parda']}
+PREFIXO_PARTICIPACAO = 'Média_'
+MAX_VERSOES_MEMORIZADAS = 8
+
+_memoria = OrderedDict()
+_trava = threading.Lock()
+
+
+def _compacto(valores):
+    """Converte contagens para o menor inteiro sem sinal que comporta o maior valor"""
+    return valores.astype(np.min_scalar_type(int(valores.max(initial=0))))
+
+
+def composicao_racial(df):
+    """Contagens compactas, grupos somados e % de cada raça/cor e grupo sobre o Total"""
+    colunas = [coluna for coluna in COLUNAS_RACA if coluna in df.columns]
+    contagens = df[colunas].to_numpy(dtype='float64', na_value=np.nan)
+    contagens = np.nan_to_num(contagens, nan=0.0)
+    if (contagens < 0).any():
+        raise ValueError("A planilha de raça/cor tem contagens negativas")
+    contagens = contagens.round().astype('uint32')
+
+    nomes = list(colunas)
+    for grupo, membros in GRUPOS_RACA.items():
+        if all(membro in colunas for membro in membros):
+            soma = contagens[:, [colunas.index(membro) for membro in membros]].sum(axis=1, dtype='uint32')
+            contagens = np.column_stack([contagens, soma])
+            nomes.append(grupo)
+
+    if 'Total' in df.columns:
+        total = np.nan_to_num(df['Total'].to_numpy(dtype='float64', na_value=np.nan), nan=0.0)
+    else:
+        total = contagens[:, :len(colunas)].sum(axis=1, dtype='uint32').astype('float64')
+
+    # Uma divisão para todas as colunas; total zero vira NaN (não inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        participacao = contagens / np.where(total > 0, total, np.nan)[:, None] * 100
+
+    resultado = df.drop(columns=nomes + ['Total'], errors='ignore').copy()
+    for posicao, nome in enumerate(nomes):
+        resultado[nome] = _compacto(contagens[:, posicao])
+    resultado['Total'] = _compacto(total.round().astype('uint32'))
+    for posicao, nome in enumerate(nomes):
+        resultado[PREFIXO_PARTICIPACAO + nome] = participacao[:, posicao]
+    return resultado
+
+
+def composicao_da_origem(origem, df=None, diretorio=None):
+    """`composicao_racial` da planilha `origem`, memorizada pela versão do snapshot.
+
+    `df` evita reler o snapshot quando a planilha já foi carregada.
+    """
+    chave = chave_da_origem(origem)
+    versao = ler_manifesto(diretorio).get(chave, {}).get("versao")
+    memoria_chave = (chave, versao)
+    if versao is not None:
+        with _trava:
+            if memoria_chave in _memoria:
+                _memoria.move_to_end(memoria_chave)
+                return _memoria[memoria_chave].copy()
+
+    resultado = composicao_racial(df if df is not None else carregar_snapshot(origem, diretorio))
+    if versao is not None:
+        with _trava:
+            _memoria[memoria_chave] = resultado
+            while len(_memoria) > MAX_VERSOES_MEMORIZADAS:
+                _memoria.popitem(last=False)
+    return resultado.copy()
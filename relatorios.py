@@ -0,0 +1,115 @@
+"""Relatórios estáticos (HTML, PNG e CSV) por DE e por escola.
+
+Gravados pelo lote (`lote.py`) a partir das tabelas que ele já calculou para
+cada DE: as páginas das escolas são fatias da tabela final da DE e usam as
+médias da DE como referência, sem refazer nenhuma agregação. Estrutura:
+
+    <saida>/index.html                      lista das DEs
+    <saida>/des/<de>/index.html             painel, regressão e tabela da DE
+    <saida>/des/<de>/dados.csv, regressao.csv, painel.png, regressao.png
+    <saida>/des/<de>/escolas/<ID_ESCOLA>.html, .csv, .png
+"""
+
+import html
+import os
+
+from escolas import normalizar_texto
+
+PASTA_DES = "des"
+PASTA_ESCOLAS = "escolas"
+COLUNAS_ESCOLA = ['SERIE_ANO', 'Disciplina', 'Taxa_Acerto', 'Taxa_Acerto_DE', 'LP', 'MAT',
+                  'Média_Branca', 'Média_Pretos_e_Pardos']
+
+_ESTILO = """
+body { font-family: sans-serif; margin: 2em auto; max-width: 1200px; color: #222; }
+table { border-collapse: collapse; font-size: 0.9em; }
+th, td { border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+th { background: #f4f4f4; }
+td:first-child, th:first-child { text-align: left; }
+img { max-width: 100%; }
+"""
+
+
+def nome_arquivo(de):
+    """Nome de arquivo seguro para uma DE ("SUL 1" -> "sul_1")"""
+    return "_".join(normalizar_texto(str(de)).lower().split()) or "sem_de"
+
+
+def pasta_da_de(saida, de):
+    return os.path.join(saida, PASTA_DES, nome_arquivo(de))
+
+
+def _pagina(titulo, corpo, raiz=""):
+    return (f"<!DOCTYPE html>\n<html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(titulo)}</title><style>{_ESTILO}</style></head><body>\n"
+            + (f"<p><a href=\"{raiz}index.html\">← todas as DEs</a></p>\n" if raiz else "")
+            + f"<h1>{html.escape(titulo)}</h1>\n{corpo}\n</body></html>\n")
+
+
+def _tabela(df, casas=1):
+    return df.to_html(index=False, float_format=f"{{:.{casas}f}}".format, na_rep="–", border=0)
+
+
+def _gravar(caminho, conteudo):
+    modo = "wb" if isinstance(conteudo, bytes) else "w"
+    with open(caminho, modo, **({} if modo == "wb" else {"encoding": "utf-8"})) as arquivo:
+        arquivo.write(conteudo)
+
+
+def escrever_de(pasta, de, final, regressao, imagens):
+    """Grava dados.csv, regressao.csv, as figuras (bytes PNG) e o index.html da DE"""
+    os.makedirs(pasta, exist_ok=True)
+    final.to_csv(os.path.join(pasta, "dados.csv"), index=False)
+    regressao.to_csv(os.path.join(pasta, "regressao.csv"), index=False)
+    figuras = ""
+    for tipo, imagem in imagens.items():
+        _gravar(os.path.join(pasta, f"{tipo}.png"), imagem)
+        figuras += f"<img src=\"{tipo}.png\" alt=\"{tipo}\">\n"
+
+    escolas = final[['ID_ESCOLA', 'ESCOLA']].drop_duplicates().sort_values('ESCOLA')
+    lista = "".join(f"<li><a href=\"{PASTA_ESCOLAS}/{id_escola}.html\">{html.escape(str(escola))}</a></li>"
+                    for id_escola, escola in escolas.itertuples(index=False))
+    corpo = (f"{figuras}<h2>Regressão por disciplina</h2>"
+             + _tabela(regressao[['Disciplina', 'n', 'inclinacao', 'intercepto', 'r', 'p_valor']], casas=3)
+             + "<p><a href=\"dados.csv\">dados.csv</a> · <a href=\"regressao.csv\">regressao.csv</a></p>"
+             + f"<h2>Escolas ({len(escolas)})</h2><ul>{lista}</ul>")
+    _gravar(os.path.join(pasta, "index.html"), _pagina(f"Correlação SARESP × Simulado × raça — {de}", corpo,
+                                                       raiz="../../"))
+
+
+def escrever_escolas(pasta, de, final, referencia, desenhar=None):
+    """Uma página (HTML + CSV e, com `desenhar`, PNG) por escola da tabela final da DE.
+
+    `referencia` traz a Taxa_Acerto_DE por série e disciplina; `desenhar(linhas, escola)`
+    devolve os bytes PNG da figura da escola.
+    """
+    pasta_escolas = os.path.join(pasta, PASTA_ESCOLAS)
+    os.makedirs(pasta_escolas, exist_ok=True)
+    comparacao = final.merge(referencia, on=['SERIE_ANO', 'Disciplina'], how='left')
+    colunas = [coluna for coluna in COLUNAS_ESCOLA if coluna in comparacao.columns]
+    for (id_escola, escola), linhas in comparacao.groupby(['ID_ESCOLA', 'ESCOLA'], observed=True, sort=False):
+        linhas = linhas[colunas].sort_values(['SERIE_ANO', 'Disciplina'])
+        base = os.path.join(pasta_escolas, str(id_escola))
+        linhas.to_csv(f"{base}.csv", index=False)
+        figura = ""
+        if desenhar is not None:
+            _gravar(f"{base}.png", desenhar(linhas, escola))
+            figura = f"<img src=\"{id_escola}.png\" alt=\"comparação com a DE\">\n"
+        corpo = (f"<p>DE: <a href=\"../index.html\">{html.escape(str(de))}</a></p>\n{figura}"
+                 + _tabela(linhas) + f"<p><a href=\"{id_escola}.csv\">{id_escola}.csv</a></p>")
+        _gravar(f"{base}.html", _pagina(str(escola), corpo, raiz="../../../"))
+
+
+def escrever_indice(saida, resumos):
+    """index.html da pasta de saída com uma linha por DE"""
+    linhas = []
+    for resumo in resumos:
+        nome = html.escape(str(resumo["de"]))
+        link = (nome if resumo["erro"] else
+                f"<a href=\"{PASTA_DES}/{nome_arquivo(resumo['de'])}/index.html\">{nome}</a>")
+        situacao = "erro" if resumo["erro"] else ("reaproveitado" if resumo.get("reaproveitado") else "gerado")
+        linhas.append(f"<tr><td>{link}</td><td>{resumo['escolas']}</td><td>{situacao}</td></tr>")
+    corpo = ("<table><tr><th>DE</th><th>Escolas</th><th>Situação</th></tr>" + "".join(linhas) + "</table>"
+             "<p><a href=\"escolas.csv\">escolas.csv</a> · <a href=\"regressoes.csv\">regressoes.csv</a> · "
+             "<a href=\"relatorio.json\">relatorio.json</a></p>")
+    _gravar(os.path.join(saida, "index.html"), _pagina("Relatórios por DE", corpo))
@@ -0,0 +1,150 @@
+"""Respostas do Simulado em formato compacto.
+
+A planilha de respostas tem uma linha por questão respondida, com DE, escola,
+série e disciplina repetidas em todas as linhas. Aqui as linhas são agrupadas
+pelas chaves: cada combinação de chaves aparece uma única vez na tabela de
+grupos (categorias), e de cada resposta sobram dois bits, respondida e
+correta, guardados em bytes (`np.packbits`). O trecho de bits de cada grupo
+começa em um byte próprio, então:
+
+- as contagens de respostas e acertos de todos os grupos saem da contagem de
+  bits dos bytes (tabela de 256 posições) somada por grupo com uma única
+  `np.add.reduceat`;
+- os grupos ficam ordenados pela coluna de DE, e `fatia_de` devolve as
+  respostas de uma DE como visões dos mesmos arrays, sem cópia.
+
+Um milhão de respostas ocupa cerca de 250 KB de bits, mais a tabela de grupos,
+que cresce com o número de escolas e não com o de respostas. No benchmark
+(etapa `compactar`), são cerca de 1,3 MB por milhão de respostas, contra 71 MB
+do DataFrame de textos lido do CSV e 19 MB do snapshot tipado.
+
+`gravar` escreve as respostas em dois arquivos Arrow IPC sem compressão (grupos
+e bits), e `abrir` os lê por memory map: os processos do `lote.py` abrem os
+mesmos arquivos em vez de receber uma cópia serializada.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pontuacao import CHAVES_SIMULADO, RESPOSTA_CORRETA, taxa_de_acerto
+
+ARQUIVO_GRUPOS = "grupos.arrow"
+ARQUIVO_BITS = "bits.arrow"
+
+# Quantidade de bits 1 em cada valor de byte
+_BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _gravar_ipc(tabela, caminho):
+    with pa.OSFile(caminho, "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+
+def _abrir_ipc(caminho):
+    return pa.ipc.open_file(pa.memory_map(caminho, "r")).read_all()
+
+
+def _array(tabela, coluna):
+    """Coluna numérica como array NumPy; com um único bloco, uma visão do memory map"""
+    coluna = tabela.column(coluna)
+    return coluna.chunk(0).to_numpy() if coluna.num_chunks == 1 else coluna.to_numpy()
+
+
+class RespostasCompactas:
+    """Respostas agrupadas pelas chaves, com os acertos em bits"""
+
+    def __init__(self, grupos, tamanhos, inicios, respondidas, corretas, coluna_de='DE'):
+        # grupos: uma linha por combinação de chaves; tamanhos: linhas de cada grupo;
+        # inicios: byte inicial de cada grupo (+ o final)
+        self.grupos = grupos
+        self.tamanhos = tamanhos
+        self.inicios = inicios
+        self.respondidas = respondidas
+        self.corretas = corretas
+        self.coluna_de = coluna_de
+
+    @classmethod
+    def de_respostas(cls, df_respostas, chaves=CHAVES_SIMULADO, coluna_de='DE'):
+        """Compacta a planilha de respostas; linhas com alguma chave ausente ficam de fora"""
+        chaves = [coluna_de] + [chave for chave in chaves if chave != coluna_de]
+        agrupado = df_respostas.groupby(chaves, observed=True, sort=True)
+        # Linhas com chave ausente ficam sem grupo (-1)
+        codigos = agrupado.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        grupos = agrupado.size().index.to_frame(index=False)
+        validas = codigos >= 0
+        codigos = codigos[validas]
+
+        # Cada grupo ocupa um número inteiro de bytes; a resposta i do grupo vai para o bit i
+        tamanhos = np.bincount(codigos, minlength=len(grupos))
+        inicios = np.concatenate([[0], np.cumsum((tamanhos + 7) // 8)]).astype(np.int64)
+        posicoes = inicios[codigos] * 8 + agrupado.cumcount().to_numpy()[validas].astype(np.int64)
+
+        resposta = df_respostas['Resposta'][validas]
+        bits = {}
+        for nome, marcadas in (("respondidas", resposta.notna()), ("corretas", resposta == RESPOSTA_CORRETA)):
+            mapa = np.zeros(int(inicios[-1]) * 8, dtype=bool)
+            mapa[posicoes] = marcadas.to_numpy(dtype=bool)
+            bits[nome] = np.packbits(mapa)
+        return cls(grupos, tamanhos, inicios, bits["respondidas"], bits["corretas"], coluna_de)
+
+    def __len__(self):
+        return int(self.tamanhos.sum())
+
+    def des(self):
+        """DEs presentes, na ordem dos grupos"""
+        return list(pd.unique(self.grupos[self.coluna_de].astype(object)))
+
+    def fatia_de(self, de):
+        """Respostas de uma DE: visões dos mesmos arrays de bits, sem cópia"""
+        posicoes = np.flatnonzero((self.grupos[self.coluna_de] == de).to_numpy())
+        primeiro, ultimo = (posicoes[0], posicoes[-1] + 1) if len(posicoes) else (0, 0)
+        inicio, fim = self.inicios[primeiro], self.inicios[ultimo]
+        return RespostasCompactas(self.grupos.iloc[primeiro:ultimo].reset_index(drop=True),
+                                  self.tamanhos[primeiro:ultimo], self.inicios[primeiro:ultimo + 1] - inicio,
+                                  self.respondidas[inicio:fim], self.corretas[inicio:fim], self.coluna_de)
+
+    def contagens(self):
+        """Tabela de grupos com Total_Respostas e Total_Acertos"""
+        totais = {}
+        for nome, bits in (("Total_Respostas", self.respondidas), ("Total_Acertos", self.corretas)):
+            if len(self.grupos):
+                totais[nome] = np.add.reduceat(_BITS_POR_BYTE[bits], self.inicios[:-1], dtype=np.int64)
+            else:
+                totais[nome] = np.zeros(0, dtype=np.int64)
+        return self.grupos.assign(**totais)
+
+    def acertos(self, chaves=CHAVES_SIMULADO):
+        """Mesmo resultado de `pontuacao.calcular_acertos` sobre a planilha original"""
+        contagens = self.contagens().groupby(list(chaves), observed=True)[
+            ['Total_Respostas', 'Total_Acertos']].sum()
+        return taxa_de_acerto(contagens)
+
+    def gravar(self, diretorio):
+        """Grava grupos e bits em Arrow IPC sem compressão, para `abrir` por memory map"""
+        os.makedirs(diretorio, exist_ok=True)
+        grupos = pa.Table.from_pandas(
+            self.grupos.assign(_tamanho=self.tamanhos, _inicio=self.inicios[:-1]), preserve_index=False)
+        grupos = grupos.replace_schema_metadata(
+            {**grupos.schema.metadata, b"coluna_de": self.coluna_de.encode("utf-8")})
+        _gravar_ipc(grupos, os.path.join(diretorio, ARQUIVO_GRUPOS))
+        _gravar_ipc(pa.table({"respondidas": self.respondidas, "corretas": self.corretas}),
+                    os.path.join(diretorio, ARQUIVO_BITS))
+
+    @classmethod
+    def abrir(cls, diretorio):
+        """Abre respostas gravadas por `gravar`; os bits são visões do memory map, sem cópia"""
+        grupos = _abrir_ipc(os.path.join(diretorio, ARQUIVO_GRUPOS))
+        bits = _abrir_ipc(os.path.join(diretorio, ARQUIVO_BITS))
+        respondidas = _array(bits, "respondidas")
+        inicios = np.append(_array(grupos, "_inicio"), len(respondidas)).astype(np.int64)
+        return cls(grupos.drop_columns(["_tamanho", "_inicio"]).to_pandas(), _array(grupos, "_tamanho"),
+                   inicios, respondidas, _array(bits, "corretas"),
+                   grupos.schema.metadata[b"coluna_de"].decode("utf-8"))
+
+    def memoria(self):
+        """Bytes ocupados (bits, posições e tabela de grupos)"""
+        return int(self.respondidas.nbytes + self.corretas.nbytes + self.inicios.nbytes
+                   + self.tamanhos.nbytes + self.grupos.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,354 @@
+"""Snapshots locais em Parquet das planilhas e arquivos CSV dos dashboards.
+
+Cada fonte (planilha do Google Sheets ou arquivo CSV local) é convertida uma
+única vez em um arquivo Parquet tipado: as fontes conhecidas passam pelo seu
+esquema (`esquemas.py`), e o relatório de qualidade fica no manifesto; nas
+demais, `DE`, `ESCOLA`, `Disciplina` e `SERIE_ANO` viram categóricas. Os arquivos ficam versionados em
+`<diretório>/<chave>/vNNNN.parquet` e um `manifesto.json` guarda a versão
+atual, o hash do conteúdo de origem, os cabeçalhos ETag/Last-Modified e
+quando a origem foi consultada pela última vez (`verificado_em`). Cada versão
+é gravada por completo antes de o manifesto passar a apontar para ela, então
+quem lê o snapshot enquanto ele é atualizado recebe a versão anterior inteira.
+Quem grava (o app, o `atualizacao.py` em outro processo) trava o diretório
+com `fcntl.flock` em `manifesto.lock` enquanto escolhe a versão e reescreve o
+manifesto, então processos diferentes não repetem versões nem perdem entradas.
+
+Arquivos locais só são relidos quando o tamanho ou a data de modificação
+mudam, e o hash é calculado em blocos. Os maiores que `LIMITE_LEITURA_INTEIRA`
+(`ingestao.py`) não viram Parquet: passam pela leitura em blocos do
+`ResumoSaresp`, e o manifesto registra só a versão e a qualidade.
+
+Os dashboards leem o snapshot com memory map (arranque em milissegundos). Para
+reconstruir apenas os snapshots cuja origem mudou:
+
+    python snapshots.py atualizar
+    python snapshots.py atualizar dados_saresp.csv <URL da planilha> ...
+    python snapshots.py qualidade
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cache import obter
+from carregamento import MAX_CONEXOES, baixar_sheet, extrair_id
+from esquemas import descrever, esquema_da_chave, validar
+from ingestao import arquivo_grande, resumir_csv
+
+try:
+    import fcntl
+except ImportError:  # Windows: a trava vale só entre as threads do processo
+    fcntl = None
+
+DIRETORIO_SNAPSHOTS = os.environ.get("SARESP_SNAPSHOTS", "snapshots")
+COLUNAS_CATEGORICAS = ["DE", "ESCOLA", "Disciplina", "SERIE_ANO"]
+# Incrementar quando a tipagem mudar, para forçar a reconstrução dos snapshots
+VERSAO_FORMATO = 2
+VERSOES_MANTIDAS = 3
+BLOCO_HASH = 1024 ** 2
+
+_trava = threading.Lock()
+
+
+def _caminho_manifesto(diretorio):
+    return os.path.join(diretorio, "manifesto.json")
+
+
+def ler_manifesto(diretorio=None):
+    """Lê o manifesto dos snapshots (vazio se ainda não existir)"""
+    caminho = _caminho_manifesto(diretorio or DIRETORIO_SNAPSHOTS)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_atomico(caminho, conteudo):
+    """Grava os bytes em um temporário e o troca pelo arquivo de uma vez (quem lê vê o antigo ou o novo)"""
+    # Temporário próprio de cada processo e thread: o app e o atualizador podem gravar ao mesmo tempo
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def _gravar_manifesto(manifesto, diretorio):
+    conteudo = json.dumps(manifesto, ensure_ascii=False, indent=2, sort_keys=True)
+    gravar_atomico(_caminho_manifesto(diretorio), conteudo.encode("utf-8"))
+
+
+@contextmanager
+def trava_diretorio(diretorio, nome="manifesto.lock"):
+    """Trava o diretório dos snapshots entre threads e entre processos (`fcntl.flock`)"""
+    with _trava:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(diretorio, exist_ok=True)
+        with open(os.path.join(diretorio, nome), "a+b") as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _agora():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _marcar_verificado(chave, diretorio, **campos):
+    """Registra que a origem foi consultada e não mudou (a idade dos dados conta daqui)"""
+    with trava_diretorio(diretorio):
+        manifesto = ler_manifesto(diretorio)
+        if chave in manifesto:
+            manifesto[chave].update(campos, verificado_em=_agora())
+            _gravar_manifesto(manifesto, diretorio)
+
+
+def eh_arquivo_local(origem):
+    """Indica se a origem é um arquivo local (e não uma planilha)"""
+    return os.path.splitext(origem)[1].lower() in (".csv", ".txt") or os.path.exists(origem)
+
+
+def chave_da_origem(origem):
+    """Chave do snapshot: ID da planilha ou nome do arquivo local"""
+    if eh_arquivo_local(origem):
+        return os.path.splitext(os.path.basename(origem))[0]
+    return extrair_id(origem)
+
+
+def tipar(df):
+    """Converte as colunas-chave em categóricas"""
+    colunas = [coluna for coluna in COLUNAS_CATEGORICAS if coluna in df.columns]
+    if colunas:
+        df = df.astype({coluna: "category" for coluna in colunas})
+    return df
+
+
+def caminho_snapshot(chave, diretorio=None):
+    """Caminho do arquivo da versão atual de um snapshot (None se não existir)"""
+    diretorio = diretorio or DIRETORIO_SNAPSHOTS
+    entrada = ler_manifesto(diretorio).get(chave)
+    if entrada is None or entrada.get("formato") != VERSAO_FORMATO or not entrada.get("arquivo"):
+        return None
+    caminho = os.path.join(diretorio, entrada["arquivo"])
+    return caminho if os.path.exists(caminho) else None
+
+
+def ler_snapshot(chave, diretorio=None):
+    """Lê a versão atual de um snapshot com memory map (None se não existir)"""
+    caminho = caminho_snapshot(chave, diretorio)
+    if caminho is None:
+        return None
+    return pq.read_table(caminho, memory_map=True).to_pandas()
+
+
+def _registrar_versao(chave, campos, diretorio, df=None):
+    """Nova versão da chave no manifesto, gravando antes o Parquet de `df` (se houver)"""
+    with trava_diretorio(diretorio):
+        manifesto = ler_manifesto(diretorio)
+        versao = manifesto.get(chave, {}).get("versao", 0) + 1
+        pasta = os.path.join(diretorio, chave)
+
+        arquivo = None
+        if df is not None:
+            os.makedirs(pasta, exist_ok=True)
+            arquivo = os.path.join(chave, f"v{versao:04d}.parquet")
+            buffer = io.BytesIO()
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+            gravar_atomico(os.path.join(diretorio, arquivo), buffer.getvalue())
+
+        agora = _agora()
+        manifesto[chave] = dict(campos, arquivo=arquivo, versao=versao, formato=VERSAO_FORMATO,
+                                atualizado_em=agora, verificado_em=agora)
+        _gravar_manifesto(manifesto, diretorio)
+        if df is not None:
+            _remover_versoes_antigas(pasta, versao)
+
+
+def salvar_snapshot(chave, df, origem, hash_origem, etag=None, modificado_em=None,
+                    diretorio=None, **campos):
+    """Valida pelo esquema da fonte, grava uma nova versão do snapshot e atualiza o manifesto"""
+    diretorio = diretorio or DIRETORIO_SNAPSHOTS
+    esquema = esquema_da_chave(chave)
+    qualidade = None
+    if esquema is None:
+        df = tipar(df)
+    else:
+        df, qualidade = validar(df, esquema)
+    _registrar_versao(chave, dict(campos, origem=origem, hash=hash_origem, etag=etag,
+                                  modificado_em=modificado_em, linhas=len(df), qualidade=qualidade),
+                      diretorio, df)
+    return df
+
+
+def _hash_arquivo(caminho):
+    """sha256 do arquivo lido em blocos de `BLOCO_HASH` bytes"""
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(BLOCO_HASH), b""):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def _remover_versoes_antigas(pasta, versao_atual):
+    for nome in os.listdir(pasta):
+        if not nome.startswith("v") or not nome.endswith(".parquet"):
+            continue
+        if int(nome[1:-len(".parquet")]) <= versao_atual - VERSOES_MANTIDAS:
+            os.remove(os.path.join(pasta, nome))
+
+
+def atualizar_snapshot(origem, forcar=False, diretorio=None):
+    """Reconstrói o snapshot de uma origem se ela mudou; retorna True se reconstruiu"""
+    diretorio = diretorio or DIRETORIO_SNAPSHOTS
+    chave = chave_da_origem(origem)
+    entrada = ler_manifesto(diretorio).get(chave, {})
+    valido = not forcar and entrada.get("formato") == VERSAO_FORMATO
+
+    if eh_arquivo_local(origem):
+        return _atualizar_arquivo(origem, chave, entrada if valido else {}, diretorio)
+
+    conteudo, etag, modificado_em = baixar_sheet(
+        origem,
+        etag=entrada.get("etag") if valido else None,
+        modificado_em=entrada.get("modificado_em") if valido else None,
+    )
+    if conteudo is None:
+        _marcar_verificado(chave, diretorio)
+        return False
+
+    hash_origem = hashlib.sha256(conteudo).hexdigest()
+    if valido and entrada.get("hash") == hash_origem:
+        _marcar_verificado(chave, diretorio)
+        return False
+
+    df = pd.read_csv(io.BytesIO(conteudo))
+    salvar_snapshot(chave, df, origem, hash_origem, etag, modificado_em, diretorio)
+    return True
+
+
+def _atualizar_arquivo(caminho, chave, entrada, diretorio):
+    """`atualizar_snapshot` de um arquivo local (`entrada` vazia força a reconstrução)"""
+    estado = os.stat(caminho)
+    marca = {"tamanho": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+    if entrada and all(entrada.get(campo) == valor for campo, valor in marca.items()):
+        _marcar_verificado(chave, diretorio)
+        return False
+
+    hash_origem = _hash_arquivo(caminho)
+    if entrada and entrada.get("hash") == hash_origem:
+        _marcar_verificado(chave, diretorio, **marca)
+        return False
+
+    if arquivo_grande(caminho):
+        # Não cabe em um read_csv: lido em blocos pelo resumo (o mesmo que as páginas usam)
+        resumo = resumir_csv(caminho)
+        _registrar_versao(chave, dict(marca, origem=caminho, hash=hash_origem, etag=None,
+                                      modificado_em=None, linhas=resumo.linhas,
+                                      qualidade=resumo.qualidade), diretorio)
+        return True
+
+    salvar_snapshot(chave, pd.read_csv(caminho), caminho, hash_origem, diretorio=diretorio, **marca)
+    return True
+
+
+def ler_snapshot_compartilhado(chave, diretorio=None):
+    """`ler_snapshot` pelo cache do processo: todas as sessões recebem o mesmo DataFrame.
+
+    A chave do cache é o arquivo da versão atual, então uma nova versão é lida de novo.
+    O DataFrame devolvido é compartilhado e não deve ser alterado no lugar.
+    """
+    caminho = caminho_snapshot(chave, diretorio)
+    if caminho is None:
+        return None
+    return obter(("snapshot", os.path.abspath(caminho)), lambda: pq.read_table(caminho, memory_map=True).to_pandas())
+
+
+def assinatura_snapshots(origens, diretorio=None):
+    """Versão atual do snapshot de cada origem de {nome: origem}, para chaves de cache"""
+    manifesto = ler_manifesto(diretorio)
+    return tuple(sorted((nome, chave, manifesto.get(chave, {}).get("versao"))
+                        for nome, chave in ((nome, chave_da_origem(origem)) for nome, origem in origens.items())))
+
+
+def carregar_snapshot(origem, diretorio=None):
+    """Lê o snapshot de uma origem (compartilhado entre sessões), criando-o na primeira vez"""
+    chave = chave_da_origem(origem)
+    df = ler_snapshot_compartilhado(chave, diretorio)
+    if df is None:
+        atualizar_snapshot(origem, diretorio=diretorio)
+        df = ler_snapshot_compartilhado(chave, diretorio)
+    return df
+
+
+def carregar_snapshots(origens, diretorio=None):
+    """Lê um dicionário {nome: origem} e retorna {nome: DataFrame} a partir dos snapshots"""
+    faltando = {
+        chave_da_origem(origem): origem for origem in origens.values()
+        if caminho_snapshot(chave_da_origem(origem), diretorio) is None
+    }
+    if faltando:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONEXOES, len(faltando))) as pool:
+            list(pool.map(lambda origem: atualizar_snapshot(origem, diretorio=diretorio),
+                          faltando.values()))
+    return {nome: ler_snapshot_compartilhado(chave_da_origem(origem), diretorio)
+            for nome, origem in origens.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerencia os snapshots Parquet dos dashboards")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    atualizar = subcomandos.add_parser(
+        "atualizar", help="reconstrói os snapshots cuja origem mudou")
+    atualizar.add_argument("origens", nargs="*",
+                           help="URLs/IDs de planilhas ou arquivos CSV (padrão: todas do manifesto)")
+    atualizar.add_argument("--forcar", action="store_true",
+                           help="reconstrói mesmo que a origem não tenha mudado")
+    atualizar.add_argument("--diretorio", default=DIRETORIO_SNAPSHOTS)
+
+    listar = subcomandos.add_parser("listar", help="lista os snapshots existentes")
+    listar.add_argument("--diretorio", default=DIRETORIO_SNAPSHOTS)
+
+    qualidade = subcomandos.add_parser("qualidade", help="mostra o relatório de qualidade de cada snapshot")
+    qualidade.add_argument("--diretorio", default=DIRETORIO_SNAPSHOTS)
+    qualidade.add_argument("--json", action="store_true", help="relatórios completos em JSON")
+
+    args = parser.parse_args(argv)
+    manifesto = ler_manifesto(args.diretorio)
+
+    if args.comando == "listar":
+        for chave, entrada in sorted(manifesto.items()):
+            print(f"{chave}  v{entrada['versao']}  {entrada['linhas']} linhas  "
+                  f"{entrada['atualizado_em']}  {entrada['origem']}")
+        return
+
+    if args.comando == "qualidade":
+        relatorios = {chave: entrada.get("qualidade") for chave, entrada in sorted(manifesto.items())}
+        if args.json:
+            print(json.dumps(relatorios, ensure_ascii=False, indent=2))
+            return
+        for chave, relatorio in relatorios.items():
+            print(f"{chave}  {descrever(relatorio) if relatorio else 'sem esquema'}")
+        return
+
+    origens = args.origens or [entrada["origem"] for entrada in manifesto.values()]
+    for origem in origens:
+        reconstruido = atualizar_snapshot(origem, forcar=args.forcar, diretorio=args.diretorio)
+        print(f"{'atualizado' if reconstruido else 'sem mudanças'}: {origem}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Visualização de tabelas grandes paginada no servidor.
+
+Em vez de formatar a tabela inteira (`to_string`, `st.write(df)`), a página
+recebe só a janela visível: busca e ordenação são feitas aqui, sobre as
+posições das linhas, e apenas as `linhas_por_pagina` linhas da página atual são
+serializadas e enviadas ao navegador. As posições de cada busca e ordenação
+ficam memorizadas (LRU) pela versão da tabela informada pela página (por
+exemplo, a versão dos snapshots e os filtros aplicados), então trocar de página
+não reordena nada e um rerun não percorre a tabela; sem versão, vale a
+impressão digital do conteúdo.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from estatisticas import impressao_digital
+
+LINHAS_POR_PAGINA = 50
+OPCOES_LINHAS_POR_PAGINA = [25, 50, 100, 500]
+MAX_POSICOES_MEMORIZADAS = 32
+ORDEM_ORIGINAL = "(ordem original)"
+
+_memoria = OrderedDict()
+_trava = threading.Lock()
+
+
+def _memorizado(chave, calcular):
+    with _trava:
+        if chave in _memoria:
+            _memoria.move_to_end(chave)
+            return _memoria[chave]
+    valor = calcular()
+    with _trava:
+        _memoria[chave] = valor
+        while len(_memoria) > MAX_POSICOES_MEMORIZADAS:
+            _memoria.popitem(last=False)
+    return valor
+
+
+def _buscar(df, texto):
+    """Posições das linhas em que alguma coluna de texto contém `texto` (sem diferenciar caixa)"""
+    mascara = np.zeros(len(df), dtype=bool)
+    for coluna in df.columns:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Compara só as categorias distintas e propaga pelos códigos
+            achadas = serie.cat.categories.astype(str).str.contains(texto, case=False, regex=False)
+            codigos = serie.cat.codes.to_numpy()
+            mascara |= (codigos >= 0) & np.append(achadas, False)[codigos]
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            mascara |= serie.astype(str).str.contains(texto, case=False, regex=False, na=False).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+def _ordenar(df, coluna, crescente):
+    """Posições das linhas ordenadas por `coluna` (ordenação estável, ausentes no fim)"""
+    valores = df[coluna].reset_index(drop=True)
+    try:
+        ordenados = valores.sort_values(ascending=crescente, kind="stable", na_position="last")
+    except TypeError:
+        # Coluna com tipos misturados (planilha com texto em coluna numérica): ordena como texto
+        ordenados = valores.where(valores.isna(), valores.astype(str)).sort_values(
+            ascending=crescente, kind="stable", na_position="last")
+    return ordenados.index.to_numpy()
+
+
+def posicoes(df, busca="", coluna=None, crescente=True, versao=None):
+    """Posições das linhas após busca e ordenação (None = todas, na ordem original).
+
+    `versao` identifica o conteúdo de `df`; sem ela, é a impressão digital (percorre a tabela).
+    """
+    if not busca and coluna is None:
+        return None
+    versao = versao or impressao_digital(df)
+    return _memorizado((versao, "posicoes", busca.lower(), coluna, crescente),
+                       lambda: _posicoes(df, busca, coluna, crescente, versao))
+
+
+def _posicoes(df, busca, coluna, crescente, versao):
+    selecionadas = None
+    if busca:
+        selecionadas = _memorizado((versao, "busca", busca.lower()), lambda: _buscar(df, busca))
+    if coluna is not None:
+        ordem = _memorizado((versao, "ordem", coluna, crescente), lambda: _ordenar(df, coluna, crescente))
+        if selecionadas is not None:
+            ordem = ordem[np.isin(ordem, selecionadas, assume_unique=True)]
+        selecionadas = ordem
+    return selecionadas
+
+
+def janela(df, selecionadas, inicio, fim):
+    """Linhas `inicio:fim` de `df` na ordem das posições selecionadas (None = ordem original)"""
+    if selecionadas is None:
+        return df.iloc[inicio:fim]
+    return df.iloc[selecionadas[inicio:fim]]
+
+
+def tabela_paginada(df, chave, linhas_por_pagina=LINHAS_POR_PAGINA, versao=None):
+    """Busca, ordenação e paginação de `df`; só a página visível vai para o navegador.
+
+    `versao` identifica o conteúdo de `df` (veja `posicoes`).
+    """
+    import streamlit as st
+
+    busca_coluna, ordem_coluna, sentido_coluna, tamanho_coluna = st.columns([3, 2, 1, 1])
+    busca = busca_coluna.text_input("Buscar", key=f"{chave}_busca", placeholder="texto em qualquer coluna")
+    nomes = [str(nome) for nome in df.columns]
+    coluna = ordem_coluna.selectbox("Ordenar por", [ORDEM_ORIGINAL] + nomes, key=f"{chave}_ordem")
+    crescente = sentido_coluna.radio("Sentido", ["↑", "↓"], key=f"{chave}_sentido", horizontal=True) == "↑"
+    padrao = (OPCOES_LINHAS_POR_PAGINA.index(linhas_por_pagina)
+              if linhas_por_pagina in OPCOES_LINHAS_POR_PAGINA else 1)
+    linhas_por_pagina = tamanho_coluna.selectbox("Linhas", OPCOES_LINHAS_POR_PAGINA, index=padrao,
+                                                 key=f"{chave}_linhas")
+
+    coluna = None if coluna == ORDEM_ORIGINAL else df.columns[nomes.index(coluna)]
+    selecionadas = posicoes(df, busca, coluna, crescente, versao)
+    total = len(df) if selecionadas is None else len(selecionadas)
+    paginas = max(1, -(-total // linhas_por_pagina))
+    # A chave inclui a busca e o tamanho da página para voltar à página 1 quando eles mudam
+    numero = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1,
+                             key=f"{chave}_pagina_{busca}_{linhas_por_pagina}")
+    inicio = (int(numero) - 1) * linhas_por_pagina
+    linhas = janela(df, selecionadas, inicio, inicio + linhas_por_pagina)
+
+    filtro = f" (de {len(df):,} no total)" if busca else ""
+    st.caption(f"Linhas {min(inicio + 1, total):,}–{inicio + len(linhas):,} de {total:,}{filtro} · "
+               f"{len(df.columns)} colunas".replace(",", "."))
+    st.dataframe(linhas, hide_index=True, width="stretch")
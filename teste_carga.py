@@ -0,0 +1,296 @@
+"""Teste de carga do app.py: várias sessões simultâneas com dados sintéticos.
+
+Cada sessão é um `AppTest` (o app rodando sem navegador) que abre o app e
+segue um roteiro aleatório, mas reproduzível pela semente, de trocas de página
+e mudanças de filtros, buscas e ordenações. Cada sessão roda em um processo
+próprio: o `AppTest` troca estado global do Streamlit a cada execução (opções
+de configuração e o `Runtime`), então duas sessões não podem rodar ao mesmo
+tempo em threads do mesmo processo. Com isso o cache compartilhado (`cache.py`)
+vale por processo, como em um servidor com vários workers; com
+`SARESP_CACHE_DIRETORIO` ele é compartilhado pelo disco. Todas as sessões de um
+nível aquecem (abrem cada página uma vez) e largam juntas. Para cada nível são
+registrados:
+
+- latência dos reruns (p50, p95, p99 e máximo), no total e por página e ação;
+- vazão (reruns por segundo de todas as sessões);
+- memória por processo: RSS antes do roteiro e ao final, pico e soma dos processos;
+- erros levantados pelas páginas.
+
+Roda sem internet: as planilhas e os microdados são gerados por
+`dados_sinteticos.preparar_ambiente` em uma pasta temporária.
+
+    python teste_carga.py --sessoes 1 2 4 8
+    python teste_carga.py --sessoes 10 --escala 50 --acoes 40 --pausa 0.5
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+DIRETORIO_RESULTADOS = "resultados_carga"
+# A primeira é a página padrão do app.py
+PAGINAS = [
+    "paginas/analise_geral.py",
+    "paginas/comparativo.py",
+    "Correlacao.py",
+    "Correlacao_v2.py",
+]
+PROBABILIDADE_TROCA_PAGINA = 0.3
+BUSCAS = ["ESCOLA", "SUL", "00", "EE", ""]
+TEMPO_LIMITE = 600
+CONTEXTO_PROCESSOS = os.environ.get("SARESP_CONTEXTO_PROCESSOS", "spawn")
+
+
+def _memoria_mb():
+    """RSS atual e pico (VmHWM) do processo em MB (Linux; None onde /proc não existe)"""
+    valores = {"rss": None, "pico": None}
+    try:
+        with open("/proc/self/status", encoding="ascii") as arquivo:
+            for linha in arquivo:
+                campo, _, valor = linha.partition(":")
+                if campo in ("VmRSS", "VmHWM"):
+                    valores["rss" if campo == "VmRSS" else "pico"] = int(valor.split()[0]) / 1024
+    except OSError:
+        pass
+    return valores
+
+
+def _percentis(segundos):
+    p50, p95, p99 = np.percentile(segundos, [50, 95, 99])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4),
+            "max": round(float(np.max(segundos)), 4)}
+
+
+def _widgets(at):
+    """Widgets da página atual que o roteiro pode mudar"""
+    return [*at.sidebar.multiselect, *at.main.selectbox, *at.main.text_input]
+
+
+def _opcoes_multiselect(widget):
+    """{rótulo exibido: valor} das opções de um multiselect.
+
+    Opções formatadas por um dicionário (`format_func=nomes.get`, como a de
+    escolas) são convertidas de volta pelas chaves; as demais são o próprio rótulo.
+    """
+    formatar = widget.format_func
+    dicionario = getattr(formatar, "__self__", None)
+    if isinstance(dicionario, dict):
+        return {str(formatar(valor)): valor for valor in dicionario}
+    return {rotulo: rotulo for rotulo in widget.options}
+
+
+def _interagir(widget, rng):
+    """Muda o widget como um usuário faria; devolve o nome da ação"""
+    if widget.type == "multiselect":
+        opcoes = _opcoes_multiselect(widget)
+        rotulos = [rotulo for rotulo in widget.options if rotulo in opcoes]
+        # Nenhuma opção = filtro limpo (todas)
+        quantidade = int(rng.integers(0, min(3, len(rotulos)) + 1))
+        escolhidos = rng.choice(len(rotulos), quantidade, replace=False)
+        widget.set_value([opcoes[rotulos[posicao]] for posicao in sorted(escolhidos)])
+        return f"filtro {widget.label}"
+    if widget.type == "selectbox":
+        widget.select_index(int(rng.integers(len(widget.options))))
+        return f"seleção {widget.label}"
+    widget.input(str(rng.choice(BUSCAS)))
+    return f"busca {widget.label}"
+
+
+def _sessao(app, numero, acoes, semente, pausa):
+    """Roteiro de uma sessão: abre o app e faz `acoes` trocas de página ou de widgets"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng([semente, numero])
+    at = AppTest.from_file(app, default_timeout=TEMPO_LIMITE)
+    medicoes = []
+
+    def rodar(pagina, acao):
+        inicio = time.perf_counter()
+        at.run()
+        medicoes.append({"pagina": pagina, "acao": acao, "segundos": time.perf_counter() - inicio,
+                         "erro": next((str(erro.value) for erro in at.exception), None)})
+
+    pagina = PAGINAS[0]
+    rodar(pagina, "abrir")
+    for _ in range(acoes):
+        if pausa:
+            time.sleep(rng.uniform(0, 2 * pausa))
+        widgets = _widgets(at)
+        if not widgets or rng.random() < PROBABILIDADE_TROCA_PAGINA:
+            pagina = str(rng.choice([outra for outra in PAGINAS if outra != pagina]))
+            at.switch_page(pagina)
+            rodar(pagina, "trocar página")
+        else:
+            rodar(pagina, _interagir(widgets[int(rng.integers(len(widgets)))], rng))
+    return medicoes
+
+
+def _aquecer(app):
+    """Abre cada página uma vez (imports, snapshots e caches prontos antes da medição)"""
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    at = AppTest.from_file(app, default_timeout=TEMPO_LIMITE)
+    for pagina in PAGINAS:
+        at.switch_page(pagina)
+        at.run()
+    return time.perf_counter() - inicio
+
+
+def _processo_sessao(diretorio, snapshots, app, numero, acoes, semente, pausa, aquecer, largada, fila):
+    """Processo de uma sessão: aquece, espera a largada comum e roda o roteiro"""
+    os.chdir(diretorio)
+    os.environ["SARESP_SNAPSHOTS"] = snapshots
+    try:
+        # O Streamlit imprime avisos de depreciação a cada rerun; no teste de carga
+        # isso só atrapalha a saída (falhas voltam pela fila)
+        with open(os.devnull, "w", encoding="utf-8") as nulo, \
+                contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            aquecimento = _aquecer(app) if aquecer else None
+            memoria_inicial = _memoria_mb()
+            largada.wait()
+            medicoes = _sessao(app, numero, acoes, semente, pausa)
+        fila.put({"numero": numero, "medicoes": medicoes, "aquecimento": aquecimento,
+                  "memoria_inicial": memoria_inicial, "memoria_final": _memoria_mb()})
+    except BaseException as erro:
+        largada.abort()
+        fila.put({"numero": numero, "falha": f"{type(erro).__name__}: {erro}"})
+
+
+def _media(valores):
+    valores = [valor for valor in valores if valor is not None]
+    return round(float(np.mean(valores)), 1) if valores else None
+
+
+def medir_concorrencia(diretorio, snapshots, app, sessoes, acoes, semente, pausa=0.0, aquecer=True):
+    """Roda `sessoes` sessões simultâneas, uma por processo, e resume latência, vazão e memória"""
+    contexto = multiprocessing.get_context(CONTEXTO_PROCESSOS)
+    largada = contexto.Barrier(sessoes + 1)
+    fila = contexto.Queue()
+    processos = [contexto.Process(target=_processo_sessao,
+                                  args=(diretorio, snapshots, app, numero, acoes, semente, pausa, aquecer,
+                                        largada, fila))
+                 for numero in range(sessoes)]
+    for processo in processos:
+        processo.start()
+    try:
+        largada.wait(TEMPO_LIMITE)
+    except threading.BrokenBarrierError:
+        pass
+    inicio = time.perf_counter()
+    sessoes_medidas = [fila.get() for _ in processos]
+    segundos = time.perf_counter() - inicio
+    for processo in processos:
+        processo.join()
+
+    falhas = [sessao["falha"] for sessao in sessoes_medidas if "falha" in sessao]
+    if falhas:
+        return {"sessoes": sessoes, "falha": list(dict.fromkeys(falhas))[:3]}
+
+    medicoes = [medicao for sessao in sessoes_medidas for medicao in sessao["medicoes"]]
+    tempos = np.array([medicao["segundos"] for medicao in medicoes])
+    erros = [medicao["erro"] for medicao in medicoes if medicao["erro"]]
+    grupos = {}
+    for medicao in medicoes:
+        grupos.setdefault((medicao["pagina"], medicao["acao"]), []).append(medicao["segundos"])
+    iniciais = [sessao["memoria_inicial"]["rss"] for sessao in sessoes_medidas]
+    finais = [sessao["memoria_final"]["rss"] for sessao in sessoes_medidas]
+    picos = [sessao["memoria_final"]["pico"] for sessao in sessoes_medidas]
+    return {
+        "sessoes": sessoes,
+        "reruns": len(medicoes),
+        "segundos": round(segundos, 3),
+        "reruns_por_segundo": round(len(medicoes) / segundos, 3),
+        **_percentis(tempos),
+        "erros": len(erros),
+        "exemplos_erros": list(dict.fromkeys(erros))[:3],
+        "aquecimento_segundos": _media([sessao["aquecimento"] for sessao in sessoes_medidas]),
+        # Memória por processo (uma sessão cada): média antes do roteiro e ao final, e maiores valores
+        "rss_inicial_mb": _media(iniciais),
+        "rss_final_mb": _media(finais),
+        "rss_final_max_mb": max((rss for rss in finais if rss is not None), default=None),
+        "pico_mb": max((pico for pico in picos if pico is not None), default=None),
+        "rss_total_mb": round(sum(rss for rss in finais if rss is not None), 1),
+        "por_acao": [{"pagina": pagina, "acao": acao, "reruns": len(tempos_acao), **_percentis(tempos_acao)}
+                     for (pagina, acao), tempos_acao in sorted(grupos.items())],
+    }
+
+
+def medir_niveis(niveis, escala, semente, acoes, pausa=0.0, aquecer=True):
+    """Mede cada nível de concorrência com processos novos e os mesmos dados sintéticos"""
+    from dados_sinteticos import preparar_ambiente
+
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    with tempfile.TemporaryDirectory() as diretorio:
+        snapshots = preparar_ambiente(diretorio, escala, semente)
+        for sessoes in niveis:
+            yield medir_concorrencia(diretorio, snapshots, app, sessoes, acoes, semente, pausa, aquecer)
+
+
+def _imprimir(resultado):
+    if "falha" in resultado:
+        print(f"{resultado['sessoes']:>7} falhou: {resultado['falha']}")
+        return
+    print(f"{resultado['sessoes']:>7} {resultado['reruns']:>7} {resultado['p50']:>8.3f} "
+          f"{resultado['p95']:>8.3f} {resultado['p99']:>8.3f} {resultado['max']:>8.3f} "
+          f"{resultado['reruns_por_segundo']:>9.2f} {resultado['rss_final_mb'] or 0:>11.0f} "
+          f"{resultado['pico_mb'] or 0:>8.0f} {resultado['rss_total_mb']:>10.0f} {resultado['erros']:>6}")
+    for erro in resultado["exemplos_erros"]:
+        print(f"{'':>7} erro: {erro}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app.py com sessões simultâneas")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="níveis de concorrência (sessões simultâneas, um processo cada; padrão: 1 2 4 8)")
+    parser.add_argument("--escala", type=float, default=10, help="múltiplo do tamanho do piloto (padrão: 10)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--acoes", type=int, default=20, help="ações por sessão depois de abrir o app")
+    parser.add_argument("--pausa", type=float, default=0.0,
+                        help="pausa média em segundos entre as ações de uma sessão (tempo de leitura)")
+    parser.add_argument("--sem-aquecimento", action="store_true",
+                        help="mede também a primeira abertura das páginas (imports e carga)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    from benchmark import commit_atual
+
+    escala = int(args.escala) if float(args.escala).is_integer() else args.escala
+    print(f"{'sessões':>7} {'reruns':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'máx s':>8} "
+          f"{'reruns/s':>9} {'RSS/proc MB':>11} {'pico MB':>8} {'total MB':>10} {'erros':>6}")
+    resultados = []
+    for resultado in medir_niveis(args.sessoes, escala, args.semente, args.acoes, args.pausa,
+                                  not args.sem_aquecimento):
+        _imprimir(resultado)
+        resultados.append(resultado)
+
+    commit = commit_atual()
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpus": os.cpu_count(),
+        "escala": escala,
+        "semente": args.semente,
+        "acoes": args.acoes,
+        "pausa": args.pausa,
+        "resultados": resultados,
+    }
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS,
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit or 'sem-commit'}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Servidor HTTP local no lugar do Google Sheets, para os testes de carga e atualização."""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Os módulos do app ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import carregamento  # noqa: E402
+
+
+class PlanilhasFalsas:
+    """Planilhas servidas como o export CSV do Google Sheets, com ETag e 304"""
+
+    def __init__(self):
+        self.csv = {}
+        self.pedidos = []
+        self.status_forcado = None
+        self.atraso = 0.0
+
+    def etag(self, id_planilha):
+        return '"' + hashlib.sha256(self.csv[id_planilha]).hexdigest()[:16] + '"'
+
+
+@pytest.fixture
+def planilhas(monkeypatch):
+    """Servidor local com {id: bytes do CSV}; `carregamento.URL_BASE` aponta para ele"""
+    estado = PlanilhasFalsas()
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            partes = self.path.split("?")[0].split("/")
+            id_planilha = partes[3] if len(partes) > 3 else None
+            estado.pedidos.append((id_planilha, self.headers.get("If-None-Match")))
+            time.sleep(estado.atraso)
+            if estado.status_forcado:
+                self.send_response(estado.status_forcado)
+                self.end_headers()
+            elif id_planilha not in estado.csv:
+                self.send_response(404)
+                self.end_headers()
+            elif self.headers.get("If-None-Match") == estado.etag(id_planilha):
+                self.send_response(304)
+                self.end_headers()
+            else:
+                conteudo = estado.csv[id_planilha]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(conteudo)))
+                self.send_header("ETag", estado.etag(id_planilha))
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    monkeypatch.setattr(carregamento, "URL_BASE", f"http://127.0.0.1:{servidor.server_address[1]}")
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
@@ -0,0 +1,163 @@
+"""Download condicional, versões dos snapshots e atualização em segundo plano contra o servidor local."""
+
+import os
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+import ingestao
+import snapshots
+from atualizacao import Atualizador, idade_dos_dados
+from snapshots import atualizar_snapshot, ler_manifesto, ler_snapshot
+
+ID = "planilha-teste"
+ORIGEM = f"https://docs.google.com/spreadsheets/d/{ID}/edit"
+
+
+def _csv(notas):
+    return pd.DataFrame({"DE": ["SUL 1"] * len(notas), "ESCOLA": [f"E{i}" for i in range(len(notas))],
+                         "LP": notas}).to_csv(index=False).encode("utf-8")
+
+
+@pytest.fixture
+def horario(monkeypatch):
+    """Relógio do manifesto controlado pelo teste"""
+    atual = {"agora": "2026-01-01T00:00:00+00:00"}
+    monkeypatch.setattr(snapshots, "_agora", lambda: atual["agora"])
+    return atual
+
+
+def test_primeira_carga_grava_versao_com_etag(planilhas, tmp_path):
+    planilhas.csv[ID] = _csv([200.0, 250.0])
+
+    assert atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+
+    entrada = ler_manifesto(str(tmp_path))[ID]
+    assert entrada["versao"] == 1
+    assert entrada["etag"] == planilhas.etag(ID)
+    assert ler_snapshot(ID, str(tmp_path))["LP"].tolist() == [200.0, 250.0]
+    assert planilhas.pedidos == [(ID, None)]
+
+
+def test_planilha_sem_mudanca_volta_304_e_so_marca_verificacao(planilhas, tmp_path, horario):
+    planilhas.csv[ID] = _csv([200.0])
+    atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+
+    horario["agora"] = "2026-01-01T00:15:00+00:00"
+    assert not atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+
+    # O ETag da primeira resposta volta no If-None-Match e o servidor responde 304
+    assert planilhas.pedidos[-1] == (ID, planilhas.etag(ID))
+    entrada = ler_manifesto(str(tmp_path))[ID]
+    assert entrada["versao"] == 1
+    assert entrada["atualizado_em"] == "2026-01-01T00:00:00+00:00"
+    assert entrada["verificado_em"] == "2026-01-01T00:15:00+00:00"
+
+
+def test_planilha_alterada_vira_nova_versao(planilhas, tmp_path):
+    planilhas.csv[ID] = _csv([200.0])
+    atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+    anterior = ler_manifesto(str(tmp_path))[ID]["arquivo"]
+
+    planilhas.csv[ID] = _csv([200.0, 300.0])
+    assert atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+
+    entrada = ler_manifesto(str(tmp_path))[ID]
+    assert entrada["versao"] == 2
+    assert entrada["etag"] == planilhas.etag(ID)
+    assert entrada["arquivo"] != anterior
+    assert (tmp_path / anterior).exists()  # versões anteriores ficam para quem ainda as lê
+    assert ler_snapshot(ID, str(tmp_path))["LP"].tolist() == [200.0, 300.0]
+
+
+def test_falha_na_origem_mantem_snapshot_atual(planilhas, tmp_path):
+    planilhas.csv[ID] = _csv([200.0])
+    atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+    manifesto = ler_manifesto(str(tmp_path))
+
+    planilhas.status_forcado = 500
+    with pytest.raises(requests.HTTPError):
+        atualizar_snapshot(ORIGEM, diretorio=str(tmp_path))
+
+    assert ler_manifesto(str(tmp_path)) == manifesto
+    assert ler_snapshot(ID, str(tmp_path))["LP"].tolist() == [200.0]
+
+
+def test_atualizador_registra_erro_e_segue_com_a_copia_local(planilhas, tmp_path):
+    planilhas.csv[ID] = _csv([200.0])
+    atualizador = Atualizador([ORIGEM], intervalo=0, diretorio=str(tmp_path))
+    assert atualizador.executar()["atualizadas"] == [ORIGEM]
+
+    planilhas.status_forcado = 503
+    estado = atualizador.executar()
+
+    assert estado["atualizadas"] == []
+    assert "HTTPError" in estado["erros"][ORIGEM]
+    assert ler_snapshot(ID, str(tmp_path))["LP"].tolist() == [200.0]
+    assert idade_dos_dados([ORIGEM], str(tmp_path)) is not None
+
+
+def test_pedir_atualizacao_nao_espera_o_download(planilhas, tmp_path):
+    planilhas.csv[ID] = _csv([200.0])
+    planilhas.atraso = 0.5
+    atualizador = Atualizador([ORIGEM], intervalo=0, diretorio=str(tmp_path))
+
+    inicio = time.perf_counter()
+    atualizador.pedir()
+    assert time.perf_counter() - inicio < 0.2
+
+    limite = time.monotonic() + 10
+    while atualizador.estado()["fim"] is None and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert atualizador.estado()["atualizadas"] == [ORIGEM]
+    assert ler_manifesto(str(tmp_path))[ID]["versao"] == 1
+
+
+def _microdados(caminho, notas):
+    pd.DataFrame({"DE": ["SUL 1"] * len(notas), "Race": ["Branca"] * len(notas),
+                  "SARESP": notas, "Simulado": [50.0] * len(notas)}).to_csv(caminho, index=False)
+
+
+def test_arquivo_local_sem_mudanca_nao_e_relido(tmp_path, monkeypatch):
+    origem = tmp_path / "notas.csv"
+    _microdados(origem, [200.0])
+    diretorio = str(tmp_path / "snapshots")
+    assert atualizar_snapshot(str(origem), diretorio=diretorio)
+
+    # Mesmo tamanho e data de modificação: nem o hash é calculado
+    monkeypatch.setattr(snapshots, "_hash_arquivo", lambda caminho: pytest.fail("arquivo relido"))
+    assert not atualizar_snapshot(str(origem), diretorio=diretorio)
+    monkeypatch.undo()
+
+    # Tocado sem mudar o conteúdo: o hash confere e não vira versão nova
+    os.utime(origem, ns=(0, 0))
+    assert not atualizar_snapshot(str(origem), diretorio=diretorio)
+    entrada = ler_manifesto(diretorio)["notas"]
+    assert (entrada["versao"], entrada["mtime_ns"]) == (1, 0)
+
+    _microdados(origem, [200.0, 300.0])
+    assert atualizar_snapshot(str(origem), diretorio=diretorio)
+    assert ler_snapshot("notas", diretorio)["SARESP"].tolist() == [200.0, 300.0]
+
+
+def test_arquivo_grande_passa_pela_leitura_em_blocos(tmp_path, monkeypatch):
+    origem = tmp_path / "dados_saresp.csv"
+    _microdados(origem, [200.0, 250.0, 999.0])
+    monkeypatch.setattr(ingestao, "LIMITE_LEITURA_INTEIRA", 0)
+    ler_csv = pd.read_csv
+
+    def so_em_blocos(*args, chunksize=None, **kwargs):
+        assert chunksize is not None, "arquivo lido inteiro"
+        return ler_csv(*args, chunksize=chunksize, **kwargs)
+
+    monkeypatch.setattr(pd, "read_csv", so_em_blocos)
+    diretorio = str(tmp_path / "snapshots")
+
+    assert atualizar_snapshot(str(origem), diretorio=diretorio)
+
+    entrada = ler_manifesto(diretorio)["dados_saresp"]
+    assert (entrada["versao"], entrada["arquivo"], entrada["linhas"]) == (1, None, 3)
+    assert entrada["qualidade"]["colunas"]["SARESP"]["fora_do_dominio"] == 1
+    assert ler_snapshot("dados_saresp", diretorio) is None
@@ -0,0 +1,81 @@
+"""Cubo montado uma vez sem filtro e seleção por células, contra o groupby das linhas filtradas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cubo
+from cubo import cubo_saresp, cubo_simulado
+from filtros import IndiceGrupos
+
+
+@pytest.fixture
+def acertos():
+    rng = np.random.default_rng(7)
+    n = 2000
+    escolas = rng.integers(1, 60, n)
+    ids = pd.array(escolas, dtype="Int32")
+    ids[rng.random(n) < 0.02] = pd.NA  # escolas fora da dimensão
+    des = np.where(escolas % 3 == 0, "Jundiaí", np.where(escolas % 3 == 1, "Sul 1", "Sul 2"))
+    return pd.DataFrame({
+        "DE": des,
+        "DE_NORM": pd.Categorical(pd.Series(des).str.upper().str.replace("Í", "I")),
+        "ID_ESCOLA": ids,
+        "SERIE_ANO": rng.choice(["5 Ano", "9 Ano"], n),
+        "Disciplina": rng.choice(["LP", "MAT"], n),
+        "MODALIDADE": rng.choice(["REGULAR", "EJA"], n),
+        "LP": rng.normal(250, 30, n),
+        "MAT": rng.normal(240, 30, n),
+        "Total_Respostas": rng.integers(1, 40, n),
+        "Total_Acertos": rng.integers(0, 20, n),
+        "Taxa_Acerto": rng.uniform(0, 100, n),
+    })
+
+
+SELECOES = [
+    {},
+    {"DE_NORM": ["JUNDIAI"]},
+    {"DE_NORM": ["SUL 1", "JUNDIAI"], "SERIE_ANO": ["9 Ano"]},
+    {"Disciplina": ["MAT"], "MODALIDADE": ["EJA"]},
+    {"ID_ESCOLA": [3, 4, 5], "SERIE_ANO": ["5 Ano"]},
+]
+
+
+@pytest.mark.parametrize("selecao", SELECOES)
+def test_selecao_do_cubo_igual_ao_groupby_das_linhas_filtradas(acertos, selecao):
+    filtradas = IndiceGrupos(acertos, versao="teste").fatiar(selecao)
+    cubo_todo = cubo_simulado(acertos, versao=("teste", "simulado"))
+
+    obtido = cubo_todo.selecionar(selecao).media('soma_taxa', 'celulas', ['DE', 'Disciplina'], nome='Taxa_Acerto')
+    esperado = filtradas.groupby(['DE', 'Disciplina'])['Taxa_Acerto'].mean().reset_index()
+
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize("selecao", SELECOES)
+def test_selecao_do_cubo_saresp_por_escola(acertos, selecao):
+    # O SARESP traz as disciplinas em colunas (LP, MAT), sem a coluna Disciplina
+    saresp = acertos.drop(columns=['Disciplina'])
+    selecao = {coluna: valores for coluna, valores in selecao.items() if coluna != 'Disciplina'}
+    filtradas = IndiceGrupos(saresp, versao="teste").fatiar(selecao)
+    cubo_todo = cubo_saresp(saresp, versao=("teste", "saresp"))
+
+    obtido = (cubo_todo.selecionar(selecao)
+              .media('soma_nota', 'n_nota', ['SERIE_ANO', 'ID_ESCOLA', 'Disciplina'], nome='nota')
+              .pivot(index=['SERIE_ANO', 'ID_ESCOLA'], columns='Disciplina', values='nota'))
+    esperado = filtradas.groupby(['SERIE_ANO', 'ID_ESCOLA'])[['LP', 'MAT']].mean()
+
+    pd.testing.assert_frame_equal(obtido, esperado, check_names=False, check_dtype=False,
+                                  check_index_type=False)
+
+
+def test_cubo_memorizado_pela_versao_sem_reler_os_dados(acertos, monkeypatch):
+    primeiro = cubo_simulado(acertos, versao=("teste", "memo"))
+    # Com a mesma versão, o cubo volta da memória sem olhar as linhas
+    monkeypatch.setattr(cubo.Cubo, "de_linhas", classmethod(lambda *args: pytest.fail("cubo remontado")))
+    assert cubo_simulado(acertos.iloc[:0], versao=("teste", "memo")) is primeiro
+
+
+def test_selecao_ignora_colunas_que_nao_sao_dimensoes(acertos):
+    cubo_todo = cubo_simulado(acertos.drop(columns=['MODALIDADE']), versao=("teste", "sem_modalidade"))
+    assert len(cubo_todo.selecionar({"MODALIDADE": ["EJA"], "SERIE_ANO": []})) == len(cubo_todo)
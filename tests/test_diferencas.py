@@ -0,0 +1,96 @@
+"""Bootstrap das diferenças por raça/cor, contra um bootstrap ingênuo (laço por grupo e réplica)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from diferencas import _posicoes_quantil, _replicas_quantil, calcular_diferencas
+
+
+@pytest.fixture
+def alunos():
+    rng = np.random.default_rng(5)
+    n = 1200
+    des = rng.choice(["JUNDIAI", "SUL 1", "SUL 2"], n, p=[0.5, 0.3, 0.2])
+    racas = rng.choice(["Branca", "Preta", "Parda", "Amarela"], n, p=[0.45, 0.15, 0.35, 0.05])
+    lacuna = np.where(np.isin(racas, ["Preta", "Parda"]), -15.0, 0.0)
+    return pd.DataFrame({"DE": des, "Race": racas, "SARESP": 250 + lacuna + rng.normal(0, 40, n)})
+
+
+def _lados(grupo):
+    return (grupo.loc[grupo["Race"] == "Branca", "SARESP"].to_numpy(),
+            grupo.loc[grupo["Race"].isin(["Preta", "Parda"]), "SARESP"].to_numpy())
+
+
+def _bootstrap_ingenuo(referencia, comparado, estatistica, reamostragens, rng):
+    return np.array([
+        estatistica(rng.choice(comparado, len(comparado))) - estatistica(rng.choice(referencia, len(referencia)))
+        for _ in range(reamostragens)
+    ])
+
+
+def _mediana(valores):
+    return np.quantile(valores, 0.5, method="inverted_cdf")
+
+
+def test_estimativas_iguais_as_medias_e_medianas_por_grupo(alunos):
+    resultado = calcular_diferencas(alunos, grupos=["DE"], reamostragens=10)
+
+    for de, grupo in alunos.groupby("DE"):
+        referencia, comparado = _lados(grupo)
+        linhas = resultado[resultado["DE"] == de].set_index("estatistica")
+        assert linhas.loc["média", "diferenca"] == pytest.approx(comparado.mean() - referencia.mean())
+        assert linhas.loc["mediana", "diferenca"] == pytest.approx(_mediana(comparado) - _mediana(referencia))
+        assert (linhas.loc["média", "n_referencia"], linhas.loc["média", "n_comparado"]) == (
+            len(referencia), len(comparado))
+
+
+@pytest.mark.parametrize("estatistica,funcao", [("média", np.mean), ("mediana", _mediana)])
+def test_intervalo_igual_ao_bootstrap_ingenuo(alunos, estatistica, funcao):
+    reamostragens = 2000
+    resultado = calcular_diferencas(alunos, grupos=["DE"], reamostragens=reamostragens, semente=1)
+    rng = np.random.default_rng(2)
+
+    for de, grupo in alunos.groupby("DE"):
+        replicas = _bootstrap_ingenuo(*_lados(grupo), funcao, reamostragens, rng)
+        linha = resultado[(resultado["DE"] == de) & (resultado["estatistica"] == estatistica)].iloc[0]
+        # Erro de Monte Carlo com 2000 réplicas: cerca de 2% no erro padrão, mais nas caudas
+        assert linha["erro_padrao"] == pytest.approx(replicas.std(ddof=1), rel=0.1)
+        inferior, superior = np.quantile(replicas, [0.025, 0.975])
+        assert linha["inferior"] == pytest.approx(inferior, abs=0.3 * linha["erro_padrao"])
+        assert linha["superior"] == pytest.approx(superior, abs=0.3 * linha["erro_padrao"])
+
+
+def test_quantil_sorteado_pela_beta_tem_a_distribuicao_da_reamostragem():
+    # Célula de 7 alunos: a mediana de uma reamostragem cai em cada aluno com a probabilidade
+    # exata da estatística de ordem, que a Beta reproduz sem gerar as reamostragens
+    valores = np.arange(7, dtype=float) * 10
+    tamanhos, inicios = np.array([7]), np.array([0])
+    reamostragens = 40000
+
+    beta = _replicas_quantil(valores, tamanhos, inicios, 0.5, reamostragens, np.random.default_rng(3))[:, 0]
+    rng = np.random.default_rng(4)
+    k = _posicoes_quantil(tamanhos, 0.5)[0]
+    ingenuo = np.sort(rng.choice(valores, (reamostragens, 7)), axis=1)[:, k - 1]
+
+    frequencias_beta = np.array([(beta == valor).mean() for valor in valores])
+    frequencias_ingenuas = np.array([(ingenuo == valor).mean() for valor in valores])
+    assert frequencias_beta.sum() == pytest.approx(1.0)
+    np.testing.assert_allclose(frequencias_beta, frequencias_ingenuas, atol=0.01)
+
+
+def test_resultado_nao_depende_do_tamanho_dos_lotes(alunos):
+    inteiro = calcular_diferencas(alunos, grupos=["DE"], reamostragens=200, semente=7)
+    em_lotes = calcular_diferencas(alunos, grupos=["DE"], reamostragens=200, semente=7, elementos=3000)
+
+    pd.testing.assert_frame_equal(inteiro, em_lotes)
+
+
+def test_grupo_com_poucos_alunos_fica_sem_estimativa(alunos):
+    poucos = pd.DataFrame({"DE": ["SUL 3"] * 3, "Race": ["Branca", "Parda", "Parda"], "SARESP": [200.0] * 3})
+
+    resultado = calcular_diferencas(pd.concat([alunos, poucos]), grupos=["DE"], reamostragens=50)
+
+    sul3 = resultado[resultado["DE"] == "SUL 3"]
+    assert len(sul3) == 2
+    assert sul3[["diferenca", "inferior", "superior"]].isna().all().all()
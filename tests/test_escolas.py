@@ -0,0 +1,44 @@
+"""Dimensão de escolas: IDs estáveis, fontes sem escola e escolas sem par na junção."""
+
+import pandas as pd
+
+from escolas import anexar_id_escola, atualizar_dimensao, carregar_dimensao, escolas_sem_par
+
+
+def test_ids_estaveis_e_nomes_normalizados(tmp_path):
+    primeira = pd.DataFrame({"DE": ["Jundiaí", "SUL 1"], "ESCOLA": ["Escola  A", "Escola B"]})
+    dimensao = atualizar_dimensao([primeira], diretorio=str(tmp_path))
+
+    segunda = pd.DataFrame({"DE": ["JUNDIAI", "SUL 2"], "ESCOLA": ["ESCOLA A", "Escola C"]})
+    dimensao = atualizar_dimensao([segunda], diretorio=str(tmp_path))
+
+    assert dimensao["ID_ESCOLA"].tolist() == [1, 2, 3]
+    assert anexar_id_escola(segunda, dimensao)["ID_ESCOLA"].tolist() == [1, 3]
+    pd.testing.assert_frame_equal(carregar_dimensao(str(tmp_path)), dimensao, check_dtype=False)
+
+
+def test_fontes_sem_de_e_escola_devolvem_a_dimensao_atual(tmp_path):
+    atualizar_dimensao([pd.DataFrame({"DE": ["SUL 1"], "ESCOLA": ["A"]})], diretorio=str(tmp_path))
+
+    dimensao = atualizar_dimensao([pd.DataFrame({"DE": ["SUL 1"], "Total": [10]})], diretorio=str(tmp_path))
+
+    assert dimensao["ESCOLA_NORM"].tolist() == ["A"]
+    assert len(atualizar_dimensao([], diretorio=str(tmp_path / "vazio"))) == 0
+
+
+def test_escolas_sem_par_usa_as_chaves_da_juncao(tmp_path):
+    dimensao = atualizar_dimensao([pd.DataFrame({"DE": ["SUL 1"] * 3, "ESCOLA": ["A", "B", "C"]})],
+                                  diretorio=str(tmp_path))
+    saresp = pd.DataFrame({"ID_ESCOLA": pd.array([1, 1, 2, None], dtype="Int32"),
+                           "SERIE_ANO": ["5 Ano", "9 Ano", "5 Ano", "5 Ano"]})
+    simulado = pd.DataFrame({"ID_ESCOLA": pd.array([1, 2, 3], dtype="Int32"),
+                             "SERIE_ANO": ["5 Ano", "9 Ano", "9 Ano"]})
+
+    fora = escolas_sem_par(saresp, simulado, dimensao, chaves=["ID_ESCOLA", "SERIE_ANO"])
+
+    # A escola 2 está nas duas bases, mas em séries diferentes: a junção não a encontra
+    assert fora[["ESCOLA", "SERIE_ANO", "lado"]].values.tolist() == [
+        ["A", "9 Ano", "esquerda"], ["B", "5 Ano", "esquerda"],
+        ["B", "9 Ano", "direita"], ["C", "9 Ano", "direita"],
+    ]
+    assert escolas_sem_par(saresp, simulado, dimensao)[["ESCOLA", "lado"]].values.tolist() == [["C", "direita"]]
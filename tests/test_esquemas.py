@@ -0,0 +1,48 @@
+"""Esquemas das fontes: colunas obrigatórias e planilhas só exibidas."""
+
+import pandas as pd
+import pytest
+
+from carregamento import extrair_id
+from esquemas import esquema_da_chave, validar
+from fontes import PLANILHAS_CORRELACAO
+from snapshots import atualizar_snapshot, ler_manifesto, ler_snapshot
+
+RACA_SUL1 = PLANILHAS_CORRELACAO["raca_sul1"]
+SIMULADO = PLANILHAS_CORRELACAO["simulado"]
+
+
+def test_coluna_obrigatoria_ausente_recusa_a_planilha():
+    with pytest.raises(ValueError, match="Resposta"):
+        validar(pd.DataFrame({"DE": ["SUL 1"], "ESCOLA": ["A"], "SERIE_ANO": ["5"], "Disciplina": ["LP"]}),
+                "simulado")
+
+
+def test_planilhas_so_exibidas_tem_todas_as_colunas_opcionais():
+    assert esquema_da_chave(extrair_id(RACA_SUL1)) == "raca_exibicao"
+    assert esquema_da_chave(extrair_id(SIMULADO)) == "simulado"
+
+    df, relatorio = validar(pd.DataFrame({"Escola": ["A", "B"], "Parda": ["10", "x"]}), "raca_exibicao")
+
+    assert df["Parda"].tolist()[0] == 10 and pd.isna(df["Parda"].tolist()[1])
+    assert relatorio["colunas"]["Parda"]["invalidos"] == 1
+    assert {"DE", "ESCOLA"} <= set(relatorio["colunas_opcionais_ausentes"])
+
+
+def test_planilha_so_exibida_sem_de_e_escola_vira_snapshot(planilhas, tmp_path):
+    id_planilha = extrair_id(RACA_SUL1)
+    planilhas.csv[id_planilha] = pd.DataFrame({"Escola": ["A"], "Branca": [12]}).to_csv(index=False).encode()
+
+    assert atualizar_snapshot(RACA_SUL1, diretorio=str(tmp_path))
+
+    assert ler_snapshot(id_planilha, str(tmp_path))["Branca"].tolist() == [12]
+    assert ler_manifesto(str(tmp_path))[id_planilha]["qualidade"]["esquema"] == "raca_exibicao"
+
+
+def test_planilha_calculada_sem_coluna_obrigatoria_mantem_o_snapshot(planilhas, tmp_path):
+    id_planilha = extrair_id(SIMULADO)
+    planilhas.csv[id_planilha] = pd.DataFrame({"Escola": ["A"]}).to_csv(index=False).encode()
+
+    with pytest.raises(ValueError, match="DE"):
+        atualizar_snapshot(SIMULADO, diretorio=str(tmp_path))
+    assert ler_manifesto(str(tmp_path)) == {}
@@ -0,0 +1,64 @@
+"""Regressão por grupo a partir das somas suficientes, contra o `linregress` do scipy."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import estatisticas
+from estatisticas import combinar_somas, regressao_de_somas, regressao_por_grupo, somas_suficientes
+
+
+@pytest.fixture
+def notas():
+    rng = np.random.default_rng(11)
+    n = 3000
+    grupo = rng.choice(["JUNDIAI", "SUL 1", "SUL 2"], n)
+    inclinacao = pd.Series(grupo).map({"JUNDIAI": 1.5, "SUL 1": 0.2, "SUL 2": 0.0}).to_numpy()
+    # Escala do SARESP (centenas): sem a centralização, as somas de quadrados perderiam dígitos
+    simulado = rng.uniform(0, 100, n)
+    saresp = 180 + inclinacao * simulado + rng.normal(0, 25, n)
+    return pd.DataFrame({"DE": grupo, "Simulado": simulado, "SARESP": saresp})
+
+
+def _comparar_com_linregress(linha, x, y):
+    esperado = stats.linregress(x, y)
+    assert linha["n"] == len(x)
+    assert linha["inclinacao"] == pytest.approx(esperado.slope, rel=1e-9)
+    assert linha["intercepto"] == pytest.approx(esperado.intercept, rel=1e-9)
+    assert linha["r"] == pytest.approx(esperado.rvalue, rel=1e-9, abs=1e-12)
+    assert linha["p_valor"] == pytest.approx(esperado.pvalue, rel=1e-6, abs=1e-300)
+    assert linha["erro_padrao"] == pytest.approx(esperado.stderr, rel=1e-9)
+
+
+def test_regressao_por_grupo_igual_ao_linregress(notas):
+    resultado = regressao_por_grupo(notas, "Simulado", "SARESP", ["DE"], versao=("teste", "grupos"))
+
+    assert sorted(resultado["DE"]) == ["JUNDIAI", "SUL 1", "SUL 2"]
+    for _, linha in resultado.iterrows():
+        grupo = notas[notas["DE"] == linha["DE"]]
+        _comparar_com_linregress(linha, grupo["Simulado"], grupo["SARESP"])
+
+
+def test_somas_combinadas_bloco_a_bloco_igual_ao_linregress(notas):
+    # Como na leitura em blocos dos microdados: mesmo deslocamento, somas combinadas
+    deslocamento = (50.0, 250.0)
+    somas = None
+    for inicio in range(0, len(notas), 700):
+        bloco = notas.iloc[inicio:inicio + 700]
+        somas = combinar_somas(somas, somas_suficientes(bloco, "Simulado", "SARESP", None, deslocamento))
+
+    resultado = regressao_de_somas(somas, deslocamento)
+
+    _comparar_com_linregress(resultado.iloc[0], notas["Simulado"], notas["SARESP"])
+    assert resultado.loc[0, "min_x"] == pytest.approx(notas["Simulado"].min())
+    assert resultado.loc[0, "max_x"] == pytest.approx(notas["Simulado"].max())
+
+
+def test_regressao_memorizada_pela_versao_sem_percorrer_os_dados(notas, monkeypatch):
+    primeira = regressao_por_grupo(notas, "Simulado", "SARESP", versao=("teste", "memo"))
+    monkeypatch.setattr(estatisticas, "impressao_digital", lambda df: pytest.fail("dados percorridos"))
+    monkeypatch.setattr(estatisticas, "_ajustar", lambda *args: pytest.fail("ajuste refeito"))
+
+    pd.testing.assert_frame_equal(regressao_por_grupo(notas.iloc[:0], "Simulado", "SARESP",
+                                                      versao=("teste", "memo")), primeira)
@@ -0,0 +1,130 @@
+"""Contagem de respostas e acertos em uma agregação e por delta, contra o groupby/merge de referência."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pontuacao
+from pontuacao import (CHAVES_SIMULADO, RESPOSTA_CORRETA, AgregadoSimulado, calcular_acertos,
+                       calcular_acertos_incremental)
+
+
+def _respostas(linhas, semente=3):
+    rng = np.random.default_rng(semente)
+    escolas = rng.integers(1, 25, linhas)
+    respostas = rng.choice([RESPOSTA_CORRETA, "Incorreto", None], linhas, p=[0.5, 0.4, 0.1])
+    return pd.DataFrame({
+        "DE": pd.Categorical(np.where(escolas % 2, "SUL 1", "JUNDIAI")),
+        "SERIE_ANO": pd.Categorical(rng.choice(["5 Ano", "9 Ano"], linhas)),
+        "ESCOLA": pd.Categorical([f"E{escola}" for escola in escolas]),
+        "Disciplina": pd.Categorical(rng.choice(["LP", "MAT"], linhas)),
+        "Resposta": pd.Categorical(respostas),
+    })
+
+
+def _referencia(df, chaves=CHAVES_SIMULADO):
+    """Contagem como era feita antes: um groupby por contagem e merge das duas"""
+    total = df.groupby(chaves, observed=True)['Resposta'].count().rename('Total_Respostas').reset_index()
+    acertos = (df[df['Resposta'] == RESPOSTA_CORRETA].groupby(chaves, observed=True).size()
+               .rename('Total_Acertos').reset_index())
+    resultado = total.merge(acertos, on=chaves, how='left').fillna({'Total_Acertos': 0})
+    resultado = resultado[resultado['Total_Respostas'] > 0].reset_index(drop=True)
+    resultado['Taxa_Acerto'] = resultado['Total_Acertos'] / resultado['Total_Respostas'] * 100
+    return resultado
+
+
+def _ordenado(df, chaves=CHAVES_SIMULADO):
+    return df.astype({chave: str for chave in chaves}).sort_values(chaves).reset_index(drop=True)
+
+
+def _comparar(obtido, esperado):
+    pd.testing.assert_frame_equal(_ordenado(obtido), _ordenado(esperado), check_dtype=False)
+
+
+@pytest.mark.parametrize("linhas", [1, 50, 5000])
+def test_calcular_acertos_igual_ao_groupby_merge(linhas):
+    df = _respostas(linhas)
+    _comparar(calcular_acertos(df), _referencia(df))
+
+
+def test_respostas_ausentes_nao_contam_e_grupo_sem_resposta_some():
+    df = pd.DataFrame({
+        "DE": ["SUL 1"] * 4, "SERIE_ANO": ["5 Ano"] * 4, "ESCOLA": ["A", "A", "A", "B"],
+        "Disciplina": ["LP"] * 4, "Resposta": [RESPOSTA_CORRETA, None, "Incorreto", None],
+    })
+
+    resultado = calcular_acertos(df)
+
+    assert resultado['ESCOLA'].tolist() == ["A"]
+    assert resultado[['Total_Respostas', 'Total_Acertos']].iloc[0].tolist() == [2, 1]
+    assert resultado['Taxa_Acerto'].iloc[0] == 50.0
+    _comparar(resultado, _referencia(df))
+
+
+def test_grupo_com_mais_de_127_respostas_nao_estoura():
+    # Acima do limite do int8: a soma por grupo precisa de um tipo largo
+    df = pd.DataFrame({"DE": "SUL 1", "SERIE_ANO": "9 Ano", "ESCOLA": "A", "Disciplina": "MAT",
+                       "Resposta": [RESPOSTA_CORRETA] * 300 + ["Incorreto"] * 100}, index=range(400))
+
+    resultado = calcular_acertos(df)
+
+    assert resultado[['Total_Respostas', 'Total_Acertos']].iloc[0].tolist() == [400, 300]
+    assert resultado['Taxa_Acerto'].iloc[0] == 75.0
+    _comparar(resultado, _referencia(df))
+
+
+@pytest.fixture
+def contadas(monkeypatch):
+    """Quantas linhas cada chamada de `_contar` agregou"""
+    tamanhos = []
+    contar = pontuacao._contar
+
+    def contar_registrando(novas, chaves):
+        tamanhos.append(len(novas))
+        return contar(novas, chaves)
+
+    monkeypatch.setattr(pontuacao, "_contar", contar_registrando)
+    return tamanhos
+
+
+def test_agregado_so_conta_as_linhas_depois_da_marca(contadas):
+    df = _respostas(3000)
+    agregado = AgregadoSimulado()
+    assert agregado.atualizar(df.iloc[:1000]) == 1000
+    assert agregado.linhas_processadas == 1000
+
+    assert agregado.atualizar(df.iloc[:2500]) == 1500
+    assert agregado.atualizar(df.iloc[:2500]) == 0
+    assert agregado.atualizar(df) == 500
+
+    assert contadas == [1000, 1500, 500]
+    assert agregado.linhas_processadas == 3000
+    _comparar(agregado.resultado(), _referencia(df))
+
+
+@pytest.mark.parametrize("alterar", [
+    lambda df: df.iloc[:1500],  # planilha encolheu
+    lambda df: df.assign(Resposta=df['Resposta'].where(df.index != 778, "Incorreto")),  # linha antiga editada
+])
+def test_agregado_refeito_do_zero_se_as_linhas_processadas_mudaram(alterar):
+    df = _respostas(2000)
+    df.loc[778, 'Resposta'] = RESPOSTA_CORRETA
+    agregado = AgregadoSimulado()
+    agregado.atualizar(df)
+
+    alterado = alterar(df)
+    assert agregado.atualizar(alterado) == len(alterado)
+    _comparar(agregado.resultado(), _referencia(alterado))
+
+
+def test_incremental_retoma_do_agregado_gravado(tmp_path, monkeypatch, contadas):
+    df = _respostas(4000)
+    calcular_acertos_incremental("simulado", df.iloc[:3000], diretorio=str(tmp_path))
+
+    # Outro processo: o agregado volta do disco com a marca d'água e só conta as linhas novas
+    monkeypatch.setattr(pontuacao, "_agregados", {})
+    assert AgregadoSimulado.carregar(str(tmp_path / "agregados" / "simulado")).linhas_processadas == 3000
+    resultado = calcular_acertos_incremental("simulado", df, diretorio=str(tmp_path))
+
+    assert contadas == [3000, 1000]
+    _comparar(resultado, _referencia(df))
@@ -0,0 +1,66 @@
+"""Respostas compactas em bits, contra `calcular_acertos` sobre a planilha original."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pontuacao import CHAVES_SIMULADO, RESPOSTA_CORRETA, calcular_acertos
+from respostas import RespostasCompactas
+
+
+@pytest.fixture
+def planilha():
+    rng = np.random.default_rng(9)
+    n = 6000
+    escolas = rng.integers(1, 40, n)
+    df = pd.DataFrame({
+        "DE": pd.Categorical(np.where(escolas % 3 == 0, "JUNDIAI", np.where(escolas % 3 == 1, "SUL 1", "SUL 2"))),
+        "SERIE_ANO": pd.Categorical(rng.choice(["5 Ano", "9 Ano"], n)),
+        "ESCOLA": pd.Categorical([f"E{escola}" for escola in escolas]),
+        "Disciplina": pd.Categorical(rng.choice(["LP", "MAT"], n)),
+        "Resposta": pd.Categorical(rng.choice([RESPOSTA_CORRETA, "Incorreto", None], n, p=[0.5, 0.4, 0.1])),
+    })
+    df.loc[rng.random(n) < 0.01, "ESCOLA"] = None  # linhas sem escola ficam de fora nos dois lados
+    # Um grupo grande (mais de 127 respostas, trecho de bits que não fecha em byte)
+    grande = pd.DataFrame({"DE": "SUL 1", "SERIE_ANO": "9 Ano", "ESCOLA": "E1", "Disciplina": "MAT",
+                           "Resposta": [RESPOSTA_CORRETA] * 201 + ["Incorreto"] * 100}, index=range(301))
+    return pd.concat([df, grande.astype(df.dtypes.to_dict())], ignore_index=True)
+
+
+def _ordenado(df, chaves=CHAVES_SIMULADO):
+    return df.astype({chave: str for chave in chaves}).sort_values(chaves).reset_index(drop=True)
+
+
+def _comparar(obtido, esperado):
+    pd.testing.assert_frame_equal(_ordenado(obtido), _ordenado(esperado), check_dtype=False)
+
+
+def test_acertos_iguais_ao_calcular_acertos(planilha):
+    compactas = RespostasCompactas.de_respostas(planilha)
+
+    assert len(compactas) == planilha["ESCOLA"].notna().sum()
+    _comparar(compactas.acertos(), calcular_acertos(planilha))
+
+
+def test_fatia_de_igual_as_linhas_da_de_e_sem_copia(planilha):
+    compactas = RespostasCompactas.de_respostas(planilha)
+
+    assert sorted(compactas.des()) == ["JUNDIAI", "SUL 1", "SUL 2"]
+    for de in compactas.des():
+        fatia = compactas.fatia_de(de)
+        assert np.shares_memory(fatia.respondidas, compactas.respondidas)
+        _comparar(fatia.acertos(), calcular_acertos(planilha[planilha["DE"] == de]))
+    assert len(compactas.fatia_de("SUL 9").acertos()) == 0
+
+
+def test_gravar_e_abrir_por_memory_map(planilha, tmp_path):
+    RespostasCompactas.de_respostas(planilha).gravar(str(tmp_path))
+
+    abertas = RespostasCompactas.abrir(str(tmp_path))
+
+    # Bits lidos do memory map (somente leitura), não copiados
+    assert not abertas.respondidas.flags.writeable
+    assert abertas.coluna_de == "DE"
+    _comparar(abertas.acertos(), calcular_acertos(planilha))
+    for de in ("JUNDIAI", "SUL 1"):
+        _comparar(abertas.fatia_de(de).acertos(), calcular_acertos(planilha[planilha["DE"] == de]))